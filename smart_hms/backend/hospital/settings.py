@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 import dj_database_url
 from decouple import config
 
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'hospital_app.request_logging.RequestLoggingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -89,6 +91,23 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/ref/settings/#caches
+# Token revocations, dashboard invalidations and job state go through this
+# cache, so every worker process must see the same one: e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://localhost:6379/0
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+# Whether a write seen by one worker process is seen by all of them
+CACHE_IS_SHARED = not CACHES['default']['BACKEND'].endswith(('.LocMemCache', '.DummyCache'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -141,11 +160,15 @@ AUTH_USER_MODEL = 'hospital_app.User'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'hospital_app.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'hospital_app.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20
 }
@@ -177,6 +200,109 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    
+    # Tokens carry role and profile id claims
+    'TOKEN_OBTAIN_SERIALIZER': 'hospital_app.authentication.HospitalTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'hospital_app.authentication.HospitalTokenRefreshSerializer',
+}
+
+# Authenticate requests from token claims, without loading the user row.
+# Revocations only reach other workers through a shared cache (see CACHES).
+AUTH_TOKEN_USER_MODE = config('AUTH_TOKEN_USER_MODE', default=CACHE_IS_SHARED, cast=bool)
+# Per-process cache of full user rows for views that need them
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=1024, cast=int)
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=60.0, cast=float)
+
+# AI symptom checker
+# Seconds between checks of the model file for a newer version
+SYMPTOM_MODEL_CHECK_INTERVAL = config('SYMPTOM_MODEL_CHECK_INTERVAL', default=5.0, cast=float)
+# 'numpy' serves the exported array model (see export_symptom_model),
+# 'sklearn' the pickled model, 'auto' the exported model when one exists
+SYMPTOM_MODEL_ENGINE = config('SYMPTOM_MODEL_ENGINE', default='auto')
+# Prediction cache keyed on normalized symptom text
+SYMPTOM_CACHE_SIZE = config('SYMPTOM_CACHE_SIZE', default=2048, cast=int)
+SYMPTOM_CACHE_TTL = config('SYMPTOM_CACHE_TTL', default=3600.0, cast=float)
+# Largest list accepted by the batch analysis endpoint
+SYMPTOM_BATCH_MAX_SIZE = config('SYMPTOM_BATCH_MAX_SIZE', default=500, cast=int)
+
+# Unix socket of the inference sidecar (run_symptom_sidecar); empty runs inference in-process
+SYMPTOM_SIDECAR_SOCKET = config('SYMPTOM_SIDECAR_SOCKET', default='')
+# Seconds to wait for the sidecar before answering with the keyword model
+SYMPTOM_SIDECAR_TIMEOUT = config('SYMPTOM_SIDECAR_TIMEOUT', default=2.0, cast=float)
+
+# Asynchronous symptom analysis jobs
+SYMPTOM_JOB_WORKERS = config('SYMPTOM_JOB_WORKERS', default=2, cast=int)
+SYMPTOM_JOB_MAX_PENDING = config('SYMPTOM_JOB_MAX_PENDING', default=200, cast=int)
+SYMPTOM_JOB_BATCH_SIZE = config('SYMPTOM_JOB_BATCH_SIZE', default=50, cast=int)
+SYMPTOM_JOB_FLUSH_INTERVAL = config('SYMPTOM_JOB_FLUSH_INTERVAL', default=0.2, cast=float)
+SYMPTOM_JOB_TTL = config('SYMPTOM_JOB_TTL', default=3600, cast=int)
+
+# Budget for django.setup() plus URLconf import, checked by benchmark_startup
+STARTUP_TIME_BUDGET_MS = config('STARTUP_TIME_BUDGET_MS', default=1500, cast=float)
+
+# Dashboard snapshots
+# Seconds a rendered patient or doctor dashboard is served from the cache; 0 disables.
+# Invalidations only reach other workers through a shared cache (see CACHES).
+DASHBOARD_CACHE_TTL = config('DASHBOARD_CACHE_TTL', default=300 if CACHE_IS_SHARED else 0, cast=int)
+
+# Appointment slots and availability search (hospital_app.availability)
+# Length of a bookable slot; changing it needs `manage.py rebuild_slot_occupancy`
+APPOINTMENT_SLOT_MINUTES = config('APPOINTMENT_SLOT_MINUTES', default=30, cast=int)
+# Furthest one availability search may look ahead, and most slots it returns
+AVAILABILITY_MAX_DAYS = config('AVAILABILITY_MAX_DAYS', default=31, cast=int)
+AVAILABILITY_MAX_SLOTS = config('AVAILABILITY_MAX_SLOTS', default=200, cast=int)
+# Most appointments one bulk status change (/api/appointments/bulk-status/) may name
+APPOINTMENT_BULK_MAX_IDS = config('APPOINTMENT_BULK_MAX_IDS', default=500, cast=int)
+
+# Bulk user import (import_users command and /api/users/import/)
+USER_IMPORT_BATCH_SIZE = config('USER_IMPORT_BATCH_SIZE', default=500, cast=int)
+# Processes hashing passwords in the import_users command; 0 uses every CPU.
+# The endpoint hashes inline.
+USER_IMPORT_HASH_WORKERS = config('USER_IMPORT_HASH_WORKERS', default=0, cast=int)
+# Largest file accepted by the endpoint; the command has no limit
+USER_IMPORT_MAX_ROWS = config('USER_IMPORT_MAX_ROWS', default=20000, cast=int)
+
+# Request logging (hospital_app.request_logging)
+# Off by default under `manage.py test` to keep test output readable
+TESTING = sys.argv[1:2] == ['test']
+REQUEST_LOG_ENABLED = config('REQUEST_LOG_ENABLED', default=not TESTING, cast=bool)
+# Share of requests logged, overridden per URL name below
+REQUEST_LOG_SAMPLE_RATE = config('REQUEST_LOG_SAMPLE_RATE', default=1.0, cast=float)
+REQUEST_LOG_SAMPLE_RATES = {
+    # Clients poll job status in a loop
+    'ai_symptom_checker_job': 0.05,
+    'metrics': 0.1,
+}
+# Requests at least this slow, and server errors, are logged regardless of sampling
+REQUEST_LOG_SLOW_MS = config('REQUEST_LOG_SLOW_MS', default=1000.0, cast=float)
+# Include redacted headers and JSON bodies; for debugging only
+REQUEST_LOG_BODIES = config('REQUEST_LOG_BODIES', default=False, cast=bool)
+# Header and body keys containing any of these are masked
+REQUEST_LOG_REDACT_FIELDS = ['password', 'token', 'access', 'refresh', 'authorization', 'cookie', 'secret']
+# Records waiting for the log thread; more are dropped
+REQUEST_LOG_QUEUE_SIZE = config('REQUEST_LOG_QUEUE_SIZE', default=10000, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'queue': {
+            '()': 'hospital_app.request_logging.QueueLogHandler',
+            'maxsize': REQUEST_LOG_QUEUE_SIZE,
+        },
+    },
+    'loggers': {
+        'hospital.requests': {
+            'handlers': ['queue'],
+            'level': config('REQUEST_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+        'hospital_app': {
+            'handlers': ['queue'],
+            'level': config('APP_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
 }
 
 # CORS Configuration
@@ -0,0 +1,109 @@
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+TOKEN_RE = re.compile(r'(?u)\b\w\w+\b')
+
+# Words that never change a prediction. Kept to a subset of scikit-learn's
+# English stop words, which the TF-IDF vectorizer already drops.
+STOP_WORDS = frozenset([
+    'a', 'about', 'after', 'all', 'also', 'am', 'an', 'and', 'any', 'are', 'as', 'at',
+    'be', 'been', 'before', 'but', 'by', 'can', 'could', 'do', 'for', 'from', 'had',
+    'has', 'have', 'he', 'her', 'his', 'i', 'in', 'is', 'it', 'its', 'me', 'my', 'of',
+    'on', 'or', 'she', 'since', 'so', 'some', 'than', 'that', 'the', 'their', 'them',
+    'then', 'there', 'these', 'they', 'this', 'to', 'very', 'was', 'we', 'were', 'when',
+    'while', 'with', 'you', 'your',
+])
+
+
+def canonicalize(symptoms):
+    """Canonical form of a symptom text: lowercased, stop words removed, tokens sorted
+
+    "Headache, fever, fatigue" and "fever headache fatigue" share one form.
+    Repeated tokens are kept because they change TF-IDF weights.
+    """
+    tokens = [token for token in TOKEN_RE.findall(symptoms.lower()) if token not in STOP_WORDS]
+    return ' '.join(sorted(tokens))
+
+
+class PredictionCache:
+    """Bounded LRU cache of prediction results with a time-to-live
+
+    Entries are keyed on the canonical symptom text and tagged with the model
+    version; the whole cache is dropped as soon as a different model version
+    is seen.
+    """
+
+    def __init__(self, maxsize=2048, ttl=3600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version, key):
+        """Return a copy of the cached result, or None on a miss"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def set(self, version, key, value):
+        """Store a result, evicting the least recently used entries when full"""
+        if self.maxsize <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit-rate counters for the metrics endpoint"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl_seconds': self.ttl,
+            'model_version': self._version,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
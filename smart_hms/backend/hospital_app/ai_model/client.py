@@ -0,0 +1,150 @@
+"""Thin client for the symptom inference sidecar
+
+Imports neither NumPy nor scikit-learn. One connection per process is kept
+open and shared by every request thread: requests are pipelined on it and a
+reader thread routes each response to its caller by request id. When the
+sidecar is unreachable or too slow the keyword model answers instead.
+"""
+import itertools
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from .keyword_matcher import KeywordSymptomModel
+from .sidecar import recv_frame, send_frame
+
+
+logger = logging.getLogger(__name__)
+
+
+class SidecarError(Exception):
+    """The sidecar could not produce a prediction"""
+
+
+class SidecarClient:
+    """Pipelining, connection-reusing client with a keyword-model fallback"""
+
+    def __init__(self, socket_path, timeout=1.0, connect_timeout=0.2):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._sock = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._fallback = None
+        self.requests = 0
+        self.fallbacks = 0
+        self.connects = 0
+
+    def _connect(self):
+        """Open the shared connection and its reader thread; caller holds the lock"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.connect_timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(None)
+        self._sock = sock
+        self.connects += 1
+        threading.Thread(target=self._read, args=(sock,), name='symptom-sidecar-reader', daemon=True).start()
+
+    def _read(self, sock):
+        """Route responses to waiting callers until the connection drops"""
+        rfile = sock.makefile('rb')
+        try:
+            while True:
+                response = recv_frame(rfile)
+                if response is None:
+                    break
+                future = self._pending.pop(response.get('id'), None)
+                if future is not None:
+                    future.set_result(response)
+        except (OSError, ValueError):
+            pass
+        finally:
+            rfile.close()
+            with self._lock:
+                if self._sock is sock:
+                    self._sock = None
+                sock.close()
+                # Anything still waiting on this connection will never be answered
+                for request_id, future in list(self._pending.items()):
+                    if future.sock is sock:
+                        del self._pending[request_id]
+                        future.set_exception(SidecarError('Sidecar connection closed'))
+
+    def submit(self, symptoms_list):
+        """Send a request without waiting for the answer; returns a Future"""
+        future = Future()
+        with self._lock:
+            if self._sock is None:
+                self._connect()
+            request_id = next(self._ids)
+            future.sock = self._sock
+            self._pending[request_id] = future
+            future.request_id = request_id
+            try:
+                send_frame(self._sock, {'id': request_id, 'symptoms': list(symptoms_list)})
+            except OSError:
+                self._pending.pop(request_id, None)
+                self._sock.close()
+                self._sock = None
+                raise
+        self.requests += 1
+        return future
+
+    def predict_batch_remote(self, symptoms_list):
+        """Predict through the sidecar, raising SidecarError on any failure"""
+        try:
+            future = self.submit(symptoms_list)
+        except OSError as e:
+            raise SidecarError(f'Sidecar unavailable: {e}') from e
+        try:
+            response = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self._pending.pop(future.request_id, None)
+            raise SidecarError('Sidecar timed out')
+        if 'error' in response:
+            raise SidecarError(response['error'])
+        return response['results']
+
+    def predict_batch(self, symptoms_list):
+        """Predict through the sidecar, or with the keyword model if it fails"""
+        try:
+            return self.predict_batch_remote(symptoms_list)
+        except SidecarError as e:
+            logger.warning('Symptom sidecar failed, using keyword model: %s', e)
+            self.fallbacks += 1
+            if self._fallback is None:
+                self._fallback = KeywordSymptomModel()
+            return self._fallback.predict_batch(symptoms_list)
+
+    def predict(self, symptoms):
+        return self.predict_batch([symptoms])[0]
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                try:
+                    self._sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                self._sock.close()
+                self._sock = None
+
+    def stats(self):
+        """Client counters for the metrics endpoint"""
+        return {
+            'socket_path': self.socket_path,
+            'connected': self._sock is not None,
+            'requests': self.requests,
+            'in_flight': len(self._pending),
+            'fallbacks': self.fallbacks,
+            'connects': self.connects,
+        }
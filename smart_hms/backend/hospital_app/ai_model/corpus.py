@@ -0,0 +1,44 @@
+"""Synthetic symptom corpus for benchmarks
+
+Documents are generated deterministically from a seed. Each one mixes a few
+keywords of its condition with an occasional keyword from another
+condition and some filler words, in random order. Condition frequencies
+follow a Zipf-like distribution so a few conditions dominate, as in real
+traffic.
+"""
+import random
+
+from .keyword_matcher import KEYWORD_CONDITIONS
+
+
+FILLER_WORDS = [
+    'mild', 'severe', 'sudden', 'persistent', 'since', 'yesterday', 'for', 'two', 'days',
+    'week', 'recurring', 'morning', 'night', 'after', 'eating', 'worse', 'better', 'slight',
+]
+
+
+def generate_corpus(size, seed=42, extra_conditions=0):
+    """Return ``(texts, labels)`` with ``size`` synthetic documents
+
+    ``extra_conditions`` adds synthetic conditions on top of the built-in
+    ones, each with its own made-up keywords, to grow the label space.
+    """
+    rng = random.Random(seed)
+    keywords = {condition: list(words) for condition, words in KEYWORD_CONDITIONS.items()}
+    for index in range(extra_conditions):
+        keywords[f'condition_{index}'] = [f'sign{index}x{k}' for k in range(4)]
+
+    conditions = list(keywords)
+    weights = [1.0 / (rank + 1) for rank in range(len(conditions))]
+    labels = rng.choices(conditions, weights=weights, k=size)
+
+    texts = []
+    for label in labels:
+        own = keywords[label]
+        words = rng.sample(own, k=rng.randint(1, max(1, len(own) - 1)))
+        if rng.random() < 0.5:
+            words.append(rng.choice(keywords[rng.choice(conditions)]))
+        words.extend(rng.choices(FILLER_WORDS, k=rng.randint(0, 2)))
+        rng.shuffle(words)
+        texts.append(' '.join(words))
+    return texts, labels
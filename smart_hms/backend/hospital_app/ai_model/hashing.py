@@ -0,0 +1,52 @@
+"""Pure-Python MurmurHash3 matching scikit-learn's HashingVectorizer
+
+Lets the NumPy engine reproduce hashed feature indices without importing
+scikit-learn.
+"""
+from functools import lru_cache
+
+
+_MASK = 0xffffffff
+_C1 = 0xcc9e2d51
+_C2 = 0x1b873593
+
+
+def _rotl(value, shift):
+    return ((value << shift) | (value >> (32 - shift))) & _MASK
+
+
+def murmurhash3_32(data, seed=0):
+    """Signed 32-bit MurmurHash3 (x86) of ``data``, like sklearn.utils.murmurhash3_32"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    length = len(data)
+    h = seed & _MASK
+    block_end = length - length % 4
+
+    for offset in range(0, block_end, 4):
+        k = int.from_bytes(data[offset:offset + 4], 'little')
+        k = _rotl((k * _C1) & _MASK, 15)
+        h ^= (k * _C2) & _MASK
+        h = (_rotl(h, 13) * 5 + 0xe6546b64) & _MASK
+
+    tail = data[block_end:]
+    if tail:
+        k = int.from_bytes(tail, 'little')
+        k = _rotl((k * _C1) & _MASK, 15)
+        h ^= (k * _C2) & _MASK
+
+    h ^= length
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & _MASK
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & _MASK
+    h ^= h >> 16
+    return h - (1 << 32) if h & 0x80000000 else h
+
+
+@lru_cache(maxsize=65536)
+def hashed_feature(token, n_features, alternate_sign=True):
+    """Feature index and sign HashingVectorizer assigns to ``token``"""
+    h = murmurhash3_32(token)
+    sign = -1.0 if alternate_sign and h < 0 else 1.0
+    return abs(h) % n_features, sign
@@ -0,0 +1,203 @@
+"""Asynchronous symptom analysis jobs
+
+Requests enqueue a job and return immediately. A bounded pool of worker
+threads drains the queue in batches through the prediction cache, and a
+single writer thread stores finished predictions with batched
+``bulk_create`` calls.
+
+Job state lives in Django's cache so any worker process can answer a
+status poll when a shared cache backend is configured; finished jobs can
+always be found through ``SymptomChecker.job_id``.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+JOB_CACHE_PREFIX = 'symptom-job:'
+
+
+class QueueFull(Exception):
+    """Raised when no more jobs can be accepted"""
+
+
+class SymptomJobQueue:
+    """Bounded worker pool for symptom analysis jobs"""
+
+    def __init__(self, workers=None, max_pending=None, batch_size=None, flush_interval=None, predict=None):
+        self.workers = workers or settings.SYMPTOM_JOB_WORKERS
+        self.max_pending = max_pending or settings.SYMPTOM_JOB_MAX_PENDING
+        self.batch_size = batch_size or settings.SYMPTOM_JOB_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.SYMPTOM_JOB_FLUSH_INTERVAL
+        self.job_ttl = settings.SYMPTOM_JOB_TTL
+        # Batch predictor; the shared model (or sidecar) when not given
+        self._predict = predict
+        self._lock = threading.Lock()
+        self._pid = None
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        """Start the threads on first use, and again in a forked child"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pending = queue.Queue(maxsize=self.max_pending)
+            self._finished = queue.Queue()
+            for index in range(self.workers):
+                threading.Thread(target=self._work, name=f'symptom-job-worker-{index}', daemon=True).start()
+            threading.Thread(target=self._write, name='symptom-job-writer', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _set_state(self, job_id, state):
+        cache.set(JOB_CACHE_PREFIX + job_id, state, self.job_ttl)
+
+    def submit(self, symptoms, user_id, patient_id=None):
+        """Queue a job and return its id, or raise QueueFull"""
+        if not isinstance(symptoms, str) or not symptoms.strip():
+            raise ValueError('symptoms must be a non-empty string')
+        self._ensure_started()
+        job = {
+            'job_id': str(uuid.uuid4()),
+            'symptoms': symptoms,
+            'user_id': user_id,
+            'patient_id': patient_id,
+        }
+        self._set_state(job['job_id'], {'status': 'queued', 'user_id': user_id})
+        try:
+            self._pending.put_nowait(job)
+        except queue.Full:
+            cache.delete(JOB_CACHE_PREFIX + job['job_id'])
+            self.rejected += 1
+            raise QueueFull()
+        self.submitted += 1
+        return job['job_id']
+
+    def _take_batch(self):
+        """Block for one job, then grab whatever else is already waiting"""
+        batch = [self._pending.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _predict_batch(self, symptoms_list):
+        if self._predict is not None:
+            return self._predict(symptoms_list)
+        from .registry import predict_symptoms_batch
+        return predict_symptoms_batch(symptoms_list)
+
+    def _work(self):
+        while True:
+            batch = self._take_batch()
+            for job in batch:
+                self._set_state(job['job_id'], {'status': 'running', 'user_id': job['user_id']})
+            try:
+                predictions = self._predict_batch([job['symptoms'] for job in batch])
+            except Exception:
+                if len(batch) == 1:
+                    logger.exception('Symptom job %s failed', batch[0]['job_id'])
+                    self._fail(batch)
+                else:
+                    # One bad job must not fail the others batched with it
+                    logger.exception('Symptom job batch failed, retrying its jobs one at a time')
+                    self._work_each(batch)
+                continue
+            for job, prediction in zip(batch, predictions):
+                self._finished.put((job, prediction))
+
+    def _work_each(self, batch):
+        for job in batch:
+            try:
+                prediction = self._predict_batch([job['symptoms']])[0]
+            except Exception:
+                logger.exception('Symptom job %s failed', job['job_id'])
+                self._fail([job])
+                continue
+            self._finished.put((job, prediction))
+
+    def _drain_finished(self):
+        """Collect finished predictions until a batch is full or the flush interval passes"""
+        items = [self._finished.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(items) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                items.append(self._finished.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return items
+
+    def _write(self):
+        from hospital_app.models import SymptomChecker
+
+        while True:
+            items = self._drain_finished()
+            close_old_connections()
+            try:
+                rows = SymptomChecker.objects.bulk_create([
+                    SymptomChecker(
+                        job_id=job['job_id'],
+                        patient_id=job['patient_id'],
+                        symptoms=job['symptoms'],
+                        predicted_conditions=prediction.get('conditions', []),
+                        confidence_scores=prediction.get('confidence', {}),
+                        recommendations=prediction.get('recommendations', '')
+                    )
+                    for job, prediction in items
+                ])
+            except Exception:
+                logger.exception('Storing symptom job results failed')
+                self._fail([job for job, _ in items])
+                continue
+            for (job, _), row in zip(items, rows):
+                self._set_state(job['job_id'], {
+                    'status': 'completed',
+                    'user_id': job['user_id'],
+                    'symptom_check_id': row.pk,
+                })
+            self.completed += len(items)
+
+    def _fail(self, jobs):
+        for job in jobs:
+            self._set_state(job['job_id'], {'status': 'failed', 'user_id': job['user_id']})
+        self.failed += len(jobs)
+
+    def stats(self):
+        """Queue counters for the metrics endpoint"""
+        started = self._pid == os.getpid()
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self._pending.qsize() if started else 0,
+            'unwritten': self._finished.qsize() if started else 0,
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'completed': self.completed,
+            'failed': self.failed,
+        }
+
+
+def get_job_state(job_id):
+    """Cached state of a job, or None when unknown or expired"""
+    return cache.get(JOB_CACHE_PREFIX + str(job_id))
+
+
+symptom_job_queue = SymptomJobQueue()
@@ -0,0 +1,134 @@
+import re
+from functools import lru_cache
+
+from .results import PredictionResultMixin
+
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Keywords used when no trained model is available
+KEYWORD_CONDITIONS = {
+    'flu': ['fever', 'headache', 'fatigue', 'body aches'],
+    'pneumonia': ['cough', 'chest pain', 'shortness of breath', 'fever'],
+    'gastroenteritis': ['nausea', 'vomiting', 'diarrhea', 'stomach pain'],
+    'arthritis': ['joint pain', 'swelling', 'stiffness'],
+    'dermatitis': ['rash', 'itching', 'redness'],
+    'alzheimer': ['dizziness', 'confusion', 'memory loss'],
+    'heart_attack': ['chest pain', 'shortness of breath', 'sweating'],
+    'ibs': ['abdominal pain', 'bloating', 'nausea'],
+    'back_problems': ['back pain', 'stiffness', 'limited movement'],
+    'strep_throat': ['sore throat', 'fever', 'swollen glands'],
+    'hypertension': ['high blood pressure', 'chest pain'],
+    'lupus': ['skin rash', 'joint pain', 'fatigue'],
+    'migraine': ['headache', 'blurred vision', 'nausea'],
+    'asthma': ['difficulty breathing', 'wheezing', 'cough'],
+    'food_poisoning': ['stomach pain', 'nausea', 'vomiting'],
+    'fibromyalgia': ['muscle pain', 'weakness', 'fatigue'],
+    'depression': ['anxiety', 'depression', 'mood changes'],
+    'insomnia': ['sleep problems', 'fatigue', 'irritability'],
+    'diabetes': ['weight loss', 'fatigue', 'weakness', 'frequent urination', 'thirst']
+}
+
+
+def tokenize(text):
+    """Lowercase word tokens; punctuation and whitespace are boundaries"""
+    return TOKEN_RE.findall(text.lower())
+
+
+class KeywordMatcher:
+    """Multi-pattern keyword matcher for the fallback symptom model
+
+    Keyword phrases are compiled into a token trie, and every distinct phrase
+    maps to a posting list of condition indices, i.e. a sparse
+    keyword-to-condition matrix. Scoring walks the input tokens once,
+    collects the phrases that occur on word boundaries ("rash" does not match
+    "thrash") and only touches the conditions that have a hit, so the cost
+    does not grow with the number of conditions.
+    """
+
+    _END = object()
+
+    def __init__(self, keyword_conditions):
+        self.conditions = list(keyword_conditions)
+        self._trie = {}
+        self._postings = []
+        self._keyword_counts = []
+        phrase_ids = {}
+
+        for condition_index, condition in enumerate(self.conditions):
+            self._keyword_counts.append(len(keyword_conditions[condition]))
+            keywords = {tuple(tokenize(keyword)) for keyword in keyword_conditions[condition]}
+            keywords.discard(())
+            for phrase in keywords:
+                phrase_id = phrase_ids.get(phrase)
+                if phrase_id is None:
+                    phrase_id = phrase_ids[phrase] = len(self._postings)
+                    self._postings.append([])
+                    self._insert(phrase, phrase_id)
+                self._postings[phrase_id].append(condition_index)
+
+    def _insert(self, phrase, phrase_id):
+        node = self._trie
+        for token in phrase:
+            node = node.setdefault(token, {})
+        node[self._END] = phrase_id
+
+    def matches(self, text):
+        """Ids of the keyword phrases present in ``text``"""
+        tokens = tokenize(text)
+        found = set()
+        for start in range(len(tokens)):
+            node = self._trie
+            for token in tokens[start:]:
+                node = node.get(token)
+                if node is None:
+                    break
+                phrase_id = node.get(self._END)
+                if phrase_id is not None:
+                    found.add(phrase_id)
+        return found
+
+    def score(self, text):
+        """Return (condition, score) pairs for matching conditions, best first
+
+        A condition scores the fraction of its keywords found in the text;
+        ties keep the order the conditions were declared in.
+        """
+        hits = {}
+        for phrase_id in self.matches(text):
+            for condition_index in self._postings[phrase_id]:
+                hits[condition_index] = hits.get(condition_index, 0) + 1
+
+        scores = [(index, count / self._keyword_counts[index]) for index, count in hits.items()]
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return [(self.conditions[index], score) for index, score in scores]
+
+
+@lru_cache(maxsize=None)
+def default_keyword_matcher():
+    """Matcher over KEYWORD_CONDITIONS, compiled once per process"""
+    return KeywordMatcher(KEYWORD_CONDITIONS)
+
+
+class KeywordSymptomModel(PredictionResultMixin):
+    """Keyword-only symptom model
+
+    Needs neither NumPy nor scikit-learn, so it can serve as the fallback in
+    processes that never load the real model.
+    """
+
+    version = 'fallback'
+    # Phrase matching depends on token order
+    cacheable = False
+
+    def __init__(self):
+        self.matcher = default_keyword_matcher()
+        self.conditions = self.matcher.conditions
+
+    def predict(self, symptoms):
+        """Predict conditions based on symptoms"""
+        return self.predict_batch([symptoms])[0]
+
+    def predict_batch(self, symptoms_list, top_k=3):
+        """Predict conditions for several symptom texts"""
+        return [self._build_result(self.matcher.score(symptoms)[:top_k]) for symptoms in symptoms_list]
@@ -0,0 +1,218 @@
+"""Dependency-light symptom model format and predictor
+
+An exported model is a directory of raw ``.npy`` arrays plus a JSON
+manifest. The predictor memory-maps the arrays read-only, so forked workers
+share the same physical pages, and only needs NumPy at prediction time.
+
+Layout::
+
+    exported/
+        CURRENT                      name of the active version directory
+        <version>/
+            manifest.json            format version, featurizer, vocabulary, tokenizer options
+            idf.npy                  float64[n_features] (TF-IDF models only)
+            feature_log_prob.npy     float64[n_features, n_classes]
+            class_log_prior.npy      float64[n_classes]
+
+Two featurizers are supported: a fitted TfidfVectorizer (vocabulary and IDF
+weights are exported) and a stateless HashingVectorizer (features are
+recomputed with MurmurHash3, see ``hashing.py``).
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+from django.conf import settings
+
+from .hashing import hashed_feature
+from .results import PredictionResultMixin, rank_top_k
+
+
+FORMAT_VERSION = 1
+POINTER_NAME = 'CURRENT'
+
+
+def default_export_dir():
+    """Directory holding exported model versions"""
+    return os.path.join(settings.BASE_DIR, 'hospital_app', 'ai_model', 'exported')
+
+
+def _umask():
+    """The process umask, which can only be read by setting it"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def _write_pointer(directory, version):
+    """Atomically point CURRENT at ``version``"""
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.CURRENT.')
+    with os.fdopen(fd, 'w') as f:
+        f.write(version)
+    # mkstemp creates the file 0600; workers running as other users must read it
+    os.chmod(tmp_path, 0o666 & ~_umask())
+    os.replace(tmp_path, os.path.join(directory, POINTER_NAME))
+
+
+def export_model(ai, directory=None):
+    """Export a trained TF-IDF or hashing + MultinomialNB model to the array format
+
+    Returns the path of the new version directory. The version only becomes
+    active once every file is written and CURRENT has been swapped.
+    """
+    vectorizer, model = ai.vectorizer, ai.model
+    hashing = hasattr(vectorizer, 'n_features') and not hasattr(vectorizer, 'vocabulary_')
+    if model is None or not (hashing or hasattr(vectorizer, 'idf_')):
+        raise ValueError('Only trained TF-IDF or hashing models can be exported')
+
+    directory = directory or default_export_dir()
+    os.makedirs(directory, exist_ok=True)
+    version = str(ai.version)
+    target = os.path.join(directory, version)
+    if os.path.exists(target):
+        raise FileExistsError(f'Model version {version} is already exported')
+    staging = tempfile.mkdtemp(dir=directory, prefix=f'.{version}.')
+    try:
+        _write_version(ai, staging, version, hashing)
+        # Likewise for mkdtemp's 0700
+        os.chmod(staging, 0o777 & ~_umask())
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _write_pointer(directory, version)
+    return target
+
+
+def _write_version(ai, staging, version, hashing):
+    """Write the manifest and arrays of one model version into ``staging``"""
+    vectorizer, model = ai.vectorizer, ai.model
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'classes': [str(c) for c in model.classes_],
+        'stop_words': sorted(vectorizer.get_stop_words() or []),
+        'token_pattern': vectorizer.token_pattern,
+        'lowercase': vectorizer.lowercase,
+        'norm': vectorizer.norm,
+    }
+    if hashing:
+        manifest.update({
+            'featurizer': 'hashing',
+            'n_features': vectorizer.n_features,
+            'alternate_sign': vectorizer.alternate_sign,
+            'sublinear_tf': False,
+        })
+    else:
+        manifest.update({
+            'featurizer': 'tfidf',
+            'vocabulary': {term: int(index) for term, index in vectorizer.vocabulary_.items()},
+            'sublinear_tf': vectorizer.sublinear_tf,
+        })
+    with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    # Features are stored row-major so one token's class weights are contiguous
+    if not hashing:
+        np.save(os.path.join(staging, 'idf.npy'), np.ascontiguousarray(vectorizer.idf_, dtype=np.float64))
+    np.save(os.path.join(staging, 'feature_log_prob.npy'), np.ascontiguousarray(model.feature_log_prob_.T, dtype=np.float64))
+    np.save(os.path.join(staging, 'class_log_prior.npy'), np.ascontiguousarray(model.class_log_prior_, dtype=np.float64))
+
+
+class NumpySymptomPredictor(PredictionResultMixin):
+    """Symptom predictor over memory-mapped arrays, without scikit-learn"""
+
+    # Bag-of-words predictions do not depend on token order
+    cacheable = True
+
+    def __init__(self, directory=None):
+        directory = directory or default_export_dir()
+        self.model_path = os.path.join(directory, POINTER_NAME)
+        with open(self.model_path) as f:
+            self.version = f.read().strip()
+        version_dir = os.path.join(directory, self.version)
+
+        with open(os.path.join(version_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported model format {manifest.get('format_version')}")
+
+        self.conditions = manifest['classes']
+        self.featurizer = manifest.get('featurizer', 'tfidf')
+        self.vocabulary = manifest.get('vocabulary')
+        self.n_features = manifest.get('n_features')
+        self.alternate_sign = manifest.get('alternate_sign', False)
+        self.stop_words = frozenset(manifest['stop_words'])
+        self.lowercase = manifest['lowercase']
+        self.norm = manifest['norm']
+        self.sublinear_tf = manifest['sublinear_tf']
+        self._token_re = re.compile(manifest['token_pattern'])
+
+        self.idf = None
+        if self.featurizer == 'tfidf':
+            self.idf = np.load(os.path.join(version_dir, 'idf.npy'), mmap_mode='r')
+        self.feature_log_prob = np.load(os.path.join(version_dir, 'feature_log_prob.npy'), mmap_mode='r')
+        self.class_log_prior = np.load(os.path.join(version_dir, 'class_log_prior.npy'), mmap_mode='r')
+
+    @classmethod
+    def is_available(cls, directory=None):
+        """Whether an exported model exists"""
+        return os.path.exists(os.path.join(directory or default_export_dir(), POINTER_NAME))
+
+    def _tokenize(self, text):
+        if self.lowercase:
+            text = text.lower()
+        return [token for token in self._token_re.findall(text) if token not in self.stop_words]
+
+    def _vectorize(self, text):
+        """Feature indices and normalized weights of one document"""
+        counts = {}
+        if self.featurizer == 'hashing':
+            for token in self._tokenize(text):
+                index, sign = hashed_feature(token, self.n_features, self.alternate_sign)
+                counts[index] = counts.get(index, 0) + sign
+        else:
+            for token in self._tokenize(text):
+                index = self.vocabulary.get(token)
+                if index is not None:
+                    counts[index] = counts.get(index, 0) + 1
+        indices = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if self.sublinear_tf:
+            values = np.log(values) + 1
+        if self.idf is not None:
+            values *= self.idf[indices]
+        if self.norm == 'l2' and values.size:
+            values /= np.sqrt(np.dot(values, values))
+        elif self.norm == 'l1' and values.size:
+            values /= np.abs(values).sum()
+        return indices, values
+
+    def predict_proba(self, symptoms_list):
+        """Class probabilities for every document, like MultinomialNB.predict_proba"""
+        jll = np.empty((len(symptoms_list), len(self.conditions)))
+        jll[:] = self.class_log_prior
+        for row, text in enumerate(symptoms_list):
+            indices, values = self._vectorize(text)
+            if indices.size:
+                jll[row] += values @ self.feature_log_prob[indices]
+        jll -= jll.max(axis=1, keepdims=True)
+        np.exp(jll, out=jll)
+        jll /= jll.sum(axis=1, keepdims=True)
+        return jll
+
+    def predict(self, symptoms):
+        """Predict conditions based on symptoms"""
+        return self.predict_batch([symptoms])[0]
+
+    def predict_batch(self, symptoms_list, top_k=3):
+        """Predict conditions for several symptom texts at once"""
+        try:
+            ranked = rank_top_k(self.predict_proba(symptoms_list), self.conditions, top_k)
+            return [self._build_result(scored) for scored in ranked]
+        except Exception:
+            return [self._default_result() for _ in symptoms_list]
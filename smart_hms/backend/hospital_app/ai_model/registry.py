@@ -0,0 +1,206 @@
+import copy
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .cache import PredictionCache, canonicalize
+
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Process-wide holder for the symptom checker model
+
+    The model is loaded once per worker and shared by every request thread.
+    The model file is re-checked at most every ``check_interval`` seconds and
+    the model is only reloaded when the file's mtime, size or inode changes.
+    """
+
+    def __init__(self, loader=None, check_interval=None):
+        self._loader = loader
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._model = None
+        self._signature = None
+        self._last_check = 0.0
+        self._stats = {
+            'version': None,
+            'loaded_at': None,
+            'load_seconds': None,
+            'warmup_seconds': None,
+            'loads': 0,
+        }
+
+    @property
+    def check_interval(self):
+        if self._check_interval is None:
+            return getattr(settings, 'SYMPTOM_MODEL_CHECK_INTERVAL', 5.0)
+        return self._check_interval
+
+    def _load(self):
+        """Build a new model instance"""
+        if self._loader is not None:
+            return self._loader()
+
+        engine = getattr(settings, 'SYMPTOM_MODEL_ENGINE', 'auto')
+        if engine in ('auto', 'numpy'):
+            from .numpy_engine import NumpySymptomPredictor
+            if NumpySymptomPredictor.is_available():
+                return NumpySymptomPredictor()
+            if engine == 'numpy':
+                logger.warning('No exported symptom model found, falling back to scikit-learn')
+
+        from .symptom_checker import SymptomCheckerAI
+        return SymptomCheckerAI()
+
+    @staticmethod
+    def _file_signature(path):
+        """Return a cheap fingerprint of the model file, or None if it is missing"""
+        try:
+            st = os.stat(path)
+        except (OSError, TypeError):
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _is_stale(self):
+        """Check whether the model file changed since the last load"""
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        path = getattr(self._model, 'model_path', None)
+        return self._file_signature(path) != self._signature
+
+    def get(self):
+        """Return the shared model, loading or reloading it when needed"""
+        model = self._model
+        if model is not None and not self._is_stale():
+            return model
+
+        if model is not None:
+            # A reload is due; keep serving the current model while another
+            # thread is already busy loading the new one.
+            if not self._lock.acquire(blocking=False):
+                return model
+        else:
+            self._lock.acquire()
+
+        try:
+            if self._model is not None and self._model is not model:
+                return self._model
+            if model is not None or self._model is None:
+                self._reload()
+            return self._model
+        finally:
+            self._lock.release()
+
+    def _reload(self):
+        """Load the model and run a warm-up prediction, recording timings"""
+        started = time.perf_counter()
+        model = self._load()
+        loaded = time.perf_counter()
+        model.predict('fever headache fatigue')
+        warmed = time.perf_counter()
+
+        self._signature = self._file_signature(getattr(model, 'model_path', None))
+        self._last_check = time.monotonic()
+        self._model = model
+        self._stats.update({
+            'version': getattr(model, 'version', None),
+            'loaded_at': time.time(),
+            'load_seconds': loaded - started,
+            'warmup_seconds': warmed - loaded,
+            'loads': self._stats['loads'] + 1,
+        })
+        logger.info(
+            'Loaded symptom model version %s in %.3fs (warm-up %.3fs)',
+            self._stats['version'], self._stats['load_seconds'], self._stats['warmup_seconds'],
+        )
+
+    def reset(self):
+        """Drop the loaded model so the next call loads it again"""
+        with self._lock:
+            self._model = None
+            self._signature = None
+            self._last_check = 0.0
+
+    def stats(self):
+        """Return load and warm-up timings for the current model"""
+        return dict(self._stats, loaded=self._model is not None)
+
+
+symptom_model_registry = ModelRegistry()
+
+prediction_cache = PredictionCache(
+    maxsize=getattr(settings, 'SYMPTOM_CACHE_SIZE', 2048),
+    ttl=getattr(settings, 'SYMPTOM_CACHE_TTL', 3600.0),
+)
+
+
+def get_symptom_checker():
+    """Return the process-wide symptom checker model"""
+    return symptom_model_registry.get()
+
+
+_sidecar_client = None
+_sidecar_lock = threading.Lock()
+
+
+def get_sidecar_client():
+    """Process-wide sidecar client, or None when SYMPTOM_SIDECAR_SOCKET is unset"""
+    global _sidecar_client
+    socket_path = getattr(settings, 'SYMPTOM_SIDECAR_SOCKET', '')
+    if not socket_path:
+        return None
+    client = _sidecar_client
+    if client is None or client.pid != os.getpid():
+        with _sidecar_lock:
+            client = _sidecar_client
+            if client is None or client.pid != os.getpid():
+                from .client import SidecarClient
+                # A connection inherited through fork must not be shared
+                client = SidecarClient(socket_path, timeout=settings.SYMPTOM_SIDECAR_TIMEOUT)
+                _sidecar_client = client
+    return client
+
+
+def predict_symptoms_batch(symptoms_list):
+    """Predict several symptom texts in the sidecar if configured, else in-process"""
+    client = get_sidecar_client()
+    if client is not None:
+        return client.predict_batch(symptoms_list)
+    return predict_symptoms_batch_local(symptoms_list)
+
+
+def predict_symptoms_batch_local(symptoms_list):
+    """Predict several symptom texts, serving repeated phrasings from the cache"""
+    model = get_symptom_checker()
+    if not getattr(model, 'cacheable', False):
+        # Order-sensitive models (keyword fallback) cannot share canonical keys
+        return model.predict_batch(symptoms_list)
+
+    version = model.version
+    keys = [canonicalize(symptoms) for symptoms in symptoms_list]
+    results = [prediction_cache.get(version, key) for key in keys]
+
+    # Predict every distinct miss once, in a single batch
+    missing = {}
+    for index, result in enumerate(results):
+        if result is None:
+            missing.setdefault(keys[index], index)
+    if missing:
+        predictions = model.predict_batch([symptoms_list[index] for index in missing.values()])
+        computed = dict(zip(missing, predictions))
+        for key, prediction in computed.items():
+            prediction_cache.set(version, key, prediction)
+        results = [result if result is not None else copy.deepcopy(computed[key]) for key, result in zip(keys, results)]
+    return results
+
+
+def predict_symptoms(symptoms):
+    """Predict one symptom text through the prediction cache"""
+    return predict_symptoms_batch([symptoms])[0]
@@ -0,0 +1,62 @@
+def rank_top_k(probabilities, classes, top_k=3):
+    """Return the top-k (condition, score) pairs of every row, best first"""
+    import numpy as np
+    
+    # Partition first, then order only the k survivors of each row
+    k = min(top_k, probabilities.shape[1])
+    top_indices = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(probabilities, top_indices, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    top_indices = np.take_along_axis(top_indices, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    
+    classes = np.asarray(classes)
+    return [
+        list(zip(classes[row_indices].tolist(), row_scores.tolist()))
+        for row_indices, row_scores in zip(top_indices, top_scores)
+    ]
+
+
+class PredictionResultMixin:
+    """Shared formatting of symptom predictions into API results"""
+    
+    def _build_result(self, scored):
+        """Turn ranked (condition, score) pairs into the API result"""
+        predicted_conditions = [condition for condition, _ in scored]
+        confidence_scores = {condition: float(score) for condition, score in scored}
+        
+        # Generate recommendations
+        recommendations = self._generate_recommendations(predicted_conditions, confidence_scores)
+        
+        return {
+            'conditions': predicted_conditions,
+            'confidence': confidence_scores,
+            'recommendations': recommendations
+        }
+    
+    def _default_result(self):
+        """Result returned when prediction fails"""
+        return {
+            'conditions': ['general_consultation'],
+            'confidence': {'general_consultation': 0.5},
+            'recommendations': 'Please consult with a healthcare professional for proper diagnosis.'
+        }
+    
+    def _generate_recommendations(self, conditions, confidence_scores):
+        """Generate recommendations based on predicted conditions"""
+        recommendations = []
+        
+        for condition in conditions:
+            confidence = confidence_scores.get(condition, 0)
+            
+            if confidence > 0.7:
+                recommendations.append(f"High probability of {condition.replace('_', ' ')}. Please consult a doctor immediately.")
+            elif confidence > 0.4:
+                recommendations.append(f"Moderate probability of {condition.replace('_', ' ')}. Consider consulting a doctor.")
+            else:
+                recommendations.append(f"Low probability of {condition.replace('_', ' ')}. Monitor symptoms and consult if they worsen.")
+        
+        if not recommendations:
+            recommendations.append("Please consult with a healthcare professional for proper diagnosis.")
+        
+        return " ".join(recommendations)
@@ -0,0 +1,138 @@
+"""Out-of-process symptom inference over a Unix-domain socket
+
+The sidecar owns the model: a pool of worker processes each load it once,
+so web workers never import NumPy or scikit-learn and inference is not
+limited by one interpreter's GIL.
+
+Wire format: every message is a 4-byte big-endian length followed by a JSON
+object. Requests are ``{"id": n, "symptoms": [...]}`` and responses are
+``{"id": n, "results": [...]}`` or ``{"id": n, "error": "..."}``. A client
+may pipeline many requests on one connection; responses carry the request id
+and can arrive in any order.
+"""
+import json
+import logging
+import os
+import socketserver
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('>I')
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+
+def send_frame(sock, payload):
+    """Write one length-prefixed JSON message"""
+    data = json.dumps(payload).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def recv_frame(rfile):
+    """Read one length-prefixed JSON message, or None at end of stream"""
+    header = rfile.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    (length,) = _HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f'Frame of {length} bytes exceeds the limit')
+    data = rfile.read(length)
+    if len(data) < length:
+        return None
+    return json.loads(data)
+
+
+def predict_in_worker(symptoms_list):
+    """Run a prediction inside a pool worker with that worker's shared model"""
+    from .registry import predict_symptoms_batch_local
+    return predict_symptoms_batch_local(symptoms_list)
+
+
+def _warm_up_worker():
+    from .registry import get_symptom_checker
+    get_symptom_checker()
+
+
+class _ConnectionHandler(socketserver.StreamRequestHandler):
+    """Serves one client connection; requests on it run concurrently"""
+
+    def handle(self):
+        write_lock = threading.Lock()
+        while True:
+            try:
+                request = recv_frame(self.rfile)
+            except (OSError, ValueError):
+                logger.exception('Dropping sidecar connection after a bad frame')
+                return
+            if request is None:
+                return
+            future = self.server.executor.submit(self.server.predict, request.get('symptoms') or [])
+            future.add_done_callback(lambda f, request_id=request.get('id'): self._reply(write_lock, request_id, f))
+
+    def _reply(self, write_lock, request_id, future):
+        try:
+            response = {'id': request_id, 'results': future.result()}
+        except Exception as e:
+            response = {'id': request_id, 'error': str(e)}
+        try:
+            with write_lock:
+                send_frame(self.connection, response)
+        except OSError:
+            pass
+
+
+class SidecarServer(socketserver.ThreadingUnixStreamServer):
+    """Unix-socket server dispatching predictions to an executor
+
+    By default predictions run in a ProcessPoolExecutor with one process per
+    core. Tests pass a thread pool (and optionally their own ``predict``) to
+    run the whole path in-process; see ``LocalSidecar``.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, executor=None, processes=None, predict=None):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.socket_path = socket_path
+        self.executor = executor or ProcessPoolExecutor(
+            max_workers=processes or os.cpu_count(), initializer=_warm_up_worker,
+        )
+        self.predict = predict or predict_in_worker
+        super().__init__(socket_path, _ConnectionHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class LocalSidecar:
+    """In-process stand-in for the sidecar, for tests and local development
+
+    Serves on a real Unix socket from a background thread, with predictions
+    run in a thread pool of the current process.
+    """
+
+    def __init__(self, socket_path, predict=None, workers=2):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.server = SidecarServer(
+            socket_path,
+            executor=ThreadPoolExecutor(max_workers=workers),
+            predict=predict or predict_in_worker,
+        )
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
@@ -1,22 +1,74 @@
-import pandas as pd
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.pipeline import Pipeline
-from sklearn.model_selection import train_test_split
+import logging
 import pickle
 import os
+import tempfile
+import time
 from django.conf import settings
+from .keyword_matcher import KEYWORD_CONDITIONS, default_keyword_matcher
+from .results import PredictionResultMixin, rank_top_k
 
 
-class SymptomCheckerAI:
-    """AI-powered symptom checker using scikit-learn"""
+logger = logging.getLogger(__name__)
+
+
+def default_model_path():
+    """Location of the pickled symptom model"""
+    return os.path.join(settings.BASE_DIR, 'hospital_app', 'ai_model', 'symptom_model.pkl')
+
+
+def new_model_version():
+    """Version label for a freshly trained model"""
+    return str(int(time.time() * 1000))
+
+
+def save_model(model_data, path):
+    """Atomically replace the model file at ``path``
+
+    The pickle is written to a temporary file in the same directory and
+    renamed over the old one, so a worker never reads a half-written model.
+    """
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.symptom_model.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(model_data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file 0600; workers running as other users must read it
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def fit_symptom_model(texts, labels):
+    """Fit the TF-IDF vectorizer and naive Bayes classifier on symptom texts"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.naive_bayes import MultinomialNB
     
-    def __init__(self):
+    vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
+    model = MultinomialNB()
+    model.fit(vectorizer.fit_transform(texts), labels)
+    return vectorizer, model
+
+
+class SymptomCheckerAI(PredictionResultMixin):
+    """AI-powered symptom checker using scikit-learn
+
+    pandas and scikit-learn are imported on first use so that importing this
+    module (and the views that reference it) stays cheap.
+    """
+    
+    def __init__(self, model_path=None):
         self.model = None
         self.vectorizer = None
         self.conditions = []
-        self.model_path = os.path.join(settings.BASE_DIR, 'hospital_app', 'ai_model', 'symptom_model.pkl')
+        self.version = None
+        self.model_path = model_path or default_model_path()
         self.data_path = os.path.join(settings.BASE_DIR, 'hospital_app', 'ai_model', 'symptom_data.csv')
         
         # Initialize with dummy data if no model exists
@@ -24,6 +76,8 @@ class SymptomCheckerAI:
     
     def _create_dummy_data(self):
         """Create dummy symptom-disease data for demonstration"""
+        import pandas as pd
+        
         dummy_data = {
             'symptoms': [
                 'fever headache fatigue',
@@ -68,15 +122,19 @@ class SymptomCheckerAI:
                     self.model = model_data['model']
                     self.vectorizer = model_data['vectorizer']
                     self.conditions = model_data['conditions']
+                    self.version = model_data.get('version') or str(int(os.path.getmtime(self.model_path)))
             else:
                 self._train_model()
         except Exception as e:
-            print(f"Error loading model: {e}")
+            logger.warning('Error loading model, retraining: %s', e)
             self._train_model()
     
     def _train_model(self):
         """Train the symptom checker model"""
         try:
+            import pandas as pd
+            from sklearn.model_selection import train_test_split
+            
             # Load or create data
             if os.path.exists(self.data_path):
                 df = pd.read_csv(self.data_path)
@@ -93,31 +151,29 @@ class SymptomCheckerAI:
             # Split data
             X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
             
-            # Create pipeline
-            self.vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-            self.model = MultinomialNB()
-            
             # Train model
-            X_train_vectorized = self.vectorizer.fit_transform(X_train)
-            self.model.fit(X_train_vectorized, y_train)
+            self.vectorizer, self.model = fit_symptom_model(X_train, y_train)
+            self.conditions = self.model.classes_.tolist()
             
             # Save model
-            model_data = {
+            self.version = new_model_version()
+            save_model({
                 'model': self.model,
                 'vectorizer': self.vectorizer,
-                'conditions': self.conditions
-            }
+                'conditions': self.conditions,
+                'version': self.version
+            }, self.model_path)
             
-            with open(self.model_path, 'wb') as f:
-                pickle.dump(model_data, f)
-                
-        except Exception as e:
-            print(f"Error training model: {e}")
+        except Exception:
+            logger.exception('Error training model, using keyword matching')
             # Fallback to simple keyword matching
             self._create_fallback_model()
     
     def _create_fallback_model(self):
         """Create a simple fallback model based on keyword matching"""
+        self.model = None
+        self.vectorizer = None
+        self.version = 'fallback'
         self.conditions = [
             'flu', 'pneumonia', 'gastroenteritis', 'arthritis', 'dermatitis',
             'alzheimer', 'heart_attack', 'ibs', 'back_problems', 'strep_throat',
@@ -125,88 +181,36 @@ class SymptomCheckerAI:
             'fibromyalgia', 'depression', 'insomnia', 'diabetes'
         ]
         
-        # Simple keyword-based conditions
-        self.keyword_conditions = {
-            'flu': ['fever', 'headache', 'fatigue', 'body aches'],
-            'pneumonia': ['cough', 'chest pain', 'shortness of breath', 'fever'],
-            'gastroenteritis': ['nausea', 'vomiting', 'diarrhea', 'stomach pain'],
-            'arthritis': ['joint pain', 'swelling', 'stiffness'],
-            'dermatitis': ['rash', 'itching', 'redness'],
-            'alzheimer': ['dizziness', 'confusion', 'memory loss'],
-            'heart_attack': ['chest pain', 'shortness of breath', 'sweating'],
-            'ibs': ['abdominal pain', 'bloating', 'nausea'],
-            'back_problems': ['back pain', 'stiffness', 'limited movement'],
-            'strep_throat': ['sore throat', 'fever', 'swollen glands'],
-            'hypertension': ['high blood pressure', 'chest pain'],
-            'lupus': ['skin rash', 'joint pain', 'fatigue'],
-            'migraine': ['headache', 'blurred vision', 'nausea'],
-            'asthma': ['difficulty breathing', 'wheezing', 'cough'],
-            'food_poisoning': ['stomach pain', 'nausea', 'vomiting'],
-            'fibromyalgia': ['muscle pain', 'weakness', 'fatigue'],
-            'depression': ['anxiety', 'depression', 'mood changes'],
-            'insomnia': ['sleep problems', 'fatigue', 'irritability'],
-            'diabetes': ['weight loss', 'fatigue', 'weakness', 'frequent urination', 'thirst']
-        }
+        # Simple keyword-based conditions, compiled once per process
+        self.keyword_conditions = KEYWORD_CONDITIONS
+        self.keyword_matcher = default_keyword_matcher()
+    
+    @property
+    def cacheable(self):
+        """Bag-of-words predictions do not depend on token order"""
+        return self.model is not None and self.vectorizer is not None
     
     def predict(self, symptoms):
         """Predict conditions based on symptoms"""
+        return self.predict_batch([symptoms])[0]
+    
+    def predict_batch(self, symptoms_list, top_k=3):
+        """Predict conditions for several symptom texts at once"""
         try:
             if self.model and self.vectorizer:
-                # Use trained model
-                symptoms_vectorized = self.vectorizer.transform([symptoms])
-                probabilities = self.model.predict_proba(symptoms_vectorized)[0]
-                
-                # Get top predictions
-                top_indices = np.argsort(probabilities)[::-1][:3]
-                predicted_conditions = [self.conditions[i] for i in top_indices]
-                confidence_scores = {self.conditions[i]: float(probabilities[i]) for i in top_indices}
-                
+                # Vectorize the whole batch as one sparse matrix
+                symptoms_vectorized = self.vectorizer.transform(symptoms_list)
+                probabilities = self.model.predict_proba(symptoms_vectorized)
+                ranked = rank_top_k(probabilities, self.model.classes_, top_k)
             else:
                 # Use fallback keyword matching
-                symptoms_lower = symptoms.lower()
-                scores = {}
-                
-                for condition, keywords in self.keyword_conditions.items():
-                    score = sum(1 for keyword in keywords if keyword in symptoms_lower)
-                    if score > 0:
-                        scores[condition] = score / len(keywords)
-                
-                # Sort by score and get top 3
-                sorted_conditions = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:3]
-                predicted_conditions = [condition for condition, _ in sorted_conditions]
-                confidence_scores = {condition: score for condition, score in sorted_conditions}
-            
-            # Generate recommendations
-            recommendations = self._generate_recommendations(predicted_conditions, confidence_scores)
+                ranked = [self._keyword_scores(symptoms)[:top_k] for symptoms in symptoms_list]
             
-            return {
-                'conditions': predicted_conditions,
-                'confidence': confidence_scores,
-                'recommendations': recommendations
-            }
+            return [self._build_result(scored) for scored in ranked]
             
         except Exception as e:
-            return {
-                'conditions': ['general_consultation'],
-                'confidence': {'general_consultation': 0.5},
-                'recommendations': 'Please consult with a healthcare professional for proper diagnosis.'
-            }
+            return [self._default_result() for _ in symptoms_list]
     
-    def _generate_recommendations(self, conditions, confidence_scores):
-        """Generate recommendations based on predicted conditions"""
-        recommendations = []
-        
-        for condition in conditions:
-            confidence = confidence_scores.get(condition, 0)
-            
-            if confidence > 0.7:
-                recommendations.append(f"High probability of {condition.replace('_', ' ')}. Please consult a doctor immediately.")
-            elif confidence > 0.4:
-                recommendations.append(f"Moderate probability of {condition.replace('_', ' ')}. Consider consulting a doctor.")
-            else:
-                recommendations.append(f"Low probability of {condition.replace('_', ' ')}. Monitor symptoms and consult if they worsen.")
-        
-        if not recommendations:
-            recommendations.append("Please consult with a healthcare professional for proper diagnosis.")
-        
-        return " ".join(recommendations)
+    def _keyword_scores(self, symptoms):
+        """Score conditions by keyword overlap, best first"""
+        return self.keyword_matcher.score(symptoms)
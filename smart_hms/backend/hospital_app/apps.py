@@ -1,6 +1,29 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+# Features that are only correct when every worker process sees the
+# others' cache writes (revocations, invalidations)
+SHARED_CACHE_SETTINGS = ('AUTH_TOKEN_USER_MODE', 'DASHBOARD_CACHE_TTL')
+
+
+def check_shared_cache():
+    """Refuse to start with a shared-cache feature on a per-process cache"""
+    if settings.CACHE_IS_SHARED:
+        return
+    enabled = [name for name in SHARED_CACHE_SETTINGS if getattr(settings, name)]
+    if enabled:
+        raise ImproperlyConfigured(
+            f"{', '.join(enabled)} needs a cache shared by every worker process: "
+            'set CACHE_BACKEND and CACHE_LOCATION, or turn it off'
+        )
 
 
 class HospitalAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hospital_app'
+
+    def ready(self):
+        check_shared_cache()
+        from . import signals  # noqa: F401
@@ -0,0 +1,186 @@
+"""Stateless JWT authentication with role and profile claims
+
+Tokens issued by ``HospitalRefreshToken`` carry the user's ``role`` and
+``profile_id`` (the id of their Patient, Doctor or Admin row). With
+``AUTH_TOKEN_USER_MODE`` on, ``ClaimsJWTAuthentication`` turns such a token
+into a ``ClaimsUser`` without touching the database, and role-scoped
+querysets filter on the profile id through ``owner_filter``. Views that
+need the full ``User`` row call ``get_full_user``, which is served from a
+small per-process LRU.
+
+Deactivating a user or changing their role records a revocation time in
+Django's cache (see ``signals.py``); tokens from a login before that time
+are refused, both for requests and for refreshes, in every worker process
+at once. That needs a shared cache backend, so the mode defaults to off
+with the local-memory cache and refuses to start if turned on with it.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import User
+
+
+PROFILE_RELATIONS = {'patient': 'patient_profile', 'doctor': 'doctor_profile', 'admin': 'admin_profile'}
+REVOCATION_PREFIX = 'auth-revoked:'
+
+
+def profile_id_for(user):
+    """Id of the user's role profile, or None if it has none"""
+    relation = PROFILE_RELATIONS.get(user.role)
+    profile = getattr(user, relation, None) if relation else None
+    return profile.id if profile is not None else None
+
+
+def owner_filter(user, relation):
+    """Lookup restricting ``relation`` (e.g. 'patient', 'doctor') to the user's own profile
+
+    Claims users filter on the profile id from their token; database users
+    join through the profile's user.
+    """
+    if isinstance(user, ClaimsUser):
+        if user.profile_id is None:
+            return {'pk__in': []}
+        return {f'{relation}_id': user.profile_id}
+    return {f'{relation}__user': user}
+
+
+class HospitalRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry role and profile claims"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['role'] = user.role
+        token['profile_id'] = profile_id_for(user)
+        # Survives rotation, unlike iat, so a revocation also catches refreshed tokens
+        token['login_iat'] = token['iat']
+        return token
+
+
+def revoke_user_tokens(user_id):
+    """Refuse every token issued to a user before now"""
+    lifetime = api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+    cache.set(f'{REVOCATION_PREFIX}{user_id}', int(time.time()), int(lifetime) + 1)
+
+
+def is_revoked(token):
+    revoked_at = cache.get(f'{REVOCATION_PREFIX}{token.get(api_settings.USER_ID_CLAIM)}')
+    if revoked_at is None:
+        return False
+    return token.get('login_iat', token.get('iat', 0)) <= revoked_at
+
+
+class HospitalTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = HospitalRefreshToken
+
+
+class HospitalTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = HospitalRefreshToken
+
+    def validate(self, attrs):
+        if is_revoked(self.token_class(attrs['refresh'])):
+            raise InvalidToken('Token has been revoked')
+        return super().validate(attrs)
+
+
+class ClaimsUser(TokenUser):
+    """Request user built from token claims alone"""
+
+    @property
+    def role(self):
+        return self.token.get('role')
+
+    @property
+    def profile_id(self):
+        return self.token.get('profile_id')
+
+
+class FullUserCache:
+    """Per-process LRU of ``User`` rows for views that need more than the claims"""
+
+    def __init__(self, maxsize=None, ttl=None, clock=time.monotonic):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxsize(self):
+        return settings.AUTH_USER_CACHE_SIZE if self._maxsize is None else self._maxsize
+
+    @property
+    def ttl(self):
+        return settings.AUTH_USER_CACHE_TTL if self._ttl is None else self._ttl
+
+    def get(self, user_id):
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        user = User.objects.get(pk=user_id)
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {'size': len(self._entries), 'maxsize': self.maxsize, 'ttl_seconds': self.ttl,
+                'hits': self.hits, 'misses': self.misses}
+
+
+full_user_cache = FullUserCache()
+
+
+def get_full_user(user):
+    """The ``User`` row behind a request user"""
+    if isinstance(user, ClaimsUser):
+        return full_user_cache.get(user.id)
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWT authentication that skips the user lookup for tokens with claims
+
+    Tokens without a ``role`` claim (issued before this scheme) and every
+    token while ``AUTH_TOKEN_USER_MODE`` is off are resolved against the
+    database as usual.
+    """
+
+    def get_user(self, validated_token):
+        if not settings.AUTH_TOKEN_USER_MODE or 'role' not in validated_token:
+            return super().get_user(validated_token)
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        if is_revoked(validated_token):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return ClaimsUser(validated_token)
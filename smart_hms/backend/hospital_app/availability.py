@@ -0,0 +1,211 @@
+"""Doctor working hours and the per-day slot occupancy bitmap
+
+A day is cut into slots of ``APPOINTMENT_SLOT_MINUTES`` starting at
+midnight. ``SlotOccupancy`` stores one bitmap per doctor and day with a bit
+set for every slot a non-cancelled appointment starts in; ``WorkingHours``
+says which slots the doctor offers. Free slots are the offered bits that are
+not booked, so searching availability reads a handful of small rows per
+doctor and never the appointments.
+
+ORM saves and deletes of appointments keep the bitmaps current through
+``signals.py``; code that writes appointments with ``QuerySet.update()`` or
+``bulk_create()`` must call ``update_occupancy`` itself or run
+``rebuild_slot_occupancy`` afterwards. Days are calendar days in the current
+time zone, so changing ``TIME_ZONE`` or the slot length needs a rebuild.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Appointment, SlotOccupancy, WorkingHours
+
+
+# Statuses that leave the slot free
+RELEASED_STATUSES = ('cancelled',)
+SLOT_TAKEN = 'The doctor already has an appointment in this slot.'
+
+
+def slot_minutes():
+    minutes = settings.APPOINTMENT_SLOT_MINUTES
+    # Bit 63 is the sign bit of the bitmap column
+    if minutes <= 0 or 1440 % minutes or 1440 // minutes > 63:
+        raise ImproperlyConfigured('APPOINTMENT_SLOT_MINUTES must divide a day into at most 63 slots')
+    return minutes
+
+
+def slot_of(when):
+    """``(day, slot index)`` of the slot a datetime falls in"""
+    local = timezone.localtime(when) if timezone.is_aware(when) else when
+    return local.date(), (local.hour * 60 + local.minute) // slot_minutes()
+
+
+def slot_start(day, index):
+    """Start of slot ``index`` on ``day``"""
+    start = datetime.combine(day, time()) + timedelta(minutes=index * slot_minutes())
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def hours_mask(start_time, end_time):
+    """Bitmap of the slots lying wholly between two times of day"""
+    minutes = slot_minutes()
+    first = -(-(start_time.hour * 60 + start_time.minute) // minutes)
+    last = (end_time.hour * 60 + end_time.minute) // minutes
+    return sum(1 << index for index in range(first, last))
+
+
+def held_slot(row):
+    """``(doctor_id, day, index)`` held by a ``(status, appointment_date, doctor_id)`` row, if any"""
+    if row is None or row[0] in RELEASED_STATUSES:
+        return None
+    return (row[2], *slot_of(row[1]))
+
+
+# Incremental maintenance
+
+def occupy(doctor_id, day, index):
+    """Mark a slot as booked"""
+    bit = 1 << index
+    rows = SlotOccupancy.objects.filter(doctor_id=doctor_id, day=day)
+    if rows.update(booked=F('booked').bitor(bit)):
+        return
+    try:
+        with transaction.atomic():
+            SlotOccupancy.objects.create(doctor_id=doctor_id, day=day, booked=bit)
+    except IntegrityError:
+        # Another writer created the day first
+        rows.update(booked=F('booked').bitor(bit))
+
+
+def release(doctor_id, day, index):
+    """Mark a slot as free unless another appointment still holds it"""
+    start = slot_start(day, index)
+    holders = Appointment.objects.filter(
+        doctor_id=doctor_id, appointment_date__gte=start, appointment_date__lt=start + timedelta(minutes=slot_minutes())
+    ).exclude(status__in=RELEASED_STATUSES)
+    if not holders.exists():
+        SlotOccupancy.objects.filter(doctor_id=doctor_id, day=day).update(booked=F('booked').bitand(~(1 << index)))
+
+
+def update_occupancy(old, new):
+    """Move an appointment's slot from ``old`` to ``new``
+
+    Both are ``(status, appointment_date, doctor_id)`` or None for a row that
+    does not exist (before a create, after a delete). Call after the write.
+    """
+    old_slot, new_slot = held_slot(old), held_slot(new)
+    if old_slot == new_slot:
+        return
+    with transaction.atomic():
+        if old_slot is not None:
+            release(*old_slot)
+        if new_slot is not None:
+            occupy(*new_slot)
+
+
+# Rebuilding
+
+def expected_occupancy():
+    """``{(doctor_id, day): bitmap}`` computed from the appointments"""
+    bitmaps = {}
+    rows = Appointment.objects.exclude(status__in=RELEASED_STATUSES).values_list('doctor_id', 'appointment_date')
+    for doctor_id, when in rows.iterator():
+        day, index = slot_of(when)
+        bitmaps[(doctor_id, day)] = bitmaps.get((doctor_id, day), 0) | 1 << index
+    return bitmaps
+
+
+def rebuild_slot_occupancy():
+    """Replace every bitmap with one computed from the appointments; returns the count"""
+    bitmaps = expected_occupancy()
+    with transaction.atomic():
+        SlotOccupancy.objects.all().delete()
+        SlotOccupancy.objects.bulk_create([
+            SlotOccupancy(doctor_id=doctor_id, day=day, booked=booked)
+            for (doctor_id, day), booked in bitmaps.items()
+        ], batch_size=1000)
+    return len(bitmaps)
+
+
+def verify_slot_occupancy():
+    """List ``(doctor_id, day), stored, expected`` for every bitmap that is wrong"""
+    expected = expected_occupancy()
+    stored = {
+        (doctor_id, day): booked
+        for doctor_id, day, booked in SlotOccupancy.objects.exclude(booked=0).values_list(
+            'doctor_id', 'day', 'booked'
+        ).iterator()
+    }
+    return [
+        (key, stored.get(key, 0), expected.get(key, 0))
+        for key in sorted(set(expected) | set(stored))
+        if stored.get(key, 0) != expected.get(key, 0)
+    ]
+
+
+# Reading
+
+def weekly_masks(doctor_ids):
+    """``{doctor_id: {weekday: bitmap of offered slots}}``"""
+    masks = {}
+    rows = WorkingHours.objects.filter(doctor_id__in=doctor_ids).values_list('doctor_id', 'weekday', 'start_time', 'end_time')
+    for doctor_id, weekday, start_time, end_time in rows:
+        week = masks.setdefault(doctor_id, {})
+        week[weekday] = week.get(weekday, 0) | hours_mask(start_time, end_time)
+    return masks
+
+
+def slot_problem(doctor_id, when):
+    """Why ``when`` cannot be booked with a doctor, or None if it can"""
+    day, index = slot_of(when)
+    week = weekly_masks([doctor_id]).get(doctor_id)
+    if week is not None and not week.get(day.weekday(), 0) >> index & 1:
+        return 'The doctor does not take appointments at this time.'
+    booked = SlotOccupancy.objects.filter(doctor_id=doctor_id, day=day).values_list('booked', flat=True).first()
+    if booked is not None and booked >> index & 1:
+        return SLOT_TAKEN
+    return None
+
+
+def free_slots(doctors, first_day, days, limit, now=None):
+    """The earliest free slots of any of ``doctors`` from ``first_day`` on
+
+    ``doctors`` is a queryset of the doctors to consider. Returns up to
+    ``limit`` ``(start, doctor_id)`` pairs, earliest first, skipping slots
+    that have already started. Runs two queries: working hours and bitmaps.
+    """
+    now = now or timezone.now()
+    last_day = first_day + timedelta(days=days - 1)
+    masks = weekly_masks(doctors.values('id'))
+    booked = {
+        (doctor_id, day): bitmap
+        for doctor_id, day, bitmap in SlotOccupancy.objects.filter(
+            doctor_id__in=list(masks), day__range=(first_day, last_day)
+        ).values_list('doctor_id', 'day', 'booked')
+    }
+    today = slot_of(now)[0]
+    slots = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        if day < today:
+            continue
+        candidates = []
+        for doctor_id, week in masks.items():
+            free = week.get(day.weekday(), 0) & ~booked.get((doctor_id, day), 0)
+            index = 0
+            while free:
+                if free & 1:
+                    candidates.append((index, doctor_id))
+                free >>= 1
+                index += 1
+        for index, doctor_id in sorted(candidates):
+            start = slot_start(day, index)
+            if start < now:
+                continue
+            slots.append((start, doctor_id))
+            if len(slots) == limit:
+                return slots
+    return slots
@@ -0,0 +1,107 @@
+"""Helpers shared by the benchmark management commands
+
+Reports are plain JSON. Regressions are found by comparing every numeric
+metric with the same key in a stored baseline; the direction of a metric is
+read from its name:
+
+* lower is better: ``*_ms``, ``*_seconds``, ``*_mb``, ``*_queries``, ``*_bytes``
+* higher is better: ``*_per_second``, ``*accuracy``
+
+Other numbers (sizes, counts) are recorded but never compared.
+"""
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+
+LOWER_IS_BETTER = ('_ms', '_seconds', '_mb', '_queries', '_bytes')
+HIGHER_IS_BETTER = ('_per_second', 'accuracy')
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of ``values`` (0 <= pct <= 100)"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize_latencies(seconds):
+    """p50/p95/p99/mean in milliseconds for a list of durations in seconds"""
+    millis = [value * 1000 for value in seconds]
+    return {
+        'p50_ms': percentile(millis, 50),
+        'p95_ms': percentile(millis, 95),
+        'p99_ms': percentile(millis, 99),
+        'mean_ms': sum(millis) / len(millis) if millis else 0.0,
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def new_report(name, **extra):
+    """Skeleton report with environment details"""
+    return dict({
+        'benchmark': name,
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': {},
+    }, **extra)
+
+
+def write_report(report, path):
+    """Write a report as JSON, creating parent directories"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load_report(path):
+    """Load a stored report, or None if it does not exist"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _flatten(data, prefix=''):
+    for key, value in data.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            yield from _flatten(value, f'{name}.')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def compare_to_baseline(current, baseline, tolerance=0.2):
+    """Return a description of every metric that regressed beyond ``tolerance``
+
+    Only ``results`` are compared, and only keys present in both reports.
+    """
+    baseline_metrics = dict(_flatten(baseline.get('results', {})))
+    regressions = []
+    for name, value in _flatten(current.get('results', {})):
+        reference = baseline_metrics.get(name)
+        if reference is None or reference == 0:
+            continue
+        metric = name.rsplit('.', 1)[-1]
+        if metric.endswith(LOWER_IS_BETTER) and value > reference * (1 + tolerance):
+            regressions.append(f'{name}: {value:.4g} vs baseline {reference:.4g} (+{(value / reference - 1) * 100:.0f}%)')
+        elif metric.endswith(HIGHER_IS_BETTER) and value < reference * (1 - tolerance):
+            regressions.append(f'{name}: {value:.4g} vs baseline {reference:.4g} (-{(1 - value / reference) * 100:.0f}%)')
+    return regressions
@@ -0,0 +1,120 @@
+"""Appointment writes that stay correct when many clients book at once
+
+Two things in the database make booking safe without locks:
+
+* ``appointment_slot_unique`` admits one non-cancelled appointment per
+  doctor and start time, and the API only accepts start times on slot
+  boundaries, so two racing bookings of a slot cannot both commit.
+* ``Appointment.version`` turns every save into a compare-and-set, so a
+  write based on a stale read fails instead of overwriting the other one.
+
+``save_booking`` runs a write in its own transaction and reports either
+failure as ``BookingConflict`` (HTTP 409); the client reloads and retries.
+The slot bitmap check in ``AppointmentSerializer`` answers the common case
+early with the same error.
+
+``bulk_set_status`` moves many appointments along ``STATUS_TRANSITIONS`` in
+one ``UPDATE``, bumping their versions and the derived tables itself.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .availability import SLOT_TAKEN, update_occupancy
+from .dashboard_cache import dashboard_cache
+from .models import StaleVersionError
+from .stats import appointment_deltas, apply_deltas
+
+
+SLOT_CONSTRAINT = 'appointment_slot_unique'
+STALE = 'The appointment was changed by someone else; reload it and try again.'
+# Where confirm, cancel and bulk changes may move each status. Reopening a
+# cancelled appointment needs its slot checked, so it goes through an edit.
+STATUS_TRANSITIONS = {
+    'scheduled': ('confirmed', 'cancelled'),
+    'confirmed': ('in_progress', 'completed', 'cancelled'),
+    'in_progress': ('completed',),
+}
+BULK_TARGETS = sorted({target for targets in STATUS_TRANSITIONS.values() for target in targets})
+
+
+class BookingConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = SLOT_TAKEN
+    default_code = 'conflict'
+
+
+def is_slot_conflict(error):
+    """Whether an IntegrityError comes from ``appointment_slot_unique``"""
+    message = str(error)
+    # PostgreSQL names the constraint, SQLite lists its columns
+    return SLOT_CONSTRAINT in message or 'appointment.appointment_date' in message
+
+
+def check_version(appointment, version):
+    """Fail early if the client read an older ``version`` than was just loaded"""
+    # The save would fail anyway, after a read that SQLite cannot upgrade
+    # to a write while another writer holds the lock
+    if version is not None and version != appointment.version:
+        raise BookingConflict(STALE)
+
+
+def save_booking(save, *args, **kwargs):
+    """Call ``save`` atomically, raising ``BookingConflict`` if it lost a race"""
+    try:
+        with transaction.atomic():
+            return save(*args, **kwargs)
+    except StaleVersionError:
+        raise BookingConflict(STALE)
+    except IntegrityError as e:
+        if is_slot_conflict(e):
+            raise BookingConflict(SLOT_TAKEN)
+        raise
+
+
+def bulk_set_status(appointments, ids, new_status):
+    """Move the appointments with ``ids`` in ``appointments`` to ``new_status``
+
+    ``appointments`` is the caller's scope; ids outside it are reported as
+    not found. Allowed rows change in one ``UPDATE``, after their current
+    state is read under a row lock so the derived tables move with them.
+    Returns ``{'id', 'outcome'}`` per distinct id, in order, where outcome
+    is ``updated``, ``unchanged``, ``not_found`` or ``invalid_transition``;
+    updated rows add their new ``version``, the others their ``status``.
+    """
+    ids = list(dict.fromkeys(ids))
+    sources = [old for old, targets in STATUS_TRANSITIONS.items() if new_status in targets]
+    with transaction.atomic():
+        rows = {
+            row[0]: row for row in appointments.filter(id__in=ids).order_by().select_for_update(of=('self',)).values_list(
+                'id', 'status', 'appointment_date', 'doctor_id', 'version', 'patient__user_id', 'doctor__user_id',
+            )
+        }
+        moving = [row for row in rows.values() if row[1] in sources]
+        if moving:
+            appointments.filter(id__in=[row[0] for row in moving], status__in=sources).update(
+                status=new_status, version=F('version') + 1, updated_at=timezone.now(),
+            )
+            # QuerySet.update() skips the signals that keep these in step
+            deltas = Counter()
+            for _, old_status, when, doctor_id, *_ in moving:
+                deltas.update(appointment_deltas((old_status, when, doctor_id), (new_status, when, doctor_id)))
+                update_occupancy((old_status, when, doctor_id), (new_status, when, doctor_id))
+            apply_deltas({key: delta for key, delta in deltas.items() if delta})
+            dashboard_cache.invalidate({user_id for row in moving for user_id in row[5:]})
+
+    results = []
+    for pk in ids:
+        row = rows.get(pk)
+        if row is None:
+            results.append({'id': pk, 'outcome': 'not_found'})
+        elif row[1] in sources:
+            results.append({'id': pk, 'outcome': 'updated', 'version': row[4] + 1})
+        else:
+            outcome = 'unchanged' if row[1] == new_status else 'invalid_transition'
+            results.append({'id': pk, 'outcome': outcome, 'status': row[1]})
+    return results
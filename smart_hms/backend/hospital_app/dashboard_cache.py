@@ -0,0 +1,100 @@
+"""Per-user dashboard snapshots in Django's cache
+
+Patient and doctor dashboards are stored as rendered JSON under a per-user
+generation number. Writes that change what a user's dashboard shows bump
+that user's generation (see ``signals.py``), so the next request misses and
+renders afresh. A request that rendered from data older than a concurrent
+write stores its snapshot under the old generation, where it is never read.
+
+The snapshots and generations must be shared by all worker processes, or
+one worker's invalidation would never reach the others, so the cache is off
+by default without a shared backend and refuses to start if turned on
+(``apps.check_shared_cache``). The hit and miss counters are per process.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+SNAPSHOT_PREFIX = 'dashboard-snapshot:'
+GENERATION_PREFIX = 'dashboard-generation:'
+
+
+class DashboardSnapshotCache:
+    """Rendered dashboards keyed by user and generation"""
+
+    def __init__(self, ttl=None):
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    @property
+    def ttl(self):
+        return settings.DASHBOARD_CACHE_TTL if self._ttl is None else self._ttl
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, user_id):
+        """Return ``(snapshot or None, generation)`` for a user"""
+        generation = cache.get(f'{GENERATION_PREFIX}{user_id}', 0)
+        snapshot = cache.get(f'{SNAPSHOT_PREFIX}{user_id}:{generation}')
+        self._count('hits' if snapshot is not None else 'misses')
+        return snapshot, generation
+
+    def set(self, user_id, generation, snapshot):
+        cache.set(f'{SNAPSHOT_PREFIX}{user_id}:{generation}', snapshot, self.ttl)
+        self._count('stores')
+
+    def _bump(self, user_ids):
+        for user_id in user_ids:
+            key = f'{GENERATION_PREFIX}{user_id}'
+            try:
+                cache.incr(key)
+            except ValueError:
+                # No generation yet; a lost race to add it still moves past 0
+                if not cache.add(key, 1, None):
+                    cache.incr(key)
+            self._count('invalidations')
+
+    def invalidate(self, user_ids):
+        """Drop the snapshots of ``user_ids`` now and again once the write commits
+
+        The second bump covers a reader that rendered the uncommitted
+        transaction's old data in between.
+        """
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        if not user_ids or not self.enabled:
+            return
+        self._bump(user_ids)
+        transaction.on_commit(lambda: self._bump(user_ids))
+
+    def stats(self):
+        """Counters for the metrics endpoint"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'stores': self.stores,
+            'invalidations': self.invalidations,
+        }
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = self.stores = self.invalidations = 0
+
+
+dashboard_cache = DashboardSnapshotCache()
@@ -0,0 +1,407 @@
+"""Deterministic synthetic hospital data for load tests and benchmarks
+
+``LoadDataGenerator`` creates doctors, patients and an admin, then any
+number of appointments with medical records and prescriptions for the
+completed ones. The same seed, sizes, batch size and anchor date always
+produce the same rows.
+
+The distributions aim to look like a real clinic: a few doctors and
+patients account for most visits, bookings fall in 30-minute weekday slots
+with a morning peak and grow over the year, past appointments are mostly
+completed and future ones scheduled or confirmed. No doctor is booked twice
+for the same slot except by cancelled appointments.
+
+Rows are written in batches with ``bulk_create``, or with ``COPY`` on
+PostgreSQL. Primary keys are allocated up front so related rows can be
+written without reading anything back. Neither path sends signals, so
+callers run ``rebuild_derived`` once they are done.
+"""
+import io
+import json
+import math
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from random import Random
+
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import (
+    User, Patient, Doctor, Admin, Appointment, AppointmentStat, DoctorPatient, MedicalRecord, Prescription, SlotOccupancy,
+    SymptomChecker, WorkingHours,
+)
+from .availability import rebuild_slot_occupancy
+from .relationships import rebuild_doctor_patients
+from .stats import rebuild_appointment_stats
+
+
+USERNAME_PREFIX = 'load_'
+SLOT_MINUTES = 30
+# 08:00 to 18:00; busiest mid-morning, quiet over lunch
+SLOT_WEIGHTS = [3, 4, 5, 6, 6, 5, 4, 3, 1, 1, 3, 4, 4, 4, 3, 3, 2, 2, 1, 1]
+FIRST_SLOT = time(8, 0)
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 0.9, 0.3, 0.05]
+# Days busier than this get working hours; the odd Sunday visit falls outside them
+WORKING_DAY_WEIGHT = 0.1
+# Share of all doctor slots that may be booked; popular doctors fill up long before
+MAX_OCCUPANCY = 0.5
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+               'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Amir', 'Mei',
+               'Kwame', 'Priya', 'Diego', 'Aisha', 'Ivan', 'Yuki', 'Fatima', 'Lars', 'Chen', 'Olga']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee', 'Khan',
+              'Nguyen', 'Okafor', 'Patel', 'Kim', 'Ivanova', 'Tanaka', 'Haddad', 'Larsen', 'Wang', 'Silva']
+BLOOD_TYPES = (['O+'] * 37 + ['A+'] * 36 + ['B+'] * 9 + ['AB+'] * 3 + ['O-'] * 7 + ['A-'] * 6 + ['B-', 'AB-'])
+REASONS = ['Regular checkup', 'Follow-up visit', 'Chest pain', 'Headache', 'Back pain', 'Skin rash', 'Fever',
+           'Vaccination', 'Blood pressure review', 'Medication review', 'Joint pain', 'Anxiety', 'Cough']
+DIAGNOSES = [
+    ('Hypertension', 'Elevated blood pressure', 'Lifestyle changes and ACE inhibitor'),
+    ('Migraine', 'Recurring headache, light sensitivity', 'Pain relief and trigger diary'),
+    ('Upper respiratory infection', 'Cough, sore throat, fever', 'Rest and fluids'),
+    ('Lower back strain', 'Back pain after lifting', 'Physiotherapy'),
+    ('Eczema', 'Itchy dry skin', 'Emollients and topical steroid'),
+    ('Type 2 diabetes', 'Thirst, fatigue', 'Metformin and diet plan'),
+    ('Generalized anxiety', 'Worry, poor sleep', 'CBT referral'),
+    ('Osteoarthritis', 'Knee pain and stiffness', 'Exercise and analgesia'),
+]
+MEDICATIONS = [
+    ('Lisinopril', '10mg', 'Once daily', '90 days'),
+    ('Ibuprofen', '400mg', 'Three times daily', '7 days'),
+    ('Amoxicillin', '500mg', 'Three times daily', '7 days'),
+    ('Metformin', '500mg', 'Twice daily', '90 days'),
+    ('Sumatriptan', '50mg', 'As needed', '30 days'),
+    ('Hydrocortisone cream', '1%', 'Twice daily', '14 days'),
+    ('Sertraline', '50mg', 'Once daily', '180 days'),
+    ('Paracetamol', '1g', 'Four times daily', '5 days'),
+]
+PAST_STATUSES = (['completed', 'cancelled'], [85, 15])
+TODAY_STATUSES = (['scheduled', 'confirmed', 'in_progress', 'completed', 'cancelled'], [30, 30, 10, 20, 10])
+FUTURE_STATUSES = (['scheduled', 'confirmed', 'cancelled'], [55, 35, 10])
+
+
+def cumulative(weights):
+    total, out = 0.0, []
+    for weight in weights:
+        total += weight
+        out.append(total)
+    return out
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let ``bulk_create`` store the ``auto_now``/``auto_now_add`` values we set"""
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for field, auto_now, auto_now_add in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _copy_value(value):
+    """A value in PostgreSQL's COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class LoadDataGenerator:
+    """Builds one synthetic dataset; call ``create_people`` then ``add_appointments``"""
+
+    def __init__(self, seed=42, doctors=100, patients=1000, days_back=365, days_ahead=30, anchor=None,
+                 batch_size=10000, use_copy=None, record_ratio=0.6, prescriptions_per_record=1.2):
+        self.rng = Random(seed)
+        self.doctor_count = doctors
+        self.patient_count = patients
+        self.days_back = days_back
+        self.days_ahead = days_ahead
+        self.anchor = anchor or timezone.localdate()
+        self.batch_size = batch_size
+        self.use_copy = connection.vendor == 'postgresql' if use_copy is None else use_copy
+        if self.use_copy and connection.vendor != 'postgresql':
+            raise ValueError('COPY loading needs PostgreSQL')
+        self.record_ratio = record_ratio
+        self.prescriptions_per_record = prescriptions_per_record
+        self._next_id = {}
+        self.counts = {'appointments': 0, 'medical_records': 0, 'prescriptions': 0}
+
+        self.days = [self.anchor + timedelta(days=offset) for offset in range(-days_back, days_ahead)]
+        self._day_weights = cumulative(self._day_weight(offset) for offset in range(-days_back, days_ahead))
+        self._slot_weights = cumulative(SLOT_WEIGHTS)
+        self._slot_starts = [
+            [timezone.make_aware(datetime.combine(day, FIRST_SLOT) + timedelta(minutes=SLOT_MINUTES * slot))
+             for slot in range(len(SLOT_WEIGHTS))]
+            for day in self.days
+        ]
+        # One byte per doctor, day and slot; set while a non-cancelled appointment holds it
+        self._occupied = bytearray(doctors * len(self.days) * len(SLOT_WEIGHTS))
+        self._booked = 0
+
+    def _day_weight(self, offset):
+        day = self.anchor + timedelta(days=offset)
+        weight = WEEKDAY_WEIGHTS[day.weekday()]
+        if offset < 0:
+            # The practice grows over the year
+            weight *= 0.6 + 0.4 * (offset + self.days_back) / self.days_back
+        else:
+            # Fewer bookings the further ahead
+            weight *= max(0.05, 1 - offset / self.days_ahead)
+        return weight
+
+    @property
+    def capacity(self):
+        return len(self._occupied)
+
+    # Primary keys
+
+    def _allocate_ids(self, model, count):
+        """``count`` fresh primary keys for ``model``"""
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+                    [model._meta.db_table, model._meta.pk.column, count],
+                )
+                return [row[0] for row in cursor.fetchall()]
+        # Other backends take explicit ids and continue after the largest one
+        if model not in self._next_id:
+            self._next_id[model] = (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+        start = self._next_id[model]
+        self._next_id[model] = start + count
+        return list(range(start, start + count))
+
+    def _write(self, model, objs):
+        if not objs:
+            return
+        for obj, pk in zip(objs, self._allocate_ids(model, len(objs))):
+            obj.pk = pk
+        if self.use_copy:
+            self._copy(model, objs)
+        else:
+            with explicit_timestamps(model):
+                model.objects.bulk_create(objs)
+
+    def _copy(self, model, objs):
+        fields = model._meta.concrete_fields
+        buffer = io.StringIO()
+        for obj in objs:
+            buffer.write('\t'.join(_copy_value(getattr(obj, field.attname)) for field in fields))
+            buffer.write('\n')
+        buffer.seek(0)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        sql = f'COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN'
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):
+                raw.copy_expert(sql, buffer)
+            else:
+                # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+    # People
+
+    def _name(self):
+        return self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+
+    def create_people(self):
+        """Create the admin, doctors and patients; returns the admin user"""
+        rng = self.rng
+        choices = [code for code, label in Doctor.SPECIALIZATION_CHOICES]
+        with transaction.atomic():
+            admin = User(username=f'{USERNAME_PREFIX}admin', role='admin', password='!',
+                         first_name='Load', last_name='Admin')
+            doctor_users, patient_users = [], []
+            for i in range(self.doctor_count):
+                first_name, last_name = self._name()
+                doctor_users.append(User(username=f'{USERNAME_PREFIX}doctor_{i:06d}', role='doctor', password='!',
+                                         first_name=first_name, last_name=last_name))
+            for i in range(self.patient_count):
+                first_name, last_name = self._name()
+                patient_users.append(User(
+                    username=f'{USERNAME_PREFIX}patient_{i:07d}', role='patient', password='!',
+                    first_name=first_name, last_name=last_name,
+                    date_of_birth=self.anchor - timedelta(days=rng.randint(365, 90 * 365)),
+                ))
+            users = [admin] + doctor_users + patient_users
+            joined = timezone.make_aware(datetime.combine(self.days[0], FIRST_SLOT))
+            for user in users:
+                user.date_joined = user.created_at = user.updated_at = joined
+            for offset in range(0, len(users), self.batch_size):
+                self._write(User, users[offset:offset + self.batch_size])
+
+            self._write(Admin, [Admin(user=admin, employee_id=f'{USERNAME_PREFIX}ADM'.upper(), department='Operations')])
+            doctors = [
+                Doctor(user=user, license_number=f'LOAD{i:06d}', specialization=rng.choice(choices),
+                       experience_years=rng.randint(1, 35), consultation_fee=rng.choice([50, 75, 100, 150, 200]))
+                for i, user in enumerate(doctor_users)
+            ]
+            patients = [Patient(user=user, blood_type=rng.choice(BLOOD_TYPES)) for user in patient_users]
+            # Every doctor works the generated slots on the days that see real traffic
+            last_slot = (datetime.combine(self.anchor, FIRST_SLOT) + timedelta(minutes=SLOT_MINUTES * len(SLOT_WEIGHTS))).time()
+            hours = [
+                WorkingHours(doctor=doctor, weekday=weekday, start_time=FIRST_SLOT, end_time=last_slot)
+                for doctor in doctors for weekday, weight in enumerate(WEEKDAY_WEIGHTS) if weight >= WORKING_DAY_WEIGHT
+            ]
+            for model, objs in ((Doctor, doctors), (Patient, patients), (WorkingHours, hours)):
+                for offset in range(0, len(objs), self.batch_size):
+                    self._write(model, objs[offset:offset + self.batch_size])
+
+        self.doctor_ids = [doctor.pk for doctor in doctors]
+        self.patient_ids = [patient.pk for patient in patients]
+        self.specializations = [doctor.specialization for doctor in doctors]
+        # A few doctors and frequent patients take most of the visits
+        ranks = list(range(len(doctors)))
+        rng.shuffle(ranks)
+        self._doctor_weights = cumulative(1 / (rank + 1) ** 0.8 for rank in ranks)
+        self._patient_weights = cumulative(rng.paretovariate(1.5) for _ in patients)
+        return admin
+
+    # Appointments and what follows from them
+
+    def _pick_slot(self):
+        """``(doctor index, day index, slot, status)`` for one appointment"""
+        rng = self.rng
+        slots = len(SLOT_WEIGHTS)
+        for _ in range(100):
+            doctor = rng.choices(range(self.doctor_count), cum_weights=self._doctor_weights)[0]
+            day = rng.choices(range(len(self.days)), cum_weights=self._day_weights)[0]
+            slot = rng.choices(range(slots), cum_weights=self._slot_weights)[0]
+            offset = day - self.days_back
+            statuses, weights = PAST_STATUSES if offset < 0 else TODAY_STATUSES if offset == 0 else FUTURE_STATUSES
+            appointment_status = rng.choices(statuses, weights=weights)[0]
+            if appointment_status == 'cancelled':
+                return doctor, day, slot, appointment_status
+            index = (doctor * len(self.days) + day) * slots + slot
+            if not self._occupied[index]:
+                self._occupied[index] = 1
+                self._booked += 1
+                return doctor, day, slot, appointment_status
+        raise RuntimeError('Schedules are too full; use more doctors or a longer date range')
+
+    def add_appointments(self, count, progress=None):
+        """Add ``count`` appointments with their records and prescriptions"""
+        if self._booked + count > MAX_OCCUPANCY * self.capacity:
+            raise ValueError(
+                f'{count} more appointments would fill over {MAX_OCCUPANCY:.0%} of the {self.capacity} '
+                f'doctor slots; use more doctors or a longer date range'
+            )
+        remaining = count
+        while remaining > 0:
+            size = min(self.batch_size, remaining)
+            with transaction.atomic():
+                self._add_batch(size)
+            remaining -= size
+            if progress:
+                progress(count - remaining, count)
+
+    def _add_batch(self, size):
+        rng = self.rng
+        appointments = []
+        for _ in range(size):
+            doctor, day, slot, appointment_status = self._pick_slot()
+            when = self._slot_starts[day][slot]
+            booked = when - timedelta(days=rng.randint(0, 30), minutes=rng.randint(0, 600))
+            appointments.append(Appointment(
+                patient_id=self.patient_ids[rng.choices(range(self.patient_count), cum_weights=self._patient_weights)[0]],
+                doctor_id=self.doctor_ids[doctor], appointment_date=when, status=appointment_status,
+                reason=rng.choice(REASONS), notes='', created_at=booked, updated_at=booked,
+            ))
+        self._write(Appointment, appointments)
+
+        records = []
+        for appointment in appointments:
+            if appointment.status == 'completed' and rng.random() < self.record_ratio:
+                diagnosis, symptoms, treatment_plan = rng.choice(DIAGNOSES)
+                written = appointment.appointment_date + timedelta(minutes=SLOT_MINUTES)
+                records.append(MedicalRecord(
+                    patient_id=appointment.patient_id, doctor_id=appointment.doctor_id, appointment_id=appointment.pk,
+                    diagnosis=diagnosis, symptoms=symptoms, treatment_plan=treatment_plan,
+                    vital_signs={'bp': f'{rng.randint(100, 160)}/{rng.randint(60, 100)}',
+                                 'pulse': rng.randint(55, 110), 'temp_c': round(rng.gauss(36.9, 0.5), 1)},
+                    created_at=written, updated_at=written,
+                ))
+        self._write(MedicalRecord, records)
+
+        prescriptions = []
+        active_since = timezone.make_aware(datetime.combine(self.anchor, time())) - timedelta(days=30)
+        for record in records:
+            # Poisson-distributed number of medications per record
+            limit, count, product = math.exp(-self.prescriptions_per_record), 0, rng.random()
+            while product > limit:
+                count += 1
+                product *= rng.random()
+            for medication_name, dosage, frequency, duration in rng.sample(MEDICATIONS, min(count, len(MEDICATIONS))):
+                prescriptions.append(Prescription(
+                    patient_id=record.patient_id, doctor_id=record.doctor_id, medical_record_id=record.pk,
+                    medication_name=medication_name, dosage=dosage, frequency=frequency, duration=duration,
+                    instructions='Take with food', is_active=record.created_at >= active_since,
+                    created_at=record.created_at,
+                ))
+        self._write(Prescription, prescriptions)
+
+        self.counts['appointments'] += len(appointments)
+        self.counts['medical_records'] += len(records)
+        self.counts['prescriptions'] += len(prescriptions)
+
+    @staticmethod
+    def default_doctors(appointments):
+        """Enough doctors that the schedules stay realistically sparse"""
+        return max(10, appointments // 2000)
+
+    @staticmethod
+    def default_patients(appointments):
+        return max(100, appointments // 8)
+
+    def rebuild_derived(self):
+        """Bring the tables the skipped signals maintain up to date"""
+        return {
+            'appointment_stats': rebuild_appointment_stats(),
+            'doctor_patients': rebuild_doctor_patients(),
+            'slot_occupancy': rebuild_slot_occupancy(),
+        }
+
+
+def delete_load_data():
+    """Remove every generated user with their profiles and visits; returns counts per model
+
+    Deletes with plain ``DELETE`` statements, children first: the ORM's
+    cascade would load millions of rows and fire a signal for each. The
+    derived tables must be rebuilt afterwards.
+    """
+    users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+    patients = Q(patient__user__in=users)
+    doctors = Q(doctor__user__in=users)
+    steps = [
+        (Prescription, patients | doctors),
+        (MedicalRecord, patients | doctors),
+        (SymptomChecker, patients),
+        (Appointment, patients | doctors),
+        (DoctorPatient, patients | doctors),
+        (AppointmentStat, doctors),
+        (SlotOccupancy, doctors),
+        (WorkingHours, doctors),
+        (Patient, Q(user__in=users)),
+        (Doctor, Q(user__in=users)),
+        (Admin, Q(user__in=users)),
+        (User, Q(pk__in=users)),
+    ]
+    deleted = {}
+    with transaction.atomic():
+        for model, condition in steps:
+            deleted[model._meta.label] = model.objects.filter(condition)._raw_delete(connection.alias)
+    return deleted
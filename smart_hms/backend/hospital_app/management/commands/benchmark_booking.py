@@ -0,0 +1,269 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from random import Random
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from hospital_app.benchmarking import (
+    compare_to_baseline, load_report, new_report, peak_rss_mb, summarize_latencies, write_report,
+)
+
+
+FIRST_SLOT_HOUR = 8
+
+
+def default_baseline_path():
+    return os.path.join(settings.BASE_DIR, 'benchmarks', 'booking_baseline.json')
+
+
+class Command(BaseCommand):
+    help = 'Book the same slots from many threads at once and check nothing is double booked or lost'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent patients booking')
+        parser.add_argument('--doctors', type=int, default=5)
+        parser.add_argument('--slots', type=int, default=20, help='Slots per doctor that every thread tries to book')
+        parser.add_argument('--updates', type=int, default=50, help='Read-then-write edits per thread in the update phase')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default=None, help='Write the JSON report here')
+        parser.add_argument('--baseline', default=default_baseline_path(), help='Baseline report to compare against')
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression (0.2 = 20%%)')
+
+    def _setup(self, options):
+        from hospital_app.availability import slot_minutes
+        from hospital_app.models import Doctor, Patient, User, WorkingHours
+
+        day = timezone.localdate() + timedelta(days=1)
+        first = timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=FIRST_SLOT_HOUR))
+        last = first + timedelta(minutes=slot_minutes() * options['slots'])
+        if last.date() != day:
+            raise CommandError('--slots must fit in one day after 08:00')
+        doctors = []
+        for i in range(options['doctors']):
+            user = User.objects.create(username=f'bench_booking_doctor_{i}', role='doctor', password='!')
+            doctors.append(Doctor.objects.create(user=user, license_number=f'BOOK{i:06d}'))
+        WorkingHours.objects.bulk_create([
+            WorkingHours(doctor=doctor, weekday=day.weekday(), start_time=first.time(), end_time=last.time())
+            for doctor in doctors
+        ])
+        patients, admins = [], []
+        for i in range(options['threads']):
+            user = User.objects.create(username=f'bench_booking_patient_{i}', role='patient', password='!')
+            Patient.objects.create(user=user)
+            patients.append(user)
+            # Front-desk staff, who can edit anyone's appointment
+            admins.append(User.objects.create(username=f'bench_booking_admin_{i}', role='admin', password='!'))
+        slots = [
+            (doctor.id, first + timedelta(minutes=slot_minutes() * index))
+            for doctor in doctors for index in range(options['slots'])
+        ]
+        return patients, admins, slots
+
+    def _run_threads(self, target, arguments):
+        threads = [threading.Thread(target=target, args=args) for args in arguments]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    def _client(self, user):
+        from rest_framework.test import APIClient
+
+        # Server errors come back as 500s: the test client would otherwise
+        # re-raise them in whichever thread is mid-request
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user)
+        return client
+
+    def _book_worker(self, user, slots, outcome, lock):
+        from django.db import connection as thread_connection
+
+        client = self._client(user)
+        timings, statuses = [], []
+        try:
+            for doctor_id, when in slots:
+                started = time.perf_counter()
+                response = client.post('/api/appointments/', {
+                    'patient': user.patient_profile.id, 'doctor': doctor_id,
+                    'appointment_date': when.isoformat(), 'reason': 'Stress test',
+                }, format='json')
+                timings.append(time.perf_counter() - started)
+                statuses.append(response.status_code)
+        finally:
+            thread_connection.close()
+            with lock:
+                outcome['timings'].extend(timings)
+                outcome['statuses'].extend(statuses)
+
+    def _update_worker(self, user, ids, count, seed, outcome, lock):
+        from django.db import connection as thread_connection
+
+        client = self._client(user)
+        rng = Random(seed)
+        timings, statuses = [], []
+        try:
+            for _ in range(count):
+                appointment_id = rng.choice(ids)
+                started = time.perf_counter()
+                # Read, then write back at the version read
+                version = client.get(f'/api/appointments/{appointment_id}/').data['version']
+                response = client.patch(f'/api/appointments/{appointment_id}/',
+                                        {'notes': f'edited by {user.username}', 'version': version}, format='json')
+                timings.append(time.perf_counter() - started)
+                statuses.append(response.status_code)
+        finally:
+            thread_connection.close()
+            with lock:
+                outcome['timings'].extend(timings)
+                outcome['statuses'].extend(statuses)
+
+    def _phase_result(self, outcome, elapsed, success):
+        statuses = outcome['statuses']
+        succeeded = statuses.count(success)
+        return {
+            'attempts': len(statuses),
+            'succeeded': succeeded,
+            'conflicts': statuses.count(409),
+            'errors': len(statuses) - succeeded - statuses.count(409),
+            'latency': summarize_latencies(outcome['timings']),
+            'attempts_per_second': len(statuses) / elapsed if elapsed else 0.0,
+            'elapsed_seconds': elapsed,
+        }
+
+    def _check(self, slots, updates):
+        """Invariants that must hold however the threads interleaved"""
+        from hospital_app.availability import verify_slot_occupancy
+        from hospital_app.models import Appointment
+        from hospital_app.relationships import verify_doctor_patients
+        from hospital_app.stats import verify_appointment_stats
+
+        live = Appointment.objects.exclude(status='cancelled')
+        double_bookings = live.order_by().values('doctor_id', 'appointment_date').annotate(n=Count('id')).filter(n__gt=1)
+        problems = [f"doctor {row['doctor_id']} booked {row['n']} times at {row['appointment_date']}"
+                    for row in double_bookings]
+        booked = live.count()
+        if booked != len(slots):
+            problems.append(f'{booked} appointments for {len(slots)} slots')
+        # Every successful edit moved one version on; fewer means an edit was overwritten
+        edits = (Appointment.objects.aggregate(total=Sum('version'))['total'] or 0) - booked
+        if edits != updates:
+            problems.append(f'{updates} edits succeeded but versions moved {edits} times')
+        for name, mismatches in (('slot occupancy', verify_slot_occupancy()),
+                                 ('appointment stats', verify_appointment_stats()),
+                                 ('doctor-patient links', verify_doctor_patients())):
+            if mismatches:
+                problems.append(f'{len(mismatches)} {name} rows out of date')
+        return problems
+
+    def handle(self, *args, **options):
+        if min(options['threads'], options['doctors'], options['slots']) < 1 or options['updates'] < 0:
+            raise CommandError('--threads, --doctors and --slots must be at least 1')
+
+        report = new_report('booking', database=connection.vendor, threads=options['threads'],
+                            doctors=options['doctors'], slots_per_doctor=options['slots'])
+        setup_test_environment()
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        saved_test_name = test_settings.get('NAME')
+        saved_options = dict(connection.settings_dict.get('OPTIONS', {}))
+        tmpdir = None
+        if connection.vendor == 'sqlite':
+            # Threads need a shared file: an in-memory database fails instead of waiting on locks
+            tmpdir = tempfile.mkdtemp()
+            test_settings['NAME'] = os.path.join(tmpdir, 'booking.sqlite3')
+            # SQLite has one writer at a time; with every thread queued behind it
+            # the default five second wait is not always enough on a small machine
+            connection.settings_dict['OPTIONS'] = {**saved_options, 'timeout': 60}
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # Conflicts are the expected outcome for most attempts; don't log a warning for each
+        request_logger = logging.getLogger('django.request')
+        saved_level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(REQUEST_LOG_ENABLED=False):
+                patients, admins, slots = self._setup(options)
+                lock = threading.Lock()
+
+                self.stdout.write(f"{len(patients)} threads booking the same {len(slots)} slots...")
+                booking = {'timings': [], 'statuses': []}
+                arguments = []
+                for i, user in enumerate(patients):
+                    order = slots[:]
+                    Random(options['seed'] + i).shuffle(order)
+                    arguments.append((user, order, booking, lock))
+                elapsed = self._run_threads(self._book_worker, arguments)
+                result = self._phase_result(booking, elapsed, 201)
+                result['bookings_per_second'] = result['succeeded'] / elapsed if elapsed else 0.0
+                report['results']['booking'] = result
+
+                from hospital_app.models import Appointment
+
+                ids = list(Appointment.objects.values_list('id', flat=True))
+                self.stdout.write(f"{len(admins)} threads editing {len(ids)} appointments...")
+                editing = {'timings': [], 'statuses': []}
+                elapsed = self._run_threads(self._update_worker, [
+                    (user, ids, options['updates'], options['seed'] + i, editing, lock)
+                    for i, user in enumerate(admins)
+                ])
+                result = self._phase_result(editing, elapsed, 200)
+                result['updates_per_second'] = result['succeeded'] / elapsed if elapsed else 0.0
+                report['results']['updates'] = result
+                report['results']['peak_rss_mb'] = peak_rss_mb()
+
+                problems = self._check(slots, report['results']['updates']['succeeded'])
+                expected = {'booking': len(patients) * len(slots), 'updates': len(admins) * options['updates']}
+                for phase, attempts in expected.items():
+                    missing = attempts - report['results'][phase]['attempts']
+                    if missing:
+                        problems.append(f'{missing} {phase} requests never completed (a thread crashed)')
+        finally:
+            request_logger.setLevel(saved_level)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            test_settings['NAME'] = saved_test_name
+            connection.settings_dict['OPTIONS'] = saved_options
+            if tmpdir:
+                os.rmdir(tmpdir)
+
+        for phase in ('booking', 'updates'):
+            result = report['results'][phase]
+            self.stdout.write(
+                f"  {phase}: {result['succeeded']} succeeded, {result['conflicts']} conflicts, "
+                f"{result['errors']} errors; {result['attempts_per_second']:.1f} attempts/s, "
+                f"p50 {result['latency']['p50_ms']:.2f} ms, p99 {result['latency']['p99_ms']:.2f} ms"
+            )
+        if options['output']:
+            write_report(report, options['output'])
+        else:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+        errors = sum(report['results'][phase]['errors'] for phase in ('booking', 'updates'))
+        if errors:
+            problems.append(f'{errors} requests failed with something other than a conflict')
+        if problems:
+            raise CommandError('Booking is not safe under concurrency:\n  ' + '\n  '.join(problems))
+        self.stdout.write(self.style.SUCCESS('No double bookings and no lost updates'))
+
+        if options['save_baseline']:
+            write_report(report, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}"))
+            return
+        baseline = load_report(options['baseline'])
+        if baseline is None:
+            self.stdout.write(f"No baseline at {options['baseline']}; run with --save-baseline to create one")
+            return
+        regressions = compare_to_baseline(report, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError('Benchmark regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
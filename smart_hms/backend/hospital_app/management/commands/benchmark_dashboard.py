@@ -0,0 +1,121 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from hospital_app.benchmarking import (
+    compare_to_baseline, load_report, new_report, peak_rss_mb, summarize_latencies, write_report,
+)
+from hospital_app.load_data import LoadDataGenerator
+
+
+def default_baseline_path():
+    return os.path.join(settings.BASE_DIR, 'benchmarks', 'dashboard_baseline.json')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the admin dashboard against growing appointment tables in a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000',
+                            help='Comma-separated appointment counts, e.g. 10000,100000,1000000')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--doctors', type=int, default=None, help='Default: sized for the largest table')
+        parser.add_argument('--patients', type=int, default=None, help='Default: sized for the largest table')
+        parser.add_argument('--requests', type=int, default=50, help='Dashboard requests timed per size')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per insert')
+        parser.add_argument('--output', default=None, help='Write the JSON report here')
+        parser.add_argument('--baseline', default=default_baseline_path(), help='Baseline report to compare against')
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression (0.2 = 20%%)')
+
+    def _measure(self, client, options):
+        client.get('/api/dashboard/')  # warm up
+        timings, query_counts, query_seconds = [], [], []
+        response = None
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get('/api/dashboard/')
+                timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f'Dashboard returned {response.status_code}')
+            query_counts.append(len(queries.captured_queries))
+            query_seconds.append(sum(float(query['time']) for query in queries.captured_queries))
+        return {
+            'latency': summarize_latencies(timings),
+            'requests_per_second': len(timings) / sum(timings) if sum(timings) else 0.0,
+            'dashboard_queries': max(query_counts),
+            'db_ms': 1000 * sum(query_seconds) / len(query_seconds),
+            'response_bytes': len(response.content),
+        }
+
+    def handle(self, *args, **options):
+        from rest_framework.test import APIClient
+
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(',') if size.strip())
+        except ValueError:
+            raise CommandError('--sizes must be a comma-separated list of integers')
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+
+        report = new_report('dashboard', seed=options['seed'], database=connection.vendor)
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            generator = LoadDataGenerator(
+                seed=options['seed'],
+                doctors=options['doctors'] or LoadDataGenerator.default_doctors(sizes[-1]),
+                patients=options['patients'] or LoadDataGenerator.default_patients(sizes[-1]),
+                batch_size=options['batch_size'],
+                # The admin dashboard only reads appointments and users
+                record_ratio=0,
+            )
+            admin = generator.create_people()
+            client = APIClient()
+            client.force_authenticate(admin)
+            for size in sizes:
+                self.stdout.write(f'Benchmarking the admin dashboard at {size} appointments...')
+                started = time.perf_counter()
+                generator.add_appointments(size - generator.counts['appointments'])
+                load_seconds = time.perf_counter() - started
+                # Bulk loading skips the signals that keep the derived tables current
+                generator.rebuild_derived()
+
+                with override_settings(REQUEST_LOG_ENABLED=False):
+                    result = self._measure(client, options)
+                result.update(appointments=size, insert_seconds=load_seconds, peak_rss_mb=peak_rss_mb())
+                report['results'][str(size)] = result
+                self.stdout.write(
+                    f"  p50 {result['latency']['p50_ms']:.2f} ms, p99 {result['latency']['p99_ms']:.2f} ms, "
+                    f"{result['dashboard_queries']} queries, {result['db_ms']:.2f} ms in the database"
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            write_report(report, options['output'])
+        else:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+        if options['save_baseline']:
+            write_report(report, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}"))
+            return
+
+        baseline = load_report(options['baseline'])
+        if baseline is None:
+            self.stdout.write(f"No baseline at {options['baseline']}; run with --save-baseline to create one")
+            return
+        regressions = compare_to_baseline(report, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError('Benchmark regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,302 @@
+import json
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+from hospital_app.benchmarking import (
+    compare_to_baseline, load_report, new_report, peak_rss_mb, summarize_latencies, write_report,
+)
+from hospital_app.load_data import LoadDataGenerator
+
+
+SIGNED_IN = ('patient', 'doctor', 'admin')
+PASSWORD = 'bench-endpoint-pass'
+SYMPTOMS = ['fever cough headache', 'chest pain shortness of breath', 'itchy rash on arms', 'back pain after lifting']
+
+
+def default_baseline_path():
+    return os.path.join(settings.BASE_DIR, 'benchmarks', 'endpoints_baseline.json')
+
+
+class Case:
+    """One route and method, timed as each of ``roles``
+
+    ``body`` builds the request data from the run; a detail route is given
+    the id of the first row its list route returns to the same user.
+    """
+
+    def __init__(self, name, method, roles, body=None, detail_of=None):
+        self.name = name
+        self.method = method
+        self.roles = roles
+        self.body = body
+        self.detail_of = detail_of
+
+    @property
+    def key(self):
+        return f'{self.method.upper()} {self.name}'
+
+
+def _register_body(run):
+    return {'username': f'bench_new_{uuid.uuid4().hex[:12]}', 'password': PASSWORD, 'password_confirm': PASSWORD,
+            'role': 'patient', 'first_name': 'New', 'last_name': 'Patient'}
+
+
+def _login_body(run):
+    return {'username': run.login_username, 'password': PASSWORD}
+
+
+def _refresh_body(run):
+    return {'refresh': run.refresh_tokens['patient']}
+
+
+def _symptoms_body(run):
+    return {'symptoms': SYMPTOMS[0]}
+
+
+def _batch_body(run):
+    return {'symptoms': SYMPTOMS * 5}
+
+
+# Routes that write are only timed where the write is part of normal use
+# and leaves the dataset comparable between runs
+CASES = [
+    Case('login', 'post', ('anonymous',), body=_login_body),
+    Case('token_obtain_pair', 'post', ('anonymous',), body=_login_body),
+    Case('token_refresh', 'post', ('anonymous',), body=_refresh_body),
+    Case('register', 'post', ('anonymous',), body=_register_body),
+    Case('api-root', 'get', SIGNED_IN),
+    Case('dashboard', 'get', SIGNED_IN),
+    Case('metrics', 'get', ('admin',)),
+    Case('doctor-availability', 'get', SIGNED_IN),
+    Case('doctor-working-hours', 'get', SIGNED_IN, detail_of='doctor-list'),
+    Case('ai_symptom_checker', 'post', ('patient',), body=_symptoms_body),
+    Case('ai_symptom_checker_batch', 'post', ('patient',), body=_batch_body),
+    Case('symptomchecker-analyze', 'post', ('patient',), body=_symptoms_body),
+    Case('symptomchecker-analyze-batch', 'post', ('patient',), body=_batch_body),
+] + [
+    case
+    for basename in ('user', 'patient', 'doctor', 'admin', 'appointment', 'medicalrecord', 'prescription', 'symptomchecker')
+    for case in (
+        Case(f'{basename}-list', 'get', SIGNED_IN),
+        Case(f'{basename}-detail', 'get', SIGNED_IN, detail_of=f'{basename}-list'),
+    )
+]
+
+
+def discovered_routes():
+    """``(url name, method)`` for every view in hospital_app/urls.py"""
+    from hospital_app import urls
+
+    def walk(patterns):
+        for pattern in patterns:
+            if hasattr(pattern, 'url_patterns'):
+                yield from walk(pattern.url_patterns)
+            elif pattern.name:
+                yield pattern
+
+    routes = set()
+    for pattern in walk(urls.urlpatterns):
+        callback = pattern.callback
+        actions = getattr(callback, 'actions', None)
+        if actions:
+            methods = actions
+        else:
+            view_class = getattr(callback, 'view_class', None) or getattr(callback, 'cls', None)
+            methods = [method for method in ('get', 'post', 'put', 'patch', 'delete') if hasattr(view_class, method)]
+        routes.update((pattern.name, method) for method in methods)
+    return routes
+
+
+class BenchmarkRun:
+    """Users, tokens and clients for one benchmark database"""
+
+    def __init__(self, admin):
+        from django.contrib.auth.hashers import make_password
+        from rest_framework.test import APIClient
+        from hospital_app.authentication import HospitalRefreshToken
+        from hospital_app.models import Doctor, Patient, User
+
+        # The busiest doctor and patient: the worst case for their lists
+        doctor = Doctor.objects.annotate(visits=Count('appointments')).order_by('-visits', 'id').first()
+        patient = Patient.objects.annotate(visits=Count('appointments')).order_by('-visits', 'id').first()
+        users = {'admin': admin, 'doctor': doctor.user, 'patient': patient.user}
+        self.login_username = patient.user.username
+        User.objects.filter(pk=patient.user_id).update(password=make_password(PASSWORD))
+
+        self.clients = {'anonymous': APIClient()}
+        self.refresh_tokens = {}
+        for role, user in users.items():
+            refresh = HospitalRefreshToken.for_user(user)
+            self.refresh_tokens[role] = str(refresh)
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+            self.clients[role] = client
+
+    def path(self, case, role):
+        if case.detail_of is None:
+            return reverse(case.name)
+        response = self.clients[role].get(reverse(case.detail_of))
+        rows = response.json() if response.status_code == 200 else []
+        if isinstance(rows, dict):
+            rows = rows.get('results', [])
+        if not rows:
+            return None
+        return reverse(case.name, kwargs={'pk': rows[0]['id']})
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every API route as each role against generated datasets of increasing size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma-separated appointment counts, e.g. 1000,10000,100000,1000000')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--requests', type=int, default=20, help='Timed requests per route, role and size')
+        parser.add_argument('--routes', default=None, help='Comma-separated url names to run (default: all)')
+        parser.add_argument('--cold-caches', action='store_true',
+                            help='Disable the dashboard cache and clear the cache before every request')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per insert while loading')
+        parser.add_argument('--output', default=None, help='Write the JSON report here')
+        parser.add_argument('--baseline', default=default_baseline_path(), help='Baseline report to compare against')
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression (0.2 = 20%%)')
+
+    def _time_case(self, run, case, role, options):
+        client = run.clients[role]
+        path = run.path(case, role)
+        if path is None:
+            return None
+        request = getattr(client, case.method)
+
+        def send():
+            data = case.body(run) if case.body else None
+            if options['cold_caches']:
+                cache.clear()
+            return request(path, data, format='json') if data is not None else request(path)
+
+        send()  # warm up
+        timings, query_counts, query_seconds, sizes, statuses = [], [], [], [], set()
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = send()
+                timings.append(time.perf_counter() - started)
+            statuses.add(response.status_code)
+            query_counts.append(len(queries.captured_queries))
+            query_seconds.append(sum(float(query['time']) for query in queries.captured_queries))
+            sizes.append(len(response.content))
+        return {
+            'latency': summarize_latencies(timings),
+            'requests_per_second': len(timings) / sum(timings) if sum(timings) else 0.0,
+            'sql_queries': max(query_counts),
+            'sql_ms': 1000 * sum(query_seconds) / len(query_seconds),
+            'response_bytes': max(sizes),
+            'status': sorted(statuses),
+        }
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(',') if size.strip())
+        except ValueError:
+            raise CommandError('--sizes must be a comma-separated list of integers')
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        cases = CASES
+        if options['routes']:
+            wanted = {name.strip() for name in options['routes'].split(',')}
+            cases = [case for case in CASES if case.name in wanted]
+            if not cases:
+                raise CommandError('No known routes selected')
+
+        covered = {(case.name, case.method) for case in CASES}
+        skipped = sorted(f'{method.upper()} {name}' for name, method in discovered_routes() - covered)
+        report = new_report('endpoints', seed=options['seed'], database=connection.vendor,
+                            cold_caches=options['cold_caches'], skipped_routes=skipped)
+        failures = []
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            generator = LoadDataGenerator(
+                seed=options['seed'],
+                doctors=LoadDataGenerator.default_doctors(sizes[-1]),
+                patients=LoadDataGenerator.default_patients(sizes[-1]),
+                batch_size=options['batch_size'],
+            )
+            admin = generator.create_people()
+            # Request logging has its own benchmark (benchmark_login)
+            overrides = {'REQUEST_LOG_ENABLED': False}
+            if options['cold_caches']:
+                overrides['DASHBOARD_CACHE_TTL'] = 0
+            with override_settings(**overrides):
+                for size in sizes:
+                    self.stdout.write(f'Loading {size} appointments...')
+                    generator.add_appointments(size - generator.counts['appointments'])
+                    generator.rebuild_derived()
+                    run = BenchmarkRun(admin)
+                    results = report['results'][str(size)] = {}
+                    for case in cases:
+                        for role in case.roles:
+                            result = self._time_case(run, case, role, options)
+                            if result is None:
+                                continue
+                            results.setdefault(role, {})[case.key] = result
+                            if any(code >= 400 for code in result['status']):
+                                failures.append(f"{size}: {case.key} as {role} returned {result['status']}")
+                            self.stdout.write(
+                                f"  {case.key:<40} {role:<9} p50 {result['latency']['p50_ms']:7.2f} ms  "
+                                f"p99 {result['latency']['p99_ms']:7.2f} ms  {result['sql_queries']:3d} queries  "
+                                f"{result['response_bytes']:7d} bytes"
+                            )
+                    results['peak_rss_mb'] = peak_rss_mb()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        regressions = self._query_growth(report, sizes)
+        report['query_growth'] = regressions[:]
+        if options['output']:
+            write_report(report, options['output'])
+        else:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+        if skipped:
+            self.stdout.write(f"Not timed (they write data or need a queued job): {', '.join(skipped)}")
+        if failures:
+            raise CommandError('Requests failed:\n  ' + '\n  '.join(failures))
+
+        if options['save_baseline']:
+            write_report(report, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}"))
+        else:
+            baseline = load_report(options['baseline'])
+            if baseline is None:
+                self.stdout.write(f"No baseline at {options['baseline']}; run with --save-baseline to create one")
+            else:
+                regressions += compare_to_baseline(report, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError('Benchmark regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def _query_growth(self, report, sizes):
+        """Routes whose query count rises with the data: an N+1 in the making"""
+        smallest, largest = report['results'][str(sizes[0])], report['results'][str(sizes[-1])]
+        growth = []
+        for role, routes in largest.items():
+            if not isinstance(routes, dict):
+                continue
+            for key, result in routes.items():
+                before = smallest.get(role, {}).get(key)
+                if before and result['sql_queries'] > before['sql_queries']:
+                    growth.append(f"{key} as {role}: {before['sql_queries']} queries at {sizes[0]} appointments, "
+                                  f"{result['sql_queries']} at {sizes[-1]}")
+        return growth
@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from hospital_app.benchmarking import (
+    compare_to_baseline, load_report, new_report, peak_rss_mb, summarize_latencies, write_report,
+)
+from hospital_app.request_logging import JsonFormatter, QueueLogHandler, logger as request_logger
+
+
+MODES = ('disabled', 'queued', 'synchronous')
+PASSWORD = 'bench-login-pass'
+
+
+def default_baseline_path():
+    return os.path.join(settings.BASE_DIR, 'benchmarks', 'login_baseline.json')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark login throughput with request logging disabled, queued and written inline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help='Logins timed per mode')
+        parser.add_argument('--threads', type=int, default=4, help='Concurrent clients')
+        parser.add_argument('--modes', default=','.join(MODES),
+                            help='Comma-separated subset of: ' + ', '.join(MODES))
+        parser.add_argument('--real-hasher', action='store_true',
+                            help='Hash with PASSWORD_HASHERS instead of a fast hasher that leaves logging visible')
+        parser.add_argument('--output', default=None, help='Write the JSON report here')
+        parser.add_argument('--baseline', default=default_baseline_path(), help='Baseline report to compare against')
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression (0.2 = 20%%)')
+
+    def _log_handler(self, mode, sink):
+        """Handler standing in for the configured one; ``synchronous`` writes on the request thread"""
+        if mode == 'queued':
+            return QueueLogHandler(stream=sink)
+        handler = logging.StreamHandler(sink)
+        handler.setFormatter(JsonFormatter())
+        return handler
+
+    def _login_worker(self, count, timings, failures):
+        from django.db import connection as thread_connection
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                response = client.post('/api/auth/login/', {'username': 'bench_login', 'password': PASSWORD}, format='json')
+                timings.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+        finally:
+            thread_connection.close()
+
+    def _measure(self, mode, options):
+        per_thread = max(1, options['requests'] // options['threads'])
+        timings, failures = [], []
+        with tempfile.TemporaryFile('w') as sink:
+            handler = self._log_handler(mode, sink)
+            saved = request_logger.handlers[:], request_logger.level
+            request_logger.handlers = [handler]
+            request_logger.setLevel(logging.INFO)
+            try:
+                with override_settings(REQUEST_LOG_ENABLED=mode != 'disabled', REQUEST_LOG_SAMPLE_RATE=1.0,
+                                       REQUEST_LOG_SAMPLE_RATES={}, REQUEST_LOG_BODIES=False):
+                    self._login_worker(5, [], [])  # warm up
+                    threads = [
+                        threading.Thread(target=self._login_worker, args=(per_thread, timings, failures))
+                        for _ in range(options['threads'])
+                    ]
+                    started = time.perf_counter()
+                    for thread in threads:
+                        thread.start()
+                    for thread in threads:
+                        thread.join()
+                    elapsed = time.perf_counter() - started
+                    handler.flush()
+                    drain_seconds = time.perf_counter() - started - elapsed
+            finally:
+                request_logger.handlers, level = saved
+                request_logger.setLevel(level)
+                handler.close()
+            log_bytes = sink.tell()
+        if failures:
+            raise CommandError(f'{len(failures)} logins failed, e.g. with status {failures[0]}')
+        return {
+            'latency': summarize_latencies(timings),
+            'logins_per_second': len(timings) / elapsed if elapsed else 0.0,
+            'logins': len(timings),
+            'log_drain_seconds': drain_seconds,
+            'log_file_size': log_bytes,
+            'log_dropped': getattr(handler, 'dropped', 0),
+        }
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+        if options['requests'] < 1 or options['threads'] < 1:
+            raise CommandError('--requests and --threads must be at least 1')
+
+        report = new_report('login', database=connection.vendor, threads=options['threads'],
+                            real_hasher=options['real_hasher'])
+        hashers = settings.PASSWORD_HASHERS if options['real_hasher'] else [
+            'django.contrib.auth.hashers.MD5PasswordHasher',
+        ]
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            from hospital_app.models import Patient, User
+
+            with override_settings(PASSWORD_HASHERS=hashers):
+                user = User.objects.create_user(username='bench_login', password=PASSWORD, role='patient')
+                Patient.objects.create(user=user)
+                for mode in modes:
+                    self.stdout.write(f'Benchmarking login with request logging {mode}...')
+                    result = self._measure(mode, options)
+                    result['peak_rss_mb'] = peak_rss_mb()
+                    report['results'][mode] = result
+                    self.stdout.write(
+                        f"  {result['logins_per_second']:.1f} logins/s, p50 {result['latency']['p50_ms']:.2f} ms, "
+                        f"p99 {result['latency']['p99_ms']:.2f} ms"
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            write_report(report, options['output'])
+        else:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+        if options['save_baseline']:
+            write_report(report, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}"))
+            return
+
+        baseline = load_report(options['baseline'])
+        if baseline is None:
+            self.stdout.write(f"No baseline at {options['baseline']}; run with --save-baseline to create one")
+            return
+        regressions = compare_to_baseline(report, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError('Benchmark regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
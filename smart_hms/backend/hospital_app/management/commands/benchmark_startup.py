@@ -0,0 +1,77 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter so nothing is already imported or cached
+PROBE = r'''
+import json, os, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls_done = time.perf_counter()
+print(json.dumps({
+    'setup_ms': (setup_done - started) * 1000,
+    'urlconf_ms': (urls_done - setup_done) * 1000,
+    'total_ms': (urls_done - started) * 1000,
+    'heavy_modules': sorted(m for m in %(heavy)r if m in sys.modules),
+}))
+'''
+
+# Modules that must only be imported on first use of the AI path
+HEAVY_MODULES = ('sklearn', 'pandas', 'scipy')
+
+
+class Command(BaseCommand):
+    help = 'Measure django.setup() plus URLconf import time and fail when it exceeds the startup budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Number of fresh interpreters to time')
+        parser.add_argument('--budget-ms', type=float, default=None,
+                            help='Median budget in milliseconds (default: STARTUP_TIME_BUDGET_MS)')
+        parser.add_argument('--json', action='store_true', help='Print the raw results as JSON')
+
+    def _probe(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'hospital.settings'))
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE % {'heavy': HEAVY_MODULES}],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Startup probe failed:\n{result.stderr}')
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        budget_ms = options['budget_ms'] or settings.STARTUP_TIME_BUDGET_MS
+        runs = [self._probe() for _ in range(max(options['runs'], 1))]
+
+        report = {
+            key: statistics.median(run[key] for run in runs)
+            for key in ('setup_ms', 'urlconf_ms', 'total_ms')
+        }
+        report['runs'] = len(runs)
+        report['budget_ms'] = budget_ms
+        report['heavy_modules'] = sorted({m for run in runs for m in run['heavy_modules']})
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(
+                f"django.setup(): {report['setup_ms']:.1f} ms, URLconf: {report['urlconf_ms']:.1f} ms, "
+                f"total: {report['total_ms']:.1f} ms (median of {report['runs']}, budget {budget_ms:.0f} ms)"
+            )
+
+        if report['heavy_modules']:
+            raise CommandError(f"Heavy modules imported at startup: {', '.join(report['heavy_modules'])}")
+        if report['total_ms'] > budget_ms:
+            raise CommandError(f"Startup took {report['total_ms']:.1f} ms, over the {budget_ms:.0f} ms budget")
+
+        self.stdout.write(self.style.SUCCESS('Startup time within budget'))
@@ -0,0 +1,140 @@
+import json
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from hospital_app.benchmarking import (
+    compare_to_baseline, load_report, new_report, peak_rss_mb, summarize_latencies, write_report,
+)
+
+
+def default_baseline_path():
+    return os.path.join(settings.BASE_DIR, 'benchmarks', 'symptom_checker_baseline.json')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark symptom checker latency, throughput, load time, memory and accuracy on synthetic corpora'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma-separated corpus sizes, e.g. 1000,10000,100000,1000000')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--extra-conditions', type=int, default=0, help='Synthetic conditions added to the built-in ones')
+        parser.add_argument('--latency-samples', type=int, default=500, help='Single predict() calls timed per engine')
+        parser.add_argument('--batch-size', type=int, default=256)
+        parser.add_argument('--eval-docs', type=int, default=20000, help='Held-out documents used for accuracy and throughput')
+        parser.add_argument('--output', default=None, help='Write the JSON report here')
+        parser.add_argument('--baseline', default=default_baseline_path(), help='Baseline report to compare against')
+        parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression (0.2 = 20%%)')
+
+    def _measure_engine(self, engine, test_texts, test_labels, options):
+        """Latency, throughput and top-3 accuracy of one loaded engine"""
+        samples = test_texts[:options['latency_samples']]
+        timings = []
+        for text in samples:
+            started = time.perf_counter()
+            engine.predict(text)
+            timings.append(time.perf_counter() - started)
+
+        eval_texts = test_texts[:options['eval_docs']]
+        eval_labels = test_labels[:options['eval_docs']]
+        batch_size = options['batch_size']
+        predictions = []
+        started = time.perf_counter()
+        for offset in range(0, len(eval_texts), batch_size):
+            predictions.extend(engine.predict_batch(eval_texts[offset:offset + batch_size]))
+        elapsed = time.perf_counter() - started
+
+        hits = sum(1 for label, prediction in zip(eval_labels, predictions) if label in prediction['conditions'])
+        return {
+            'latency': summarize_latencies(timings),
+            # Single-threaded, so this is throughput per core
+            'batch_docs_per_second': len(eval_texts) / elapsed if elapsed else 0.0,
+            'top3_accuracy': hits / len(eval_labels) if eval_labels else 0.0,
+        }
+
+    def _run_size(self, size, options):
+        from hospital_app.ai_model.corpus import generate_corpus
+        from hospital_app.ai_model.numpy_engine import NumpySymptomPredictor, export_model
+        from hospital_app.ai_model.symptom_checker import SymptomCheckerAI, fit_symptom_model, new_model_version, save_model
+
+        texts, labels = generate_corpus(size, seed=options['seed'], extra_conditions=options['extra_conditions'])
+        split = int(size * 0.8)
+        train_texts, train_labels = texts[:split], labels[:split]
+        test_texts, test_labels = texts[split:], labels[split:]
+
+        started = time.perf_counter()
+        vectorizer, model = fit_symptom_model(train_texts, train_labels)
+        train_seconds = time.perf_counter() - started
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            model_path = os.path.join(tmpdir, 'symptom_model.pkl')
+            save_model({
+                'model': model,
+                'vectorizer': vectorizer,
+                'conditions': model.classes_.tolist(),
+                'version': new_model_version()
+            }, model_path)
+
+            started = time.perf_counter()
+            sklearn_engine = SymptomCheckerAI(model_path=model_path)
+            sklearn_load = time.perf_counter() - started
+
+            export_dir = os.path.join(tmpdir, 'exported')
+            export_model(sklearn_engine, export_dir)
+            started = time.perf_counter()
+            numpy_engine = NumpySymptomPredictor(export_dir)
+            numpy_load = time.perf_counter() - started
+
+            result = {
+                'documents': size,
+                'conditions': len(model.classes_),
+                'train_seconds': train_seconds,
+                'sklearn': dict(self._measure_engine(sklearn_engine, test_texts, test_labels, options), load_seconds=sklearn_load),
+                'numpy': dict(self._measure_engine(numpy_engine, test_texts, test_labels, options), load_seconds=numpy_load),
+            }
+        # Process-wide high-water mark, so it only grows across sizes
+        result['peak_rss_mb'] = peak_rss_mb()
+        return result
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError('--sizes must be a comma-separated list of integers')
+
+        report = new_report('symptom_checker', seed=options['seed'])
+        for size in sorted(sizes):
+            self.stdout.write(f'Benchmarking {size} documents...')
+            result = self._run_size(size, options)
+            report['results'][str(size)] = result
+            self.stdout.write(
+                f"  sklearn p50 {result['sklearn']['latency']['p50_ms']:.3f} ms, "
+                f"p99 {result['sklearn']['latency']['p99_ms']:.3f} ms, "
+                f"{result['sklearn']['batch_docs_per_second']:.0f} docs/s | "
+                f"numpy p50 {result['numpy']['latency']['p50_ms']:.3f} ms, "
+                f"{result['numpy']['batch_docs_per_second']:.0f} docs/s | "
+                f"top-3 accuracy {result['sklearn']['top3_accuracy']:.3f}, peak RSS {result['peak_rss_mb']:.0f} MiB"
+            )
+
+        if options['output']:
+            write_report(report, options['output'])
+        else:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+        if options['save_baseline']:
+            write_report(report, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}"))
+            return
+
+        baseline = load_report(options['baseline'])
+        if baseline is None:
+            self.stdout.write(f"No baseline at {options['baseline']}; run with --save-baseline to create one")
+            return
+        regressions = compare_to_baseline(report, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError('Benchmark regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
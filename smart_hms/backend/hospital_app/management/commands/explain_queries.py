@@ -0,0 +1,94 @@
+import re
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from hospital_app.models import User
+from hospital_app.pagination import KeysetPagination
+from hospital_app.urls import router
+
+
+ROLES = ('admin', 'doctor', 'patient')
+
+# Plan lines that mean a whole table is read or rows are sorted after the fact
+SQLITE_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)\b(?! USING)')
+SQLITE_SORT = re.compile(r'USE TEMP B-TREE FOR ORDER BY')
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+POSTGRES_SORT = re.compile(r'^\s*(?:->\s*)?Sort\b', re.MULTILINE)
+
+
+class Command(BaseCommand):
+    help = 'Print the query plan of every viewset list query for each role and flag full scans and sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--role', action='append', choices=ROLES, help='Only explain for this role (repeatable)')
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error if a role-scoped query scans a whole table or sorts')
+
+    def _problems(self, plan):
+        """Full scans and explicit sorts found in a plan"""
+        if connection.vendor == 'postgresql':
+            problems = [f'sequential scan of {table}' for table in POSTGRES_SCAN.findall(plan)]
+            if POSTGRES_SORT.search(plan):
+                problems.append('sort step')
+        else:
+            problems = [f'full scan of {table}' for table in SQLITE_SCAN.findall(plan)]
+            if SQLITE_SORT.search(plan):
+                problems.append('temporary sort')
+        return problems
+
+    def _list_queryset(self, view):
+        """First page of the view's list, ordered and sliced as its paginator runs it"""
+        queryset = view.get_queryset()
+        paginator = view.paginator
+        if isinstance(paginator, KeysetPagination):
+            return paginator.order_queryset(queryset)[:paginator.page_size + 1]
+        return queryset[:settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)]
+
+    def _explain(self, queryset):
+        if connection.vendor != 'postgresql':
+            return queryset.explain()
+        # Development tables are tiny, so the planner would pick sequential
+        # scans anyway; discourage them to show which indexes would be used
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+
+    def handle(self, *args, **options):
+        flagged = []
+
+        for role in options['role'] or ROLES:
+            user = User.objects.filter(role=role, is_active=True).order_by('id').first()
+            if user is None:
+                self.stdout.write(self.style.WARNING(f'No active {role} user; skipping (run seed_data first)'))
+                continue
+
+            for prefix, viewset, basename in router.registry:
+                view = viewset(request=SimpleNamespace(user=user), format_kwarg=None, kwargs={}, action='list')
+                queryset = self._list_queryset(view)
+                self.stdout.write(self.style.MIGRATE_HEADING(f'[{role}] /api/{prefix}/'))
+                try:
+                    self.stdout.write(str(queryset.query))
+                except EmptyResultSet:
+                    # e.g. .none() for roles without access; nothing reaches the database
+                    self.stdout.write('No query (empty queryset)\n')
+                    continue
+                plan = self._explain(queryset)
+                self.stdout.write(plan)
+
+                problems = self._problems(plan)
+                # An unfiltered admin list walks the whole table by design
+                if problems and role != 'admin':
+                    flagged.append(f"[{role}] /api/{prefix}/: {', '.join(problems)}")
+                    self.stdout.write(self.style.WARNING('  ' + ', '.join(problems)))
+                self.stdout.write('')
+
+        if flagged and options['fail_on_scan']:
+            raise CommandError('Queries without a usable index:\n  ' + '\n  '.join(flagged))
+        if flagged:
+            self.stdout.write(self.style.WARNING(f'{len(flagged)} role-scoped queries scan or sort'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Every role-scoped query is served by an index'))
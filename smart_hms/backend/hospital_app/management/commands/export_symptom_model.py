@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from hospital_app.ai_model.numpy_engine import export_model, default_export_dir
+
+
+class Command(BaseCommand):
+    help = 'Export the trained symptom model to the memory-mapped NumPy format'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help=f'Export directory (default: {default_export_dir()})')
+
+    def handle(self, *args, **options):
+        from hospital_app.ai_model.symptom_checker import SymptomCheckerAI
+        
+        ai = SymptomCheckerAI()
+        try:
+            path = export_model(ai, options['output'])
+        except (ValueError, FileExistsError) as e:
+            raise CommandError(str(e))
+        
+        self.stdout.write(self.style.SUCCESS(f'Exported symptom model version {ai.version} to {path}'))
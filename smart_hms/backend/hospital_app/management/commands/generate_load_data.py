@@ -0,0 +1,73 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from hospital_app.load_data import USERNAME_PREFIX, LoadDataGenerator, delete_load_data
+from hospital_app.models import User
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic dataset of doctors, patients, appointments, records and prescriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--appointments', type=int, default=100000)
+        parser.add_argument('--doctors', type=int, default=None, help='Default: one per 2000 appointments, at least 10')
+        parser.add_argument('--patients', type=int, default=None, help='Default: one per 8 appointments, at least 100')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--anchor', type=date.fromisoformat, default=None,
+                            help='Date treated as today (YYYY-MM-DD); fix it to reproduce a dataset exactly')
+        parser.add_argument('--days-back', type=int, default=365)
+        parser.add_argument('--days-ahead', type=int, default=30)
+        parser.add_argument('--record-ratio', type=float, default=0.6, help='Share of completed visits with a medical record')
+        parser.add_argument('--prescriptions-per-record', type=float, default=1.2)
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per insert')
+        parser.add_argument('--no-copy', action='store_true', help='Use bulk_create on PostgreSQL instead of COPY')
+        parser.add_argument('--replace', action='store_true', help='Delete previously generated data first')
+
+    def handle(self, *args, **options):
+        if options['appointments'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--appointments must not be negative and --batch-size must be positive')
+        if options['days_back'] < 1 or options['days_ahead'] < 1:
+            raise CommandError('--days-back and --days-ahead must be at least 1')
+
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            if not options['replace']:
+                raise CommandError(f"Generated data ({USERNAME_PREFIX}* users) already exists; pass --replace to regenerate it")
+            self.stdout.write('Deleting previously generated data...')
+            delete_load_data()
+
+        appointments = options['appointments']
+        try:
+            generator = LoadDataGenerator(
+                seed=options['seed'],
+                doctors=options['doctors'] or LoadDataGenerator.default_doctors(appointments),
+                patients=options['patients'] or LoadDataGenerator.default_patients(appointments),
+                days_back=options['days_back'], days_ahead=options['days_ahead'], anchor=options['anchor'],
+                batch_size=options['batch_size'], use_copy=False if options['no_copy'] else None,
+                record_ratio=options['record_ratio'], prescriptions_per_record=options['prescriptions_per_record'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.perf_counter()
+        method = 'COPY' if generator.use_copy else 'bulk_create'
+        self.stdout.write(f'Creating {generator.doctor_count} doctors and {generator.patient_count} patients ({method})...')
+        generator.create_people()
+
+        def progress(done, total):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  {done}/{total} appointments ({elapsed:.1f} s)')
+
+        try:
+            generator.add_appointments(appointments, progress=progress)
+        except (ValueError, RuntimeError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write('Rebuilding appointment statistics, doctor-patient links and slot occupancy...')
+        derived = generator.rebuild_derived()
+        counts = generator.counts
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {counts['appointments']} appointments, {counts['medical_records']} medical records and "
+            f"{counts['prescriptions']} prescriptions ({derived['appointment_stats']} stat rows, "
+            f"{derived['doctor_patients']} doctor-patient links, {derived['slot_occupancy']} occupied doctor-days) in {time.perf_counter() - started:.1f} s"
+        ))
@@ -0,0 +1,45 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from hospital_app.user_import import ImportFileError, import_users
+
+
+class Command(BaseCommand):
+    help = 'Create users and their patient, doctor or admin profiles from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with a header row, or '-' for stdin")
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows validated and inserted together')
+        parser.add_argument('--workers', type=int, default=None, help='Password hashing processes (default: every CPU)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without creating anything')
+        parser.add_argument('--errors', default=None, help='Write the per-row errors to this JSON file')
+
+    def handle(self, *args, **options):
+        options_for_import = {
+            'batch_size': options['batch_size'], 'workers': options['workers'], 'dry_run': options['dry_run'],
+        }
+        try:
+            if options['path'] == '-':
+                report = import_users(sys.stdin, **options_for_import)
+            else:
+                with open(options['path'], newline='', encoding='utf-8-sig') as f:
+                    report = import_users(f, **options_for_import)
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+
+        for error in report['errors'][:50]:
+            self.stdout.write(f"  line {error['line']} ({error['username']}): {json.dumps(error['errors'])}")
+        if len(report['errors']) > 50:
+            self.stdout.write(f"  ... and {len(report['errors']) - 50} more")
+        if options['errors']:
+            with open(options['errors'], 'w') as f:
+                json.dump(report['errors'], f, indent=2)
+
+        by_role = ', '.join(f'{count} {role}s' for role, count in report['created_by_role'].items())
+        if report['dry_run']:
+            summary = f"{report['valid']} of {report['rows']} rows are valid"
+        else:
+            summary = f"Created {report['created']} of {report['rows']} users ({by_role})"
+        style = self.style.WARNING if report['failed'] else self.style.SUCCESS
+        self.stdout.write(style(f"{summary}; {report['failed']} rows failed"))
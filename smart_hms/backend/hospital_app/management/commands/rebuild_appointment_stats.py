@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from hospital_app.stats import rebuild_appointment_stats, verify_appointment_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the appointment statistics rollup from the appointments, or verify it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only compare the stored counts with the appointments; fail on any difference')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            rows = rebuild_appointment_stats()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt appointment statistics ({rows} rows)'))
+            return
+
+        mismatches = verify_appointment_stats()
+        if mismatches:
+            for (doctor_id, day, status), stored, expected in mismatches[:50]:
+                scope = f'doctor {doctor_id}' if doctor_id else (str(day) if day else 'all')
+                self.stdout.write(f'  {scope} {status}: stored {stored}, expected {expected}')
+            raise CommandError(f'{len(mismatches)} appointment statistics are out of date; run without --check to rebuild')
+        self.stdout.write(self.style.SUCCESS('Appointment statistics match the appointments'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from hospital_app.relationships import rebuild_doctor_patients, verify_doctor_patients
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the doctor-patient relationship table from the appointments, or verify it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only compare the stored links with the appointments; fail on any difference')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            links = rebuild_doctor_patients()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {links} doctor-patient links'))
+            return
+
+        mismatches = verify_doctor_patients()
+        if mismatches:
+            for (doctor_id, patient_id), stored, expected in mismatches[:50]:
+                self.stdout.write(f'  doctor {doctor_id}, patient {patient_id}: stored {stored}, expected {expected}')
+            raise CommandError(f'{len(mismatches)} doctor-patient links are out of date; run without --check to rebuild')
+        self.stdout.write(self.style.SUCCESS('Doctor-patient links match the appointments'))
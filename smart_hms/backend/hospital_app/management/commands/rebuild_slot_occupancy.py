@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from hospital_app.availability import rebuild_slot_occupancy, verify_slot_occupancy
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-day slot occupancy bitmaps from the appointments, or verify them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only compare the stored bitmaps with the appointments; fail on any difference')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            days = rebuild_slot_occupancy()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt slot occupancy for {days} doctor-days'))
+            return
+
+        mismatches = verify_slot_occupancy()
+        if mismatches:
+            for (doctor_id, day), stored, expected in mismatches[:50]:
+                self.stdout.write(f'  doctor {doctor_id}, {day}: stored {stored:b}, expected {expected:b}')
+            raise CommandError(f'{len(mismatches)} slot occupancy bitmaps are out of date; run without --check to rebuild')
+        self.stdout.write(self.style.SUCCESS('Slot occupancy matches the appointments'))
@@ -0,0 +1,100 @@
+import csv
+import itertools
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from hospital_app.models import MedicalRecord
+
+
+def normalize_label(diagnosis):
+    """Turn a free-text diagnosis into a condition label ("Diabetes Type 2" -> "diabetes_type_2")"""
+    return '_'.join(diagnosis.lower().split())
+
+
+class Command(BaseCommand):
+    help = 'Retrain the symptom model from MedicalRecord history in fixed memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Records per partial_fit call')
+        # MultinomialNB keeps dense float64 conditions x n_features arrays: at 2**16,
+        # about 1 MB per condition in the pickle and 0.5 MB in the exported model
+        parser.add_argument('--n-features', type=int, default=2 ** 16, help='Width of the hashed feature space')
+        parser.add_argument('--no-seed-data', action='store_true', help='Do not include symptom_data.csv')
+        parser.add_argument('--no-export', action='store_true', help='Do not export the NumPy array model')
+
+    def _seed_rows(self, data_path):
+        """Rows from the bundled demo dataset"""
+        if not os.path.exists(data_path):
+            return
+        with open(data_path, newline='') as f:
+            for row in csv.DictReader(f):
+                yield row['symptoms'], row['condition']
+
+    def _record_rows(self, chunk_size):
+        """Stream (symptoms, diagnosis) pairs without loading the table"""
+        rows = (
+            MedicalRecord.objects.exclude(symptoms='').exclude(diagnosis='')
+            .order_by().values_list('symptoms', 'diagnosis')
+        )
+        for symptoms, diagnosis in rows.iterator(chunk_size=chunk_size):
+            yield symptoms, normalize_label(diagnosis)
+
+    def _chunks(self, rows, size):
+        texts, labels = [], []
+        for text, label in rows:
+            texts.append(text)
+            labels.append(label)
+            if len(texts) >= size:
+                yield texts, labels
+                texts, labels = [], []
+        if texts:
+            yield texts, labels
+
+    def handle(self, *args, **options):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+        from hospital_app.ai_model.numpy_engine import export_model
+        from hospital_app.ai_model.symptom_checker import SymptomCheckerAI, default_model_path, new_model_version, save_model
+
+        data_path = os.path.join(os.path.dirname(default_model_path()), 'symptom_data.csv')
+        use_seed = not options['no_seed_data']
+
+        # partial_fit needs every class up front; this is one DISTINCT query
+        diagnoses = (
+            MedicalRecord.objects.exclude(symptoms='').exclude(diagnosis='')
+            .order_by().values_list('diagnosis', flat=True).distinct()
+        )
+        classes = {normalize_label(diagnosis) for diagnosis in diagnoses.iterator()}
+        if use_seed:
+            classes.update(label for _, label in self._seed_rows(data_path))
+        classes = sorted(classes)
+        if len(classes) < 2:
+            raise CommandError('Need at least two distinct diagnoses to train')
+
+        # Stateless featurizer: memory is fixed by n_features, not by the data
+        vectorizer = HashingVectorizer(n_features=options['n_features'], alternate_sign=False, stop_words='english')
+        model = MultinomialNB()
+
+        rows = self._record_rows(options['chunk_size'])
+        if use_seed:
+            rows = itertools.chain(self._seed_rows(data_path), rows)
+
+        trained = 0
+        for texts, labels in self._chunks(rows, options['chunk_size']):
+            model.partial_fit(vectorizer.transform(texts), labels, classes=classes)
+            trained += len(texts)
+            self.stdout.write(f'Trained on {trained} records')
+
+        version = new_model_version()
+        save_model({
+            'model': model,
+            'vectorizer': vectorizer,
+            'conditions': classes,
+            'version': version
+        }, default_model_path())
+        self.stdout.write(self.style.SUCCESS(f'Wrote symptom model version {version} ({trained} records, {len(classes)} conditions)'))
+
+        if not options['no_export']:
+            ai = SymptomCheckerAI()
+            path = export_model(ai)
+            self.stdout.write(self.style.SUCCESS(f'Exported array model to {path}'))
@@ -0,0 +1,27 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from hospital_app.ai_model.sidecar import SidecarServer
+
+
+class Command(BaseCommand):
+    help = 'Serve symptom predictions from a process pool over a Unix-domain socket'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=None, help='Socket path (default: SYMPTOM_SIDECAR_SOCKET)')
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Inference worker processes')
+
+    def handle(self, *args, **options):
+        socket_path = options['socket'] or settings.SYMPTOM_SIDECAR_SOCKET
+        if not socket_path:
+            raise CommandError('Pass --socket or set SYMPTOM_SIDECAR_SOCKET')
+        
+        server = SidecarServer(socket_path, processes=options['processes'])
+        self.stdout.write(self.style.SUCCESS(f"Symptom sidecar listening on {socket_path} with {options['processes']} processes"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
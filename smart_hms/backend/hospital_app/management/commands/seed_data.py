@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from datetime import datetime, timedelta
-from hospital_app.models import User, Patient, Doctor, Admin, Appointment, MedicalRecord, Prescription
+from datetime import datetime, time, timedelta
+from hospital_app.models import User, Patient, Doctor, Admin, Appointment, MedicalRecord, Prescription, WorkingHours
 import random
 
 
@@ -108,6 +108,11 @@ class Command(BaseCommand):
                     'consultation_fee': doctor_data['consultation_fee']
                 }
             )
+            # Weekdays 9 to 5, so the availability search has slots to offer
+            for weekday in range(5):
+                WorkingHours.objects.get_or_create(
+                    doctor=doctor, weekday=weekday, start_time=time(9), defaults={'end_time': time(17)}
+                )
             doctors.append(doctor)
             self.stdout.write(f'Created doctor: {doctor}')
         
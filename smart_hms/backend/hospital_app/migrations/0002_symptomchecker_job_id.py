@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='symptomchecker',
+            name='job_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0002_symptomchecker_job_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', '-appointment_date'], name='appt_doctor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', '-appointment_date'], name='appt_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'appointment_date'], name='appt_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['appointment_date'], name='appt_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['doctor', '-created_at'], name='record_doctor_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['patient', '-created_at'], name='record_patient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['created_at'], name='record_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['doctor', '-created_at'], name='rx_doctor_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['patient', '-created_at'], name='rx_patient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['patient', '-created_at'], name='rx_active_patient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['created_at'], name='rx_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptomchecker',
+            index=models.Index(fields=['patient', '-created_at'], name='symptom_patient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptomchecker',
+            index=models.Index(fields=['created_at'], name='symptom_created_idx'),
+        ),
+    ]
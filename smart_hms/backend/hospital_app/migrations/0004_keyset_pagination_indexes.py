@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0003_role_scoped_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_doctor_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_patient_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='medicalrecord',
+            name='record_doctor_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='medicalrecord',
+            name='record_patient_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='medicalrecord',
+            name='record_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='symptomchecker',
+            name='symptom_patient_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='symptomchecker',
+            name='symptom_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', '-appointment_date', '-id'], name='appt_doctor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', '-appointment_date', '-id'], name='appt_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['-appointment_date', '-id'], name='appt_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['doctor', '-created_at', '-id'], name='record_doctor_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['patient', '-created_at', '-id'], name='record_patient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['-created_at', '-id'], name='record_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptomchecker',
+            index=models.Index(fields=['patient', '-created_at', '-id'], name='symptom_patient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptomchecker',
+            index=models.Index(fields=['-created_at', '-id'], name='symptom_created_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_appointment_stats(apps, schema_editor):
+    Appointment = apps.get_model('hospital_app', 'Appointment')
+    AppointmentStat = apps.get_model('hospital_app', 'AppointmentStat')
+    appointments = Appointment.objects.order_by()
+    rows = [
+        AppointmentStat(status=row['status'], count=row['n'])
+        for row in appointments.values('status').annotate(n=Count('id'))
+    ]
+    rows += [
+        AppointmentStat(day=row['day'], status=row['status'], count=row['n'])
+        for row in appointments.annotate(day=TruncDate('appointment_date')).values('day', 'status').annotate(n=Count('id'))
+    ]
+    rows += [
+        AppointmentStat(doctor_id=row['doctor_id'], status=row['status'], count=row['n'])
+        for row in appointments.values('doctor_id', 'status').annotate(n=Count('id'))
+    ]
+    AppointmentStat.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('confirmed', 'Confirmed'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=15)),
+                ('count', models.IntegerField(default=0)),
+                ('doctor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='appointment_stats', to='hospital_app.doctor')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='appointmentstat',
+            constraint=models.UniqueConstraint(condition=models.Q(('day__isnull', True), ('doctor__isnull', True)), fields=('status',), name='appointment_stat_total_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointmentstat',
+            constraint=models.UniqueConstraint(condition=models.Q(('day__isnull', False), ('doctor__isnull', True)), fields=('day', 'status'), name='appointment_stat_day_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointmentstat',
+            constraint=models.UniqueConstraint(condition=models.Q(('day__isnull', True), ('doctor__isnull', False)), fields=('doctor', 'status'), name='appointment_stat_doctor_unique'),
+        ),
+        migrations.RunPython(backfill_appointment_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Max, Min
+
+
+def backfill_doctor_patients(apps, schema_editor):
+    Appointment = apps.get_model('hospital_app', 'Appointment')
+    DoctorPatient = apps.get_model('hospital_app', 'DoctorPatient')
+    pairs = Appointment.objects.order_by().values('doctor_id', 'patient_id').annotate(
+        first_seen=Min('appointment_date'), last_seen=Max('appointment_date')
+    )
+    DoctorPatient.objects.bulk_create([DoctorPatient(**pair) for pair in pairs.iterator()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0005_appointment_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorPatient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='patient_links', to='hospital_app.doctor')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='doctor_links', to='hospital_app.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['doctor', '-last_seen'], name='doctor_patient_recent_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='doctorpatient',
+            constraint=models.UniqueConstraint(fields=('doctor', 'patient'), name='doctor_patient_unique'),
+        ),
+        migrations.RunPython(backfill_doctor_patients, migrations.RunPython.noop),
+    ]
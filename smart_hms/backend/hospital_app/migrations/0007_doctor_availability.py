@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def backfill_slot_occupancy(apps, schema_editor):
+    Appointment = apps.get_model('hospital_app', 'Appointment')
+    SlotOccupancy = apps.get_model('hospital_app', 'SlotOccupancy')
+    bitmaps = {}
+    rows = Appointment.objects.exclude(status='cancelled').values_list('doctor_id', 'appointment_date')
+    for doctor_id, when in rows.iterator():
+        local = timezone.localtime(when) if timezone.is_aware(when) else when
+        index = (local.hour * 60 + local.minute) // settings.APPOINTMENT_SLOT_MINUTES
+        bitmaps[(doctor_id, local.date())] = bitmaps.get((doctor_id, local.date()), 0) | 1 << index
+    SlotOccupancy.objects.bulk_create([
+        SlotOccupancy(doctor_id=doctor_id, day=day, booked=booked) for (doctor_id, day), booked in bitmaps.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0006_doctor_patient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkingHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='working_hours', to='hospital_app.doctor')),
+            ],
+            options={
+                'ordering': ['weekday', 'start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('booked', models.BigIntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_occupancy', to='hospital_app.doctor')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='workinghours',
+            constraint=models.UniqueConstraint(fields=('doctor', 'weekday', 'start_time'), name='working_hours_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='workinghours',
+            constraint=models.CheckConstraint(check=models.Q(('start_time__lt', models.F('end_time'))), name='working_hours_start_before_end'),
+        ),
+        migrations.AddConstraint(
+            model_name='slotoccupancy',
+            constraint=models.UniqueConstraint(fields=('doctor', 'day'), name='slot_occupancy_unique'),
+        ),
+        migrations.RunPython(backfill_slot_occupancy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:58
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_no_double_bookings(apps, schema_editor):
+    Appointment = apps.get_model('hospital_app', 'Appointment')
+    clashes = (Appointment.objects.exclude(status='cancelled').order_by().values('doctor_id', 'appointment_date')
+               .annotate(n=Count('id')).filter(n__gt=1))
+    examples = [f"doctor {row['doctor_id']} at {row['appointment_date']}" for row in clashes[:10]]
+    if examples:
+        raise RuntimeError(
+            'Cancel or move the extra appointments before adding appointment_slot_unique: ' + ', '.join(examples)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospital_app', '0007_doctor_availability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(check_no_double_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'cancelled'), _negated=True), fields=('doctor', 'appointment_date'), name='appointment_slot_unique'),
+        ),
+    ]
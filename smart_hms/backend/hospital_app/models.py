@@ -1,5 +1,5 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import DatabaseError, models
 from django.utils import timezone
 
 
@@ -79,8 +79,20 @@ class Admin(models.Model):
         return f"Admin: {self.user.get_full_name() or self.user.username}"
 
 
+class StaleVersionError(DatabaseError):
+    """Raised when saving a row someone else changed since it was read"""
+
+
 class Appointment(models.Model):
-    """Appointment scheduling"""
+    """Appointment scheduling
+
+    Every save is a compare-and-set on ``version``: the UPDATE only matches
+    the row if its version is still the one this instance was loaded with,
+    and raises ``StaleVersionError`` otherwise. Writes with
+    ``QuerySet.update()`` must increment ``version`` themselves. At most one
+    non-cancelled appointment may start at a time with a doctor
+    (``appointment_slot_unique``).
+    """
     STATUS_CHOICES = [
         ('scheduled', 'Scheduled'),
         ('confirmed', 'Confirmed'),
@@ -88,6 +100,8 @@ class Appointment(models.Model):
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     ]
+    # What the tables derived from appointments depend on (see signals.py)
+    TRACKED_FIELDS = ('status', 'appointment_date', 'doctor_id', 'patient_id')
     
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='appointments')
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='appointments')
@@ -95,14 +109,151 @@ class Appointment(models.Model):
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='scheduled')
     reason = models.TextField()
     notes = models.TextField(blank=True)
+    version = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-appointment_date']
+        constraints = [
+            # Cancelled appointments free their slot for someone else
+            models.UniqueConstraint(fields=['doctor', 'appointment_date'], condition=~models.Q(status='cancelled'),
+                                    name='appointment_slot_unique'),
+        ]
+        indexes = [
+            # Role-scoped lists: filter on the owner, newest first, id breaks ties for keyset pages
+            models.Index(fields=['doctor', '-appointment_date', '-id'], name='appt_doctor_date_idx'),
+            models.Index(fields=['patient', '-appointment_date', '-id'], name='appt_patient_date_idx'),
+            # Status counters and status filters over a date range
+            models.Index(fields=['status', 'appointment_date'], name='appt_status_date_idx'),
+            # Admin list ordering and per-day ranges
+            models.Index(fields=['-appointment_date', '-id'], name='appt_date_idx'),
+        ]
     
     def __str__(self):
         return f"Appointment: {self.patient.user.username} with Dr. {self.doctor.user.username} on {self.appointment_date}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_stored_row()
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        if fields is None:
+            self.remember_stored_row()
+        else:
+            self._loaded = None
+    
+    def remember_stored_row(self):
+        """Note the tracked fields as they are stored at the current version"""
+        if self.get_deferred_fields():
+            self._loaded = None
+        else:
+            self._loaded = (self.version, tuple(getattr(self, field) for field in self.TRACKED_FIELDS))
+    
+    def stored_row(self):
+        """The tracked fields as stored, if known without a query
+
+        Only while ``version`` is still the one loaded: a save at that
+        version succeeds only if nobody has changed the row since.
+        """
+        loaded = getattr(self, '_loaded', None)
+        if loaded is not None and loaded[0] == self.version:
+            return loaded[1]
+        return None
+    
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        version = self._meta.get_field('version')
+        expected = self.version
+        values = [value for value in values if value[0] is not version] + [(version, None, expected + 1)]
+        updated = super()._do_update(base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update)
+        if updated:
+            self.version = expected + 1
+        elif base_qs.filter(pk=pk_val).exists():
+            raise StaleVersionError(f'Appointment {pk_val} is no longer at version {expected}')
+        return updated
+
+
+class DoctorPatient(models.Model):
+    """A doctor and a patient they have an appointment with
+
+    Derived from ``Appointment`` and kept in sync on every appointment write
+    (see ``hospital_app.relationships``); doctor-scoped querysets read it
+    instead of joining through appointments. ``first_seen``/``last_seen`` are
+    the earliest and latest appointment dates between the two.
+    """
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='patient_links')
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='doctor_links')
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'patient'], name='doctor_patient_unique'),
+        ]
+        indexes = [
+            # Most recently seen patients first (doctor dashboard)
+            models.Index(fields=['doctor', '-last_seen'], name='doctor_patient_recent_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Doctor {self.doctor_id} - Patient {self.patient_id}"
+
+
+class WorkingHours(models.Model):
+    """A span of a weekday in which a doctor takes appointments
+
+    A doctor may have several spans a day (e.g. either side of lunch).
+    Doctors without any are bookable at any time but never offered by the
+    availability search.
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+    
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='working_hours')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    
+    class Meta:
+        ordering = ['weekday', 'start_time']
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'weekday', 'start_time'], name='working_hours_unique'),
+            models.CheckConstraint(check=models.Q(start_time__lt=models.F('end_time')), name='working_hours_start_before_end'),
+        ]
+    
+    def __str__(self):
+        return f"Doctor {self.doctor_id} {self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
+class SlotOccupancy(models.Model):
+    """The slots of one doctor's day that hold an appointment, as a bitmap
+
+    Bit ``i`` of ``booked`` is set while a non-cancelled appointment starts in
+    the slot ``i * APPOINTMENT_SLOT_MINUTES`` minutes after midnight. Kept in
+    sync on every appointment write (see ``hospital_app.availability``), so
+    availability is read from here instead of from the appointments.
+    """
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='slot_occupancy')
+    day = models.DateField()
+    booked = models.BigIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'day'], name='slot_occupancy_unique'),
+        ]
+    
+    def __str__(self):
+        return f"Doctor {self.doctor_id} {self.day}: {self.booked:b}"
 
 
 class MedicalRecord(models.Model):
@@ -119,6 +270,11 @@ class MedicalRecord(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['doctor', '-created_at', '-id'], name='record_doctor_created_idx'),
+            models.Index(fields=['patient', '-created_at', '-id'], name='record_patient_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='record_created_idx'),
+        ]
     
     def __str__(self):
         return f"Medical Record: {self.patient.user.username} - {self.created_at.date()}"
@@ -139,6 +295,13 @@ class Prescription(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['doctor', '-created_at'], name='rx_doctor_created_idx'),
+            models.Index(fields=['patient', '-created_at'], name='rx_patient_created_idx'),
+            # Active prescriptions by patient (patient dashboard)
+            models.Index(fields=['patient', '-created_at'], condition=models.Q(is_active=True), name='rx_active_patient_idx'),
+            models.Index(fields=['created_at'], name='rx_created_idx'),
+        ]
     
     def __str__(self):
         return f"Prescription: {self.medication_name} for {self.patient.user.username}"
@@ -151,10 +314,43 @@ class SymptomChecker(models.Model):
     predicted_conditions = models.JSONField(default=list)
     confidence_scores = models.JSONField(default=dict)
     recommendations = models.TextField(blank=True)
+    job_id = models.UUIDField(unique=True, null=True, blank=True, editable=False)  # Set for asynchronous analyses
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['patient', '-created_at', '-id'], name='symptom_patient_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='symptom_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Symptom Check: {self.symptoms[:50]}... - {self.created_at.date()}"
+
+
+class AppointmentStat(models.Model):
+    """Appointment counts rolled up by status, kept up to date on every write
+
+    Each row counts the appointments with one status in one scope: all
+    appointments (no doctor, no day), one day (``day`` set) or one doctor
+    (``doctor`` set). Maintained by ``hospital_app.stats``.
+    """
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='appointment_stats', null=True, blank=True)
+    day = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=15, choices=Appointment.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            # NULLs never collide in a plain unique constraint, so each scope gets its own
+            models.UniqueConstraint(fields=['status'], condition=models.Q(doctor__isnull=True, day__isnull=True),
+                                    name='appointment_stat_total_unique'),
+            models.UniqueConstraint(fields=['day', 'status'], condition=models.Q(doctor__isnull=True, day__isnull=False),
+                                    name='appointment_stat_day_unique'),
+            models.UniqueConstraint(fields=['doctor', 'status'], condition=models.Q(doctor__isnull=False, day__isnull=True),
+                                    name='appointment_stat_doctor_unique'),
+        ]
     
     def __str__(self):
-        return f"Symptom Check: {self.symptoms[:50]}... - {self.created_at.date()}"
\ No newline at end of file
+        scope = f"doctor {self.doctor_id}" if self.doctor_id else (str(self.day) if self.day else 'all')
+        return f"{scope} {self.status}: {self.count}"
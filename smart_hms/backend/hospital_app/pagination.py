@@ -0,0 +1,137 @@
+"""Keyset (cursor) pagination for the high-volume list endpoints
+
+Pages are read newest first on ``(<ordering field>, id)``. A cursor is an
+opaque token holding the ordering value and id of the row it points at, so
+fetching a page is an index range read of ``page_size + 1`` rows: there is
+no ``COUNT(*)`` and no ``OFFSET``, and deep pages cost the same as the first
+one.
+
+DRF's ``CursorPagination`` is not used because it breaks ties on the
+ordering field with an offset inside the cursor, which degrades when many
+rows share a timestamp (bulk-created symptom checks, clinic slots).
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Newest-first pages keyed on ``(ordering_field, id)``"""
+
+    ordering_field = None
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+
+    def encode_cursor(self, instance, reverse=False):
+        value = getattr(instance, self.ordering_field)
+        payload = {'v': value.isoformat(), 'id': instance.pk}
+        if reverse:
+            payload['r'] = 1
+        data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        """Return ``(value, id, reverse)`` from the request, or None on the first page"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            payload = json.loads(data)
+            value = parse_datetime(payload['v'])
+            pk = int(payload['id'])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, bool(payload.get('r'))
+
+    def order_queryset(self, queryset, reverse=False):
+        """``queryset`` in page order, newest first unless ``reverse``"""
+        field = self.ordering_field
+        return queryset.order_by(field, 'pk') if reverse else queryset.order_by(f'-{field}', '-pk')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        field = self.ordering_field
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            reverse = False
+        else:
+            value, pk, reverse = cursor
+            # The plain range condition bounds the index scan; the OR only
+            # filters rows that share the cursor's ordering value
+            if reverse:
+                queryset = queryset.filter(**{f'{field}__gte': value}).filter(
+                    Q(**{f'{field}__gt': value}) | Q(pk__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(**{f'{field}__lte': value}).filter(
+                    Q(**{f'{field}__lt': value}) | Q(pk__lt=pk)
+                )
+        queryset = self.order_queryset(queryset, reverse)
+
+        # One extra row tells whether there is another page in this direction
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        cursor = self.encode_cursor(self.page[-1])
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        cursor = self.encode_cursor(self.page[0], reverse=True)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class AppointmentDatePagination(KeysetPagination):
+    """Appointments, latest appointment date first"""
+    ordering_field = 'appointment_date'
+
+
+class CreatedAtPagination(KeysetPagination):
+    """Records in creation order, newest first"""
+    ordering_field = 'created_at'
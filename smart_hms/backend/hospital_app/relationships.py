@@ -0,0 +1,86 @@
+"""The doctor-patient relationship table and the querysets scoped by it
+
+``DoctorPatient`` has one row per doctor and patient with at least one
+appointment together. ORM saves and deletes of appointments keep it in sync
+through ``signals.py``; code that writes appointments with
+``QuerySet.update()`` or ``bulk_create()`` must call ``link`` /
+``refresh_link`` itself or run ``rebuild_doctor_patients`` afterwards.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Max, Min
+from django.db.models.functions import Greatest, Least
+
+from .authentication import owner_filter
+from .models import Appointment, DoctorPatient
+
+
+def link(doctor_id, patient_id, seen):
+    """Record an appointment at ``seen`` between a doctor and a patient"""
+    rows = DoctorPatient.objects.filter(doctor_id=doctor_id, patient_id=patient_id)
+    widen = {'first_seen': Least('first_seen', seen), 'last_seen': Greatest('last_seen', seen)}
+    if rows.update(**widen):
+        return
+    try:
+        with transaction.atomic():
+            DoctorPatient.objects.create(doctor_id=doctor_id, patient_id=patient_id, first_seen=seen, last_seen=seen)
+    except IntegrityError:
+        # Another writer linked them first
+        rows.update(**widen)
+
+
+def refresh_link(doctor_id, patient_id):
+    """Recompute a pair from its appointments, removing it if none are left"""
+    span = Appointment.objects.filter(doctor_id=doctor_id, patient_id=patient_id).aggregate(
+        first_seen=Min('appointment_date'), last_seen=Max('appointment_date')
+    )
+    rows = DoctorPatient.objects.filter(doctor_id=doctor_id, patient_id=patient_id)
+    if span['first_seen'] is None:
+        rows.delete()
+    elif not rows.update(**span):
+        link(doctor_id, patient_id, span['first_seen'])
+        rows.update(**span)
+
+
+def expected_links():
+    """``{(doctor_id, patient_id): (first_seen, last_seen)}`` from the appointments"""
+    pairs = Appointment.objects.order_by().values('doctor_id', 'patient_id').annotate(
+        first_seen=Min('appointment_date'), last_seen=Max('appointment_date')
+    )
+    return {(row['doctor_id'], row['patient_id']): (row['first_seen'], row['last_seen']) for row in pairs.iterator()}
+
+
+def rebuild_doctor_patients():
+    """Replace every link with one computed from the appointments; returns the count"""
+    links = expected_links()
+    with transaction.atomic():
+        DoctorPatient.objects.all().delete()
+        DoctorPatient.objects.bulk_create([
+            DoctorPatient(doctor_id=doctor_id, patient_id=patient_id, first_seen=first_seen, last_seen=last_seen)
+            for (doctor_id, patient_id), (first_seen, last_seen) in links.items()
+        ], batch_size=1000)
+    return len(links)
+
+
+def verify_doctor_patients():
+    """List ``(pair, stored, expected)`` for every link that is wrong or missing"""
+    expected = expected_links()
+    stored = {
+        (doctor_id, patient_id): (first_seen, last_seen)
+        for doctor_id, patient_id, first_seen, last_seen in DoctorPatient.objects.values_list(
+            'doctor_id', 'patient_id', 'first_seen', 'last_seen'
+        ).iterator()
+    }
+    return [
+        (pair, stored.get(pair), expected.get(pair))
+        for pair in sorted(set(expected) | set(stored))
+        if stored.get(pair) != expected.get(pair)
+    ]
+
+
+def doctor_patient_ids(user):
+    """Subquery of the ids of the patients a doctor user (or claims user) has seen
+
+    Filter with ``patient_id__in=`` (or ``id__in=`` on patients) so the
+    database runs it as one semi-join on the relationship table.
+    """
+    return DoctorPatient.objects.filter(**owner_filter(user, 'doctor')).values('patient_id')
@@ -0,0 +1,17 @@
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSON renderer recording its time on the request for the request log"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        started = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            request = (renderer_context or {}).get('request')
+            if request is not None:
+                http_request = request._request
+                http_request.render_seconds = getattr(http_request, 'render_seconds', 0.0) + time.perf_counter() - started
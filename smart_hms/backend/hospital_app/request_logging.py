@@ -0,0 +1,229 @@
+"""Structured request logging through a background thread
+
+``RequestLoggingMiddleware`` emits one record per request on the
+``hospital.requests`` logger with the timing fields operators need: total
+duration, database time and query count, and the time spent rendering the
+response body (``renderers.TimedJSONRenderer``). Records are sampled per URL
+name (``REQUEST_LOG_SAMPLE_RATES``), except failed and slow requests, which
+are always kept.
+
+The ``LOGGING`` setting routes the records to ``QueueLogHandler``, which only
+puts them on a bounded in-memory queue; a listener thread formats them as
+JSON lines and writes them out. A full queue drops records rather than
+making the request wait.
+
+This module is imported while Django configures logging, before the app
+registry is ready, so it must not import models or DRF.
+"""
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('hospital.requests')
+
+REDACTED = '[REDACTED]'
+
+
+def redact(value, fields=None):
+    """Copy of ``value`` with every key containing one of ``fields`` masked"""
+    fields = settings.REQUEST_LOG_REDACT_FIELDS if fields is None else fields
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if any(field in str(key).lower() for field in fields) else redact(item, fields)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item, fields) for item in value]
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; ``extra={'fields': {...}}`` is merged in"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        exception = self.formatException(record.exc_info) if record.exc_info else record.exc_text
+        if exception:
+            entry['exception'] = exception
+        return json.dumps(entry, default=str)
+
+
+class QueueLogHandler(QueueHandler):
+    """Hands records to a listener thread instead of writing them inline
+
+    The listener starts on first use, and again in a forked worker.
+    """
+
+    def __init__(self, maxsize=10000, stream=None):
+        super().__init__(None)
+        self.maxsize = maxsize
+        self.stream = stream
+        self.dropped = 0
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._listener = None
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(maxsize=self.maxsize)
+            target = logging.StreamHandler(self.stream or sys.stdout)
+            target.setFormatter(JsonFormatter())
+            self._listener = QueueListener(self.queue, target, respect_handler_level=False)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread; only pin the message
+        # and the traceback, which may not survive until then
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Wait until every queued record has been written"""
+        if self._pid == os.getpid():
+            self.queue.join()
+
+    def close(self):
+        if self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+        super().close()
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize() if self._pid == os.getpid() else 0,
+            'maxsize': self.maxsize,
+            'dropped': self.dropped,
+        }
+
+
+def queue_handler_stats():
+    """Counters of the request log queue for the metrics endpoint"""
+    for handler in logger.handlers:
+        if isinstance(handler, QueueLogHandler):
+            return handler.stats()
+    return None
+
+
+class QueryTimer:
+    """Database wrapper adding up the queries run during a request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def sample_rate_for(url_name):
+    return settings.REQUEST_LOG_SAMPLE_RATES.get(url_name, settings.REQUEST_LOG_SAMPLE_RATE)
+
+
+class RequestLoggingMiddleware:
+    """Log method, route, status and timings of every (sampled) request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REQUEST_LOG_ENABLED:
+            return self.get_response(request)
+
+        # The body must be read before the view consumes the stream
+        body = request.body if settings.REQUEST_LOG_BODIES else None
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        url_name = match.url_name if match else None
+        rate = sample_rate_for(url_name)
+        keep = (
+            response.status_code >= 500
+            or duration_ms >= settings.REQUEST_LOG_SLOW_MS
+            or (rate > 0 and random.random() < rate)
+        )
+        level = logging.ERROR if response.status_code >= 500 else logging.INFO
+        if keep and logger.isEnabledFor(level):
+            logger.log(
+                level,
+                'request',
+                extra={'fields': self._fields(request, response, url_name, rate, duration_ms, timer, body)},
+            )
+        return response
+
+    def _fields(self, request, response, url_name, rate, duration_ms, timer, body):
+        user = getattr(request, 'user', None)
+        authenticated = user is not None and user.is_authenticated
+        fields = {
+            'request_id': request.headers.get('X-Request-ID') or uuid.uuid4().hex,
+            'method': request.method,
+            'path': request.path,
+            'route': url_name,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 3),
+            'db_ms': round(timer.seconds * 1000, 3),
+            'db_queries': timer.count,
+            'serialize_ms': round(getattr(request, 'render_seconds', 0.0) * 1000, 3),
+            'response_bytes': len(response.content) if not response.streaming else None,
+            'user_id': user.id if authenticated else None,
+            'role': getattr(user, 'role', None) if authenticated else None,
+            'sample_rate': rate,
+        }
+        if body is not None:
+            fields['headers'] = redact(dict(request.headers))
+            fields['body'] = self._redacted_body(request, body)
+        return fields
+
+    def _redacted_body(self, request, body):
+        if request.content_type != 'application/json':
+            return f'<{len(body)} bytes of {request.content_type or "unknown"}>'
+        try:
+            return redact(json.loads(body or b'null'))
+        except ValueError:
+            return '<invalid JSON>'
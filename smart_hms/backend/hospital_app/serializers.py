@@ -1,7 +1,12 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
-from .models import User, Patient, Doctor, Admin, Appointment, MedicalRecord, Prescription, SymptomChecker
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError as DjangoValidationError
+from .availability import SLOT_TAKEN, held_slot, slot_minutes, slot_of, slot_problem, slot_start
+from .booking import BULK_TARGETS, BookingConflict, check_version
+from .models import User, Patient, Doctor, Admin, Appointment, MedicalRecord, Prescription, SymptomChecker, WorkingHours
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -50,7 +55,7 @@ class AppointmentSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Appointment
-        fields = ['id', 'patient', 'doctor', 'patient_name', 'doctor_name', 'appointment_date', 'appointment_time', 'status', 'reason', 'notes', 'created_at', 'updated_at']
+        fields = ['id', 'patient', 'doctor', 'patient_name', 'doctor_name', 'appointment_date', 'appointment_time', 'status', 'reason', 'notes', 'version', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_appointment_time(self, obj):
@@ -58,6 +63,61 @@ class AppointmentSerializer(serializers.ModelSerializer):
         if obj.appointment_date:
             return obj.appointment_date.strftime('%H:%M')
         return None
+    
+    def validate(self, attrs):
+        """Reject taking a slot off its boundary, outside the doctor's hours or already booked
+
+        ``version``, if given, is the one the client read; the save fails
+        with a conflict if the appointment has moved on since.
+        """
+        instance = self.instance
+        if instance is not None:
+            check_version(instance, attrs.get('version'))
+        doctor = attrs.get('doctor', instance and instance.doctor)
+        when = attrs.get('appointment_date', instance and instance.appointment_date)
+        appointment_status = attrs.get('status', instance.status if instance else Appointment._meta.get_field('status').default)
+        slot = held_slot((appointment_status, when, doctor.id))
+        # Edits that keep the slot the appointment already holds need no check
+        if slot is not None and slot != held_slot(instance and (instance.status, instance.appointment_date, instance.doctor_id)):
+            # One start time per slot lets the unique constraint catch racing bookings
+            if when != slot_start(*slot_of(when)):
+                raise serializers.ValidationError(
+                    {'appointment_date': [f'Appointments start on the {slot_minutes()}-minute slot boundaries.']}
+                )
+            problem = slot_problem(doctor.id, when)
+            if problem == SLOT_TAKEN:
+                raise BookingConflict(problem)
+            if problem:
+                raise serializers.ValidationError({'appointment_date': [problem]})
+        return attrs
+    
+    def create(self, validated_data):
+        validated_data.pop('version', None)
+        return super().create(validated_data)
+
+
+class BulkStatusSerializer(serializers.Serializer):
+    """Appointment ids and the status to move them all to"""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    status = serializers.ChoiceField(choices=BULK_TARGETS)
+    
+    def validate_ids(self, ids):
+        max_ids = settings.APPOINTMENT_BULK_MAX_IDS
+        if len(ids) > max_ids:
+            raise serializers.ValidationError(f'At most {max_ids} appointments per request.')
+        return ids
+
+
+class WorkingHoursSerializer(serializers.ModelSerializer):
+    """One span of a doctor's weekly working hours"""
+    class Meta:
+        model = WorkingHours
+        fields = ['weekday', 'start_time', 'end_time']
+    
+    def validate(self, attrs):
+        if attrs['start_time'] >= attrs['end_time']:
+            raise serializers.ValidationError('start_time must be before end_time.')
+        return attrs
 
 
 class MedicalRecordSerializer(serializers.ModelSerializer):
@@ -110,6 +170,46 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
+class UserImportRowSerializer(serializers.Serializer):
+    """One row of a bulk user import (see user_import.py)
+
+    Uniqueness is checked per batch by the importer, not per row here.
+    """
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField(required=False)
+    password = serializers.CharField(required=False, trim_whitespace=False)
+    first_name = serializers.CharField(max_length=150, required=False)
+    last_name = serializers.CharField(max_length=150, required=False)
+    role = serializers.ChoiceField(choices=User.ROLE_CHOICES)
+    phone_number = serializers.CharField(max_length=15, required=False)
+    address = serializers.CharField(required=False)
+    date_of_birth = serializers.DateField(required=False)
+    # Patient profile
+    emergency_contact = serializers.CharField(max_length=100, required=False)
+    emergency_phone = serializers.CharField(max_length=15, required=False)
+    blood_type = serializers.CharField(max_length=5, required=False)
+    allergies = serializers.CharField(required=False)
+    medical_insurance = serializers.CharField(max_length=100, required=False)
+    # Doctor profile
+    specialization = serializers.ChoiceField(choices=Doctor.SPECIALIZATION_CHOICES, required=False)
+    license_number = serializers.CharField(max_length=50, required=False)
+    experience_years = serializers.IntegerField(min_value=0, required=False)
+    consultation_fee = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    # Admin profile
+    department = serializers.CharField(max_length=100, required=False)
+    employee_id = serializers.CharField(max_length=20, required=False)
+    
+    def validate(self, attrs):
+        password = attrs.get('password')
+        if password:
+            user = User(**{field: attrs.get(field, '') for field in ('username', 'email', 'first_name', 'last_name')})
+            try:
+                validate_password(password, user)
+            except DjangoValidationError as e:
+                raise serializers.ValidationError({'password': list(e.messages)})
+        return attrs
+
+
 class LoginSerializer(serializers.Serializer):
     """Login serializer"""
     username = serializers.CharField()
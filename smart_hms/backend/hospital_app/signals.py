@@ -0,0 +1,179 @@
+"""Model signal handlers keeping derived data in step with their sources
+
+* ``AppointmentStat`` counts (``stats.py``) follow appointment writes.
+* ``DoctorPatient`` links (``relationships.py``) follow appointment writes.
+* ``SlotOccupancy`` bitmaps (``availability.py``) follow appointment writes.
+* Dashboard snapshots (``dashboard_cache.py``) are invalidated for every
+  user whose dashboard shows the written row.
+* Tokens are revoked when a user is deactivated or changes role, and the
+  per-process full-user cache (``authentication.py``) drops saved users.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import full_user_cache, revoke_user_tokens
+from .availability import update_occupancy
+from .dashboard_cache import dashboard_cache
+from .models import User, Patient, Doctor, Appointment, DoctorPatient, MedicalRecord, Prescription
+from .relationships import link, refresh_link
+from .stats import appointment_deltas, apply_deltas
+
+# User fields whose change invalidates issued tokens
+TOKEN_USER_FIELDS = {'role', 'is_active'}
+# User fields rendered on some dashboard, directly or as a name
+DASHBOARD_USER_FIELDS = {'username', 'email', 'first_name', 'last_name', 'role', 'phone_number', 'address', 'date_of_birth'}
+
+
+def _profile_user_ids(model, profile_ids):
+    profile_ids = {profile_id for profile_id in profile_ids if profile_id is not None}
+    if not profile_ids:
+        return set()
+    return set(model.objects.filter(id__in=profile_ids).values_list('user_id', flat=True))
+
+
+def _invalidate_dashboards(patient_ids=(), doctor_ids=(), user_ids=()):
+    if not dashboard_cache.enabled:
+        return
+    dashboard_cache.invalidate(
+        set(user_ids) | _profile_user_ids(Patient, patient_ids) | _profile_user_ids(Doctor, doctor_ids)
+    )
+
+
+def _stored_row(instance, *fields):
+    """Fields as stored, which may differ from a stale or modified instance"""
+    return type(instance).objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+# Appointments: statistics, doctor-patient links, slot occupancy and both parties' dashboards
+
+APPOINTMENT_FIELDS = Appointment.TRACKED_FIELDS
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_appointment_state(sender, instance, raw=False, **kwargs):
+    """Record the stored row before an update so the stats can move it"""
+    instance._previous_row = None
+    if not raw and not instance._state.adding and instance.pk is not None:
+        # Known without a query when saving at the version loaded, so the
+        # transaction starts with the UPDATE and takes its write lock at once
+        instance._previous_row = instance.stored_row() or _stored_row(instance, *APPOINTMENT_FIELDS)
+
+
+@receiver(post_save, sender=Appointment)
+def appointment_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_row', None)
+    current = tuple(getattr(instance, field) for field in APPOINTMENT_FIELDS)
+    apply_deltas(appointment_deltas(previous and previous[:3], current[:3]))
+    update_occupancy(previous and previous[:3], current[:3])
+
+    if previous is None:
+        link(instance.doctor_id, instance.patient_id, instance.appointment_date)
+    elif previous[2:] != current[2:]:
+        refresh_link(previous[2], previous[3])
+        link(instance.doctor_id, instance.patient_id, instance.appointment_date)
+    elif previous[1] != current[1]:
+        # A moved appointment may have been the first or last one
+        refresh_link(instance.doctor_id, instance.patient_id)
+
+    _invalidate_dashboards(
+        patient_ids=[instance.patient_id, previous and previous[3]],
+        doctor_ids=[instance.doctor_id, previous and previous[2]],
+    )
+    instance.remember_stored_row()
+
+
+@receiver(pre_delete, sender=Appointment)
+def remember_deleted_appointment(sender, instance, **kwargs):
+    instance._previous_row = _stored_row(instance, *APPOINTMENT_FIELDS)
+
+
+@receiver(post_delete, sender=Appointment)
+def appointment_deleted(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_row', None)
+    apply_deltas(appointment_deltas(previous and previous[:3], None))
+    update_occupancy(previous and previous[:3], None)
+    refresh_link(instance.doctor_id, instance.patient_id)
+    _invalidate_dashboards(patient_ids=[instance.patient_id], doctor_ids=[instance.doctor_id])
+
+
+# Prescriptions and medical records: the patient's dashboard
+
+@receiver(pre_save, sender=Prescription)
+@receiver(pre_save, sender=MedicalRecord)
+def remember_record_patient(sender, instance, raw=False, **kwargs):
+    instance._previous_patient_id = None
+    if not raw and not instance._state.adding and instance.pk is not None:
+        stored = _stored_row(instance, 'patient_id')
+        instance._previous_patient_id = stored and stored[0]
+
+
+@receiver(post_save, sender=Prescription)
+@receiver(post_save, sender=MedicalRecord)
+def record_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidate_dashboards(patient_ids=[instance.patient_id, getattr(instance, '_previous_patient_id', None)])
+
+
+@receiver(post_delete, sender=Prescription)
+@receiver(post_delete, sender=MedicalRecord)
+def record_deleted(sender, instance, **kwargs):
+    _invalidate_dashboards(patient_ids=[instance.patient_id])
+
+
+# Profiles and users: their own dashboard and every dashboard that lists them
+
+@receiver(post_save, sender=Patient)
+def patient_saved(sender, instance, raw=False, **kwargs):
+    if raw or not dashboard_cache.enabled:
+        return
+    # Doctors' dashboards list their patients
+    doctor_user_ids = DoctorPatient.objects.filter(patient_id=instance.pk).values_list('doctor__user_id', flat=True)
+    _invalidate_dashboards(user_ids={instance.user_id, *doctor_user_ids})
+
+
+@receiver(pre_save, sender=User)
+def remember_user_access(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_access = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is None or TOKEN_USER_FIELDS.intersection(update_fields):
+        instance._previous_access = _stored_row(instance, 'role', 'is_active')
+
+
+@receiver(post_save, sender=User)
+def revoke_changed_user_tokens(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    full_user_cache.invalidate(instance.pk)
+    previous = getattr(instance, '_previous_access', None)
+    if previous is None:
+        return
+    role, was_active = previous
+    # Tokens carry the role, so a new role needs a new login
+    if role != instance.role or (was_active and not instance.is_active):
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    full_user_cache.invalidate(instance.pk)
+    revoke_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw or created or not dashboard_cache.enabled:
+        return
+    # Logins only touch last_login
+    if update_fields is not None and not DASHBOARD_USER_FIELDS.intersection(update_fields):
+        return
+    user_ids = {instance.pk}
+    if instance.role == 'patient':
+        user_ids.update(DoctorPatient.objects.filter(patient__user_id=instance.pk).values_list('doctor__user_id', flat=True))
+    elif instance.role == 'doctor':
+        # Patients see the doctor's name on appointments, prescriptions and records
+        for model in (DoctorPatient, Prescription, MedicalRecord):
+            user_ids.update(model.objects.filter(doctor__user_id=instance.pk).values_list('patient__user_id', flat=True))
+    _invalidate_dashboards(user_ids=user_ids)
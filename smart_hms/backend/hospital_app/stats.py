@@ -0,0 +1,125 @@
+"""Incrementally maintained appointment statistics
+
+``AppointmentStat`` holds one count per status for every appointment, every
+day and every doctor. Saves and deletes through the ORM keep it current via
+the handlers in ``signals.py``; code that writes appointments with
+``QuerySet.update()`` or ``bulk_create()`` must call ``apply_deltas`` itself
+(or run ``rebuild_appointment_stats`` afterwards). Days are calendar days in
+the current time zone, so changing ``TIME_ZONE`` needs a rebuild.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Appointment, AppointmentStat
+
+
+def stat_keys(status, appointment_date, doctor_id):
+    """The ``(doctor_id, day, status)`` rows one appointment is counted in"""
+    day = timezone.localdate(appointment_date) if timezone.is_aware(appointment_date) else appointment_date.date()
+    return [(None, None, status), (None, day, status), (doctor_id, None, status)]
+
+
+def appointment_deltas(old, new):
+    """Count changes for an appointment going from ``old`` to ``new``
+
+    Both are ``(status, appointment_date, doctor_id)`` or None for a row that
+    does not exist (before a create, after a delete).
+    """
+    deltas = Counter()
+    if old is not None:
+        deltas.subtract(stat_keys(*old))
+    if new is not None:
+        deltas.update(stat_keys(*new))
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def apply_deltas(deltas):
+    """Add ``{(doctor_id, day, status): delta}`` to the stored counts"""
+    with transaction.atomic():
+        for (doctor_id, day, status), delta in sorted(deltas.items(), key=str):
+            rows = AppointmentStat.objects.filter(doctor_id=doctor_id, day=day, status=status)
+            # A missing row is never created by a decrement: its doctor is being deleted
+            if rows.update(count=F('count') + delta) or delta < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    AppointmentStat.objects.create(doctor_id=doctor_id, day=day, status=status, count=delta)
+            except IntegrityError:
+                # Another writer created the row first
+                rows.update(count=F('count') + delta)
+
+
+def expected_counts():
+    """``{(doctor_id, day, status): count}`` computed from the appointments"""
+    counts = {}
+    for row in Appointment.objects.order_by().values('status').annotate(n=Count('id')):
+        counts[(None, None, row['status'])] = row['n']
+    days = Appointment.objects.order_by().annotate(day=TruncDate('appointment_date')).values('day', 'status')
+    for row in days.annotate(n=Count('id')):
+        counts[(None, row['day'], row['status'])] = row['n']
+    for row in Appointment.objects.order_by().values('doctor_id', 'status').annotate(n=Count('id')):
+        counts[(row['doctor_id'], None, row['status'])] = row['n']
+    return counts
+
+
+def stored_counts():
+    """``{(doctor_id, day, status): count}`` as stored, without zero rows"""
+    return {
+        (doctor_id, day, status): count
+        for doctor_id, day, status, count in AppointmentStat.objects.exclude(count=0).values_list(
+            'doctor_id', 'day', 'status', 'count'
+        )
+    }
+
+
+def rebuild_appointment_stats():
+    """Replace the stored counts with fresh ones; returns the number of rows"""
+    counts = expected_counts()
+    with transaction.atomic():
+        AppointmentStat.objects.all().delete()
+        AppointmentStat.objects.bulk_create([
+            AppointmentStat(doctor_id=doctor_id, day=day, status=status, count=count)
+            for (doctor_id, day, status), count in counts.items()
+        ], batch_size=1000)
+    return len(counts)
+
+
+def verify_appointment_stats():
+    """List ``(key, stored, expected)`` for every count that is wrong"""
+    expected = expected_counts()
+    stored = stored_counts()
+    return [
+        (key, stored.get(key, 0), expected.get(key, 0))
+        for key in sorted(set(expected) | set(stored), key=str)
+        if stored.get(key, 0) != expected.get(key, 0)
+    ]
+
+
+def dashboard_counters(today):
+    """Admin dashboard appointment counters from the rollup rows
+
+    Reads at most one row per status for the totals and one per status for
+    ``today``, however many appointments there are.
+    """
+    counters = {
+        'total_appointments': 0,
+        'today_appointments': 0,
+        'pending_appointments': 0,
+        'completed_appointments': 0,
+    }
+    rows = AppointmentStat.objects.filter(doctor__isnull=True).filter(Q(day__isnull=True) | Q(day=today))
+    for day, status, count in rows.values_list('day', 'status', 'count'):
+        if day is not None:
+            counters['today_appointments'] += count
+            continue
+        counters['total_appointments'] += count
+        # Pending means scheduled or confirmed
+        if status in ('scheduled', 'confirmed'):
+            counters['pending_appointments'] += count
+        elif status == 'completed':
+            counters['completed_appointments'] += count
+    return counters
@@ -1,3 +1,1333 @@
-from django.test import TestCase
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, time as dt_time, timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.conf import global_settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .ai_model.cache import PredictionCache, canonicalize
+from .ai_model.client import SidecarClient
+from .ai_model.corpus import generate_corpus
+from .ai_model.jobs import JOB_CACHE_PREFIX, QueueFull, SymptomJobQueue, get_job_state, symptom_job_queue
+from .ai_model.hashing import hashed_feature, murmurhash3_32
+from .ai_model.keyword_matcher import KeywordMatcher, KeywordSymptomModel
+from .ai_model.numpy_engine import POINTER_NAME, NumpySymptomPredictor, export_model
+from .ai_model.registry import ModelRegistry, predict_symptoms
+from .ai_model.sidecar import LocalSidecar
+from .ai_model.symptom_checker import SymptomCheckerAI, save_model
+from .apps import check_shared_cache
+from .authentication import full_user_cache
+from .benchmarking import compare_to_baseline, percentile, summarize_latencies
+from .availability import verify_slot_occupancy
+from .dashboard_cache import dashboard_cache
+from .models import (
+    User, Patient, Doctor, Admin, Appointment, AppointmentStat, DoctorPatient, MedicalRecord, Prescription, SlotOccupancy,
+    StaleVersionError, SymptomChecker, WorkingHours,
+)
+from .load_data import LoadDataGenerator, delete_load_data
+from .relationships import verify_doctor_patients
+from .request_logging import REDACTED, QueueLogHandler, redact
+from .user_import import import_users
+from .stats import rebuild_appointment_stats, stored_counts, verify_appointment_stats
+
+
+def echo_predict(symptoms_list):
+    """Deterministic stand-in for the model: echoes each text back"""
+    return [{'conditions': [symptoms], 'confidence': {symptoms: 1.0}, 'recommendations': ''} for symptoms in symptoms_list]
+
+
+def slow_predict(symptoms_list):
+    time.sleep(0.5)
+    return echo_predict(symptoms_list)
+
+
+class SymptomSidecarTests(SimpleTestCase):
+    """Sidecar client and server, run in-process through LocalSidecar"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmpdir, 'sidecar.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_pipelined_requests_share_one_connection(self):
+        with LocalSidecar(self.socket_path, predict=echo_predict):
+            client = SidecarClient(self.socket_path, timeout=2.0)
+            futures = [client.submit([f'symptom {i}']) for i in range(20)]
+            results = [future.result(timeout=2.0)['results'][0]['conditions'] for future in futures]
+            self.assertEqual(client.predict_batch(['fever', 'cough'])[1]['conditions'], ['cough'])
+            client.close()
+
+        self.assertEqual(results, [[f'symptom {i}'] for i in range(20)])
+        self.assertEqual(client.connects, 1)
+        self.assertEqual(client.fallbacks, 0)
+
+    def test_timeout_falls_back_to_keyword_model(self):
+        with LocalSidecar(self.socket_path, predict=slow_predict):
+            client = SidecarClient(self.socket_path, timeout=0.05)
+            result = client.predict('chest pain and sweating')
+            client.close()
+
+        self.assertEqual(result, KeywordSymptomModel().predict('chest pain and sweating'))
+        self.assertEqual(client.fallbacks, 1)
+
+    def test_missing_sidecar_falls_back_to_keyword_model(self):
+        client = SidecarClient(self.socket_path, timeout=0.05)
+        self.assertEqual(client.predict('rash itching')['conditions'], ['dermatitis'])
+        self.assertEqual(client.fallbacks, 1)
+
+
+def make_user(username, role, **extra):
+    """Create a user with the matching role profile"""
+    user = User.objects.create_user(username=username, password='testpass123', role=role,
+                                    first_name=username.title(), last_name='Test', **extra)
+    if role == 'patient':
+        Patient.objects.create(user=user)
+    elif role == 'doctor':
+        Doctor.objects.create(user=user, license_number=f'DOC{user.id:06d}')
+    elif role == 'admin':
+        Admin.objects.create(user=user, employee_id=f'ADM{user.id:06d}')
+    return user
+
+
+class FakeModel:
+    """Stands in for a loaded model: remembers its file and load order"""
+
+    def __init__(self, model_path, number):
+        self.model_path = model_path
+        self.version = number
+
+    def predict(self, symptoms):
+        return {'conditions': [], 'confidence': {}, 'recommendations': ''}
+
+
+class ModelRegistryTests(SimpleTestCase):
+    """One model per process, reloaded only when its file changes"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.model_path = os.path.join(self.tmpdir, 'model.pkl')
+        with open(self.model_path, 'w') as f:
+            f.write('v1')
+        self.loads = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def load(self):
+        self.loads += 1
+        return FakeModel(self.model_path, self.loads)
+
+    def test_reloads_only_when_the_file_changes(self):
+        registry = ModelRegistry(loader=self.load, check_interval=0)
+        first = registry.get()
+        self.assertIs(registry.get(), first)
+        self.assertEqual(registry.stats()['loads'], 1)
+
+        with open(self.model_path, 'w') as f:
+            f.write('version 2')
+        second = registry.get()
+        self.assertIsNot(second, first)
+        self.assertEqual((second.version, registry.stats()['version']), (2, 2))
+        self.assertIs(registry.get(), second)
+
+    def test_check_interval_delays_the_file_check(self):
+        registry = ModelRegistry(loader=self.load, check_interval=3600)
+        first = registry.get()
+        with open(self.model_path, 'w') as f:
+            f.write('version 2')
+        self.assertIs(registry.get(), first)
+        registry.reset()
+        self.assertEqual(registry.get().version, 2)
+
+
+class NumpyEngineTests(SimpleTestCase):
+    """The exported array model predicts what the scikit-learn model does"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.mkdtemp()
+        # Trains from symptom_data.csv and saves into the temporary directory
+        cls.ai = SymptomCheckerAI(model_path=os.path.join(cls.tmpdir, 'model.pkl'))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+        super().tearDownClass()
+
+    TEXTS = ['fever cough headache', 'Chest pain, shortness of breath!', 'itchy rash on arms and legs',
+             'qwerty unknown words', 'back pain back pain after lifting']
+
+    def assert_matches_sklearn(self, ai, directory):
+        export_model(ai, directory)
+        predictor = NumpySymptomPredictor(directory)
+        self.assertEqual(predictor.conditions, [str(c) for c in ai.model.classes_])
+        expected = ai.model.predict_proba(ai.vectorizer.transform(self.TEXTS))
+        np.testing.assert_allclose(predictor.predict_proba(self.TEXTS), expected, rtol=0, atol=1e-12)
+
+    def test_tfidf_model_matches_sklearn(self):
+        self.assert_matches_sklearn(self.ai, os.path.join(self.tmpdir, 'tfidf'))
+
+    def test_hashing_model_matches_sklearn(self):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+
+        texts, labels = zip(*[('fever cough headache', 'flu'), ('chest pain sweating', 'heart_attack'),
+                              ('itchy red rash', 'dermatitis'), ('cough fever chills', 'pneumonia')])
+        vectorizer = HashingVectorizer(n_features=2 ** 10, alternate_sign=False, stop_words='english')
+        ai = SimpleNamespace(vectorizer=vectorizer, model=MultinomialNB().fit(vectorizer.transform(texts), labels),
+                             version='hashing-1')
+        self.assert_matches_sklearn(ai, os.path.join(self.tmpdir, 'hashing'))
+
+    def test_reexport_leaves_no_staging_directory(self):
+        directory = os.path.join(self.tmpdir, 'reexport')
+        export_model(self.ai, directory)
+        with self.assertRaises(FileExistsError):
+            export_model(self.ai, directory)
+        self.assertEqual(sorted(os.listdir(directory)), sorted([POINTER_NAME, str(self.ai.version)]))
+
+    def test_export_follows_the_umask(self):
+        directory = os.path.join(self.tmpdir, 'modes')
+        umask = os.umask(0o022)
+        try:
+            target = export_model(self.ai, directory)
+        finally:
+            os.umask(umask)
+        self.assertEqual(os.stat(target).st_mode & 0o777, 0o755)
+        for path in [os.path.join(directory, POINTER_NAME)] + [os.path.join(target, name) for name in os.listdir(target)]:
+            with self.subTest(path=path):
+                self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+
+
+class PredictionCacheTests(SimpleTestCase):
+    """Predictions are cached on canonical text, bounded by size, age and model version"""
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = PredictionCache(maxsize=2, ttl=10.0, clock=lambda: self.now)
+
+    def test_canonical_form_ignores_case_order_punctuation_and_stop_words(self):
+        self.assertEqual(canonicalize('Headache, fever and FATIGUE'), canonicalize('fatigue fever headache'))
+        self.assertEqual(canonicalize('I have a fever'), 'fever')
+        # Repeats change TF-IDF weights, so they stay
+        self.assertNotEqual(canonicalize('pain pain'), canonicalize('pain'))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set('v1', 'a', {'n': 1})
+        self.cache.set('v1', 'b', {'n': 2})
+        self.cache.get('v1', 'a')
+        self.cache.set('v1', 'c', {'n': 3})
+        self.assertIsNone(self.cache.get('v1', 'b'))
+        self.assertEqual((self.cache.get('v1', 'a'), self.cache.get('v1', 'c')), ({'n': 1}, {'n': 3}))
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_entries_expire_after_the_ttl(self):
+        self.cache.set('v1', 'a', {'n': 1})
+        self.now = 9.9
+        self.assertEqual(self.cache.get('v1', 'a'), {'n': 1})
+        self.now = 10.0
+        self.assertIsNone(self.cache.get('v1', 'a'))
+        self.assertEqual(self.cache.expirations, 1)
+
+    def test_new_model_version_drops_every_entry(self):
+        self.cache.set('v1', 'a', {'n': 1})
+        self.assertIsNone(self.cache.get('v2', 'a'))
+        self.assertIsNone(self.cache.get('v1', 'a'))
+        self.assertEqual(self.cache.invalidations, 1)
+
+    def test_results_are_copies(self):
+        value = {'conditions': ['flu']}
+        self.cache.set('v1', 'a', value)
+        value['conditions'].append('cold')
+        self.cache.get('v1', 'a')['conditions'].append('cough')
+        self.assertEqual(self.cache.get('v1', 'a'), {'conditions': ['flu']})
+
+
+class KeywordMatcherTests(SimpleTestCase):
+    """Fallback keywords match whole words and phrases only"""
+
+    def setUp(self):
+        self.matcher = KeywordMatcher({
+            'dermatitis': ['rash', 'itching', 'redness'],
+            'heart_attack': ['chest pain', 'shortness of breath', 'sweating'],
+            'pneumonia': ['cough', 'chest pain', 'fever'],
+        })
+
+    def test_keywords_match_on_word_boundaries(self):
+        self.assertEqual(self.matcher.score('I thrash around at night'), [])
+        self.assertEqual(self.matcher.score('coughing, feverish'), [])
+        self.assertEqual(self.matcher.score('A RASH!'), [('dermatitis', 1 / 3)])
+
+    def test_phrases_match_whole_and_in_order(self):
+        self.assertEqual(self.matcher.score('pain in the chest'), [])
+        self.assertEqual(self.matcher.score('chest-pain and sweating'),
+                         [('heart_attack', 2 / 3), ('pneumonia', 1 / 3)])
+
+    def test_ties_keep_declaration_order(self):
+        self.assertEqual([condition for condition, _ in self.matcher.score('rash and cough')],
+                         ['dermatitis', 'pneumonia'])
+
+
+class StartupTests(SimpleTestCase):
+    """Worker boot does not pay for pandas and scikit-learn"""
+
+    def test_startup_skips_the_heavy_ml_imports(self):
+        from .management.commands.benchmark_startup import Command
+
+        self.assertEqual(Command()._probe()['heavy_modules'], [])
+
+
+class RetrainingTests(SimpleTestCase):
+    """Hashed features, labels and model files used by incremental retraining"""
+
+    TOKENS = ['fever', 'headache', 'shortness', 'é', 'ab', 'abc', 'abcd', 'abcde', 'x' * 37]
+
+    def test_murmurhash_matches_sklearn(self):
+        from sklearn.utils import murmurhash3_32 as sklearn_murmurhash
+
+        for token in self.TOKENS:
+            with self.subTest(token=token):
+                self.assertEqual(murmurhash3_32(token), sklearn_murmurhash(token, positive=False))
+                self.assertEqual(murmurhash3_32(token, seed=7), sklearn_murmurhash(token, seed=7, positive=False))
+
+    def test_hashed_features_match_the_hashing_vectorizer(self):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        vectorizer = HashingVectorizer(n_features=2 ** 10, alternate_sign=True, norm=None, token_pattern=r'\S+')
+        for token in self.TOKENS:
+            with self.subTest(token=token):
+                row = vectorizer.transform([token])
+                index, sign = hashed_feature(token, 2 ** 10)
+                self.assertEqual((row.indices.tolist(), row.data.tolist()), ([index], [sign]))
+
+    def test_diagnoses_become_labels(self):
+        from .management.commands.retrain_symptom_model import normalize_label
+
+        self.assertEqual(normalize_label('  Diabetes  Type 2 '), 'diabetes_type_2')
+
+    def test_saved_model_follows_the_umask(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, ignore_errors=True)
+        path = os.path.join(tmpdir, 'model.pkl')
+        umask = os.umask(0o022)
+        try:
+            save_model({'version': '1'}, path)
+        finally:
+            os.umask(umask)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+
+
+class BenchmarkingTests(SimpleTestCase):
+    """Benchmark reports are compared in the direction each metric's name implies"""
+
+    def test_percentiles_interpolate(self):
+        self.assertEqual(percentile([4, 1, 3, 2], 50), 2.5)
+        self.assertEqual((percentile([5], 99), percentile([], 50)), (5, 0.0))
+        self.assertEqual(summarize_latencies([0.001, 0.003])['p50_ms'], 2.0)
+
+    def test_regressions_follow_the_metric_direction(self):
+        baseline = {'results': {'sklearn': {'p99_ms': 10.0, 'docs_per_second': 1000.0, 'top3_accuracy': 0.9,
+                                            'documents': 100}}}
+        better = {'results': {'sklearn': {'p99_ms': 5.0, 'docs_per_second': 2000.0, 'top3_accuracy': 0.95,
+                                          'documents': 1}}}
+        worse = {'results': {'sklearn': {'p99_ms': 13.0, 'docs_per_second': 700.0, 'top3_accuracy': 0.7,
+                                         'documents': 1000}}}
+        self.assertEqual(compare_to_baseline(better, baseline, 0.2), [])
+        regressions = compare_to_baseline(worse, baseline, 0.2)
+        self.assertEqual([line.split(':')[0] for line in regressions],
+                         ['sklearn.p99_ms', 'sklearn.docs_per_second', 'sklearn.top3_accuracy'])
+        self.assertEqual(compare_to_baseline(worse, baseline, 0.5), [])
+
+    def test_corpus_is_deterministic(self):
+        self.assertEqual(generate_corpus(50, seed=1), generate_corpus(50, seed=1))
+        self.assertNotEqual(generate_corpus(50, seed=1), generate_corpus(50, seed=2))
+        texts, labels = generate_corpus(20, extra_conditions=3)
+        self.assertEqual((len(texts), len(labels)), (20, 20))
+
+
+class SymptomInputTests(TestCase):
+    """Symptom endpoints reject malformed input before it reaches the model"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = make_user('patient', 'patient')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def test_analyze_needs_a_string(self):
+        for symptoms in (['fever', 'cough'], 42, '   ', {'text': 'fever'}):
+            with self.subTest(symptoms=symptoms):
+                response = self.client.post('/api/ai/symptom-checker/', {'symptoms': symptoms}, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(SymptomChecker.objects.exists())
+
+    def test_batch_checks_every_item_and_the_size(self):
+        url = '/api/ai/symptom-checker/batch/'
+        for symptoms in ('fever', [], ['fever', ''], ['fever', 3]):
+            with self.subTest(symptoms=symptoms):
+                self.assertEqual(self.client.post(url, {'symptoms': symptoms}, format='json').status_code, 400)
+        with override_settings(SYMPTOM_BATCH_MAX_SIZE=2):
+            response = self.client.post(url, {'symptoms': ['fever', 'cough', 'rash']}, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(SymptomChecker.objects.exists())
+
+    def test_batch_matches_single_predictions_in_order(self):
+        texts = ['chest pain shortness of breath', 'fever cough headache', 'itchy rash on arms']
+        response = self.client.post('/api/ai/symptom-checker/batch/', {'symptoms': texts}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['symptoms'] for item in response.data], texts)
+        self.assertEqual([item['predicted_conditions'] for item in response.data],
+                         [predict_symptoms(text)['conditions'] for text in texts])
+        self.assertEqual(SymptomChecker.objects.filter(patient=self.patient.patient_profile).count(), 3)
+
+
+class SymptomJobTests(TransactionTestCase):
+    """Queued analyses run in worker threads and are stored by the writer thread"""
+
+    def wait_for(self, job_id, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            state = get_job_state(job_id)
+            if state and state['status'] in ('completed', 'failed'):
+                return state['status']
+            time.sleep(0.01)
+        self.fail(f'job {job_id} did not finish')
+
+    def test_a_failing_job_does_not_fail_its_batch(self):
+        started, release = threading.Event(), threading.Event()
+
+        def predict(symptoms_list):
+            if symptoms_list == ['first']:
+                started.set()
+                release.wait(5)
+            if 'boom' in symptoms_list:
+                raise ValueError('cannot predict')
+            return echo_predict(symptoms_list)
+
+        jobs = SymptomJobQueue(workers=1, max_pending=10, batch_size=10, flush_interval=0.01, predict=predict)
+        first = jobs.submit('first', user_id=1)
+        started.wait(5)
+        # Queued while the worker is busy, so they are taken as one batch
+        batched = [jobs.submit(symptoms, user_id=1) for symptoms in ('fever headache', 'boom', 'cough', 'rash')]
+        with self.assertLogs('hospital_app.ai_model.jobs', 'ERROR'):
+            release.set()
+            outcomes = [self.wait_for(job_id) for job_id in [first] + batched]
+        self.assertEqual(outcomes, ['completed', 'completed', 'failed', 'completed', 'completed'])
+        self.assertEqual(sorted(SymptomChecker.objects.values_list('symptoms', flat=True)),
+                         ['cough', 'fever headache', 'first', 'rash'])
+
+    def test_submit_and_poll_through_the_api(self):
+        user = make_user('patient', 'patient')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/ai/symptom-checker/', {'symptoms': 'fever cough headache', 'async': True},
+                               format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.wait_for(response.data['job_id']), 'completed')
+
+        poll = client.get(response.data['status_url'])
+        self.assertEqual(poll.data['status'], 'completed')
+        self.assertEqual(poll.data['result']['symptoms'], 'fever cough headache')
+        self.assertEqual(poll.data['result']['patient'], user.patient_profile.id)
+        # Routed once, under the AI endpoints
+        job_id = response.data['job_id']
+        self.assertEqual(response.data['status_url'], f'/api/ai/symptom-checker/jobs/{job_id}/')
+        self.assertEqual(client.get(f'/api/symptom-checker/jobs/{job_id}/').status_code, 404)
+        # Someone else's job is not found
+        client.force_authenticate(make_user('other', 'patient'))
+        self.assertEqual(client.get(response.data['status_url']).status_code, 404)
+
+    def test_a_full_queue_rejects_jobs(self):
+        release = threading.Event()
+
+        def predict(symptoms_list):
+            release.wait(5)
+            return echo_predict(symptoms_list)
+
+        jobs = SymptomJobQueue(workers=1, max_pending=1, batch_size=1, predict=predict)
+        try:
+            jobs.submit('first', user_id=1)
+            deadline = time.monotonic() + 5
+            while jobs.stats()['pending'] and time.monotonic() < deadline:
+                time.sleep(0.01)  # until the worker holds the first job
+            jobs.submit('second', user_id=1)
+            with self.assertRaises(QueueFull):
+                jobs.submit('third', user_id=1)
+            self.assertEqual((jobs.submitted, jobs.rejected), (2, 1))
+        finally:
+            release.set()
+
+    def test_full_queue_answers_429(self):
+        client = APIClient()
+        client.force_authenticate(make_user('patient', 'patient'))
+        with mock.patch.object(symptom_job_queue, 'submit', side_effect=QueueFull):
+            response = client.post('/api/ai/symptom-checker/', {'symptoms': 'fever', 'async': True}, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_poll_after_the_result_was_deleted(self):
+        user = make_user('patient', 'patient')
+        symptom_check = SymptomChecker.objects.create(patient=user.patient_profile, symptoms='fever')
+        job_id = str(uuid.uuid4())
+        cache.set(JOB_CACHE_PREFIX + job_id, {'status': 'completed', 'user_id': user.id,
+                                              'symptom_check_id': symptom_check.id})
+        symptom_check.delete()
+        client = APIClient()
+        client.force_authenticate(user)
+        self.assertEqual(client.get(f'/api/ai/symptom-checker/jobs/{job_id}/').status_code, 404)
+
+    def test_submit_needs_a_string(self):
+        jobs = SymptomJobQueue(workers=1, predict=echo_predict)
+        for symptoms in (['not', 'a', 'string'], 42, ''):
+            with self.subTest(symptoms=symptoms), self.assertRaises(ValueError):
+                jobs.submit(symptoms, user_id=1)
+        self.assertEqual(jobs.submitted, 0)
+
+
+class QueryCountTests(TestCase):
+    """List endpoints must run a fixed number of queries, whatever the page size"""
+
+    # (url, {role: expected queries}); page-number lists cost COUNT + SELECT,
+    # keyset-paginated lists a single SELECT
+    ENDPOINTS = [
+        ('/api/users/', {'admin': 2, 'doctor': 2, 'patient': 2}),
+        ('/api/patients/', {'admin': 2, 'doctor': 2, 'patient': 2}),
+        ('/api/doctors/', {'admin': 2, 'doctor': 2, 'patient': 2}),
+        ('/api/admins/', {'admin': 2}),
+        ('/api/appointments/', {'admin': 1, 'doctor': 1, 'patient': 1}),
+        ('/api/medical-records/', {'admin': 1, 'doctor': 1, 'patient': 1}),
+        ('/api/prescriptions/', {'admin': 2, 'doctor': 2, 'patient': 2}),
+        ('/api/symptom-checker/', {'admin': 1, 'doctor': 1, 'patient': 1}),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            'admin': make_user('admin', 'admin'),
+            'doctor': make_user('doctor', 'doctor'),
+            'patient': make_user('patient', 'patient'),
+        }
+        cls.other_doctor = make_user('other_doctor', 'doctor').doctor_profile
+
+    def setUp(self):
+        # Dashboard snapshots would outlive the rolled-back rows of earlier tests
+        cache.clear()
+
+    def add_rows(self, count):
+        """Add ``count`` rows of every kind, spread over several patients"""
+        doctor = self.users['doctor'].doctor_profile
+        for i in range(count):
+            patient = self.users['patient'].patient_profile if i % 2 else make_user(f'p{User.objects.count()}', 'patient').patient_profile
+            appointment = Appointment.objects.create(
+                patient=patient, doctor=doctor if i % 3 else self.other_doctor,
+                appointment_date=timezone.now() + timedelta(hours=i), reason='Checkup'
+            )
+            record = MedicalRecord.objects.create(
+                patient=patient, doctor=appointment.doctor, appointment=appointment,
+                diagnosis='Flu', symptoms='fever', treatment_plan='Rest'
+            )
+            Prescription.objects.create(
+                patient=patient, doctor=appointment.doctor, medical_record=record,
+                medication_name='Paracetamol', dosage='500mg', frequency='daily', duration='5 days'
+            )
+            SymptomChecker.objects.create(patient=patient, symptoms='fever headache')
+
+    def assert_queries(self, url, role, expected):
+        client = APIClient()
+        client.force_authenticate(self.users[role])
+        with self.assertNumQueries(expected):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        for rows in (3, 15):
+            self.add_rows(rows)
+            for url, roles in self.ENDPOINTS:
+                for role, expected in roles.items():
+                    with self.subTest(url=url, role=role, rows=rows):
+                        self.assert_queries(url, role, expected)
+
+    def test_dashboard_query_count(self):
+        # One query per dashboard section
+        for rows in (3, 15):
+            self.add_rows(rows)
+            for role, expected in (('patient', 3), ('doctor', 2), ('admin', 3)):
+                with self.subTest(role=role, rows=rows):
+                    self.assert_queries('/api/dashboard/', role, expected)
+
+    def test_admin_dashboard_counters(self):
+        self.add_rows(6)
+        now = timezone.now()
+        # Either side of today's boundaries
+        start = timezone.make_aware(datetime.combine(timezone.localdate(), dt_time.min))
+        doctor = self.users['doctor'].doctor_profile
+        patient = self.users['patient'].patient_profile
+        for when, appointment_status in ((start - timedelta(seconds=1), 'completed'), (start, 'confirmed'),
+                                         (start + timedelta(days=1), 'cancelled')):
+            Appointment.objects.create(patient=patient, doctor=doctor, appointment_date=when,
+                                       reason='Checkup', status=appointment_status)
+
+        client = APIClient()
+        client.force_authenticate(self.users['admin'])
+        data = client.get('/api/dashboard/').data
+        self.assertEqual(data['total_users'], User.objects.count())
+        self.assertEqual(data['total_doctors'], Doctor.objects.count())
+        self.assertEqual(data['total_patients'], Patient.objects.count())
+        self.assertEqual(data['total_appointments'], Appointment.objects.count())
+        self.assertEqual(data['today_appointments'], Appointment.objects.filter(appointment_date__date=now.date()).count())
+        self.assertEqual(data['pending_appointments'], Appointment.objects.filter(status__in=['scheduled', 'confirmed']).count())
+        self.assertEqual(data['completed_appointments'], 1)
+
+
+class IndexTests(TestCase):
+    """Role-scoped list queries are served by the composite indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for role in ('admin', 'doctor', 'patient'):
+            make_user(role, role)
+
+    def test_indexes_are_migrated(self):
+        with connection.cursor() as cursor:
+            names = set(connection.introspection.get_constraints(cursor, Appointment._meta.db_table))
+        self.assertLessEqual({'appt_doctor_date_idx', 'appt_patient_date_idx', 'appt_status_date_idx', 'appt_date_idx'},
+                             names)
+
+    def test_owner_lists_neither_scan_nor_sort(self):
+        from .management.commands.explain_queries import Command
+        from .urls import router
+
+        viewsets = {prefix: viewset for prefix, viewset, _ in router.registry}
+        for role in ('doctor', 'patient'):
+            user = User.objects.get(username=role)
+            for prefix in ('appointments', 'medical-records', 'prescriptions'):
+                with self.subTest(role=role, prefix=prefix):
+                    view = viewsets[prefix](request=SimpleNamespace(user=user), format_kwarg=None, kwargs={}, action='list')
+                    command = Command()
+                    plan = command._list_queryset(view).explain()
+                    self.assertEqual(command._problems(plan), [], plan)
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages must visit every row once, in order, even with tied timestamps"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', 'admin')
+        patient = make_user('patient', 'patient').patient_profile
+        doctors = [make_user(f'doctor{i}', 'doctor').doctor_profile for i in range(5)]
+        base = timezone.now().replace(microsecond=0)
+        # Groups of five appointments (with five doctors) share a slot, so pages split ties
+        Appointment.objects.bulk_create([
+            Appointment(patient=patient, doctor=doctors[i % 5], appointment_date=base + timedelta(hours=i // 5),
+                        reason='Checkup')
+            for i in range(47)
+        ])
+        cls.expected = list(Appointment.objects.order_by('-appointment_date', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def walk(self, url, key):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data[key]
+        return ids
+
+    def test_next_links_visit_every_row_once_in_order(self):
+        self.assertEqual(self.walk('/api/appointments/', 'next'), self.expected)
+
+    def test_previous_links_walk_back_to_the_first_page(self):
+        url = '/api/appointments/'
+        pages = []
+        while url:
+            response = self.client.get(url)
+            pages.append(response.data)
+            url = response.data['next']
+        self.assertIsNone(pages[0]['previous'])
+
+        back = self.client.get(pages[-1]['previous'])
+        self.assertEqual(back.data['results'], pages[-2]['results'])
+        self.assertEqual(self.walk(pages[1]['previous'], 'previous'), [item['id'] for item in pages[0]['results']])
+
+    def test_invalid_cursor_is_rejected(self):
+        for cursor in ('not-base64!', 'e30', 'eyJ2IjoieCIsImlkIjoxfQ'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/appointments/', {'cursor': cursor}).status_code, 404)
+
+
+class AppointmentStatTests(TestCase):
+    """The rollup must follow every appointment write made through the ORM and the API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', 'admin')
+        cls.patient = make_user('patient', 'patient').patient_profile
+        cls.doctors = [make_user(f'doctor{i}', 'doctor').doctor_profile for i in range(2)]
+
+    def book(self, days=0, doctor=0, **extra):
+        return Appointment.objects.create(patient=self.patient, doctor=self.doctors[doctor],
+                                          appointment_date=timezone.now() + timedelta(days=days),
+                                          reason='Checkup', **extra)
+
+    def test_writes_keep_stats_in_step(self):
+        first = self.book()
+        second = self.book(days=1, doctor=1, status='confirmed')
+        self.book(days=-2, status='completed')
+        self.assertEqual(verify_appointment_stats(), [])
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        client.post(f'/api/appointments/{first.id}/confirm/')
+        client.post(f'/api/appointments/{second.id}/cancel/')
+        self.assertEqual(verify_appointment_stats(), [])
+
+        # Moving to another doctor and day moves the counts with it
+        first.refresh_from_db()
+        first.doctor = self.doctors[1]
+        first.appointment_date += timedelta(days=3)
+        first.save()
+        self.assertEqual(verify_appointment_stats(), [])
+
+        second.delete()
+        self.doctors[0].user.delete()
+        self.assertEqual(verify_appointment_stats(), [])
+        self.assertEqual(stored_counts()[(None, None, 'confirmed')], 1)
+
+    def test_rebuild_repairs_drift(self):
+        self.book()
+        Appointment.objects.update(status='completed')  # skips the signals
+        self.assertNotEqual(verify_appointment_stats(), [])
+        rebuild_appointment_stats()
+        self.assertEqual(verify_appointment_stats(), [])
+
+    def test_dashboard_reads_rollup(self):
+        for i in range(4):
+            self.book(days=i, status='scheduled' if i % 2 else 'completed')
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        data = client.get('/api/dashboard/').data
+        self.assertEqual(data['total_appointments'], 4)
+        self.assertEqual(data['pending_appointments'], 2)
+        self.assertEqual(data['completed_appointments'], 2)
+        self.assertEqual(data['today_appointments'], 1)
+        self.assertLessEqual(AppointmentStat.objects.filter(doctor__isnull=True, day__isnull=True).count(), 5)
+
+
+@override_settings(DASHBOARD_CACHE_TTL=300)
+class DashboardCacheTests(TestCase):
+    """Dashboard snapshots are reused until a write that shows on the dashboard"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', 'admin')
+        cls.patient_user = make_user('patient', 'patient')
+        cls.other_patient_user = make_user('other', 'patient')
+        cls.doctor_user = make_user('doctor', 'doctor')
+        cls.patient = cls.patient_user.patient_profile
+        cls.doctor = cls.doctor_user.doctor_profile
+        cls.appointment = Appointment.objects.create(patient=cls.patient, doctor=cls.doctor,
+                                                     appointment_date=timezone.now(), reason='Checkup')
+
+    def setUp(self):
+        cache.clear()
+        dashboard_cache.reset()
+
+    def dashboard(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_repeat_loads_run_no_queries(self):
+        first = self.dashboard(self.patient_user)
+        with self.assertNumQueries(0):
+            second = self.dashboard(self.patient_user)
+        self.assertEqual(first, second)
+        self.assertEqual((dashboard_cache.hits, dashboard_cache.misses), (1, 1))
+
+    @override_settings(DASHBOARD_CACHE_TTL=0)
+    def test_without_snapshots_every_load_is_rendered(self):
+        first = self.dashboard(self.patient_user)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.dashboard(self.patient_user)
+        self.assertTrue(queries.captured_queries)
+        self.assertEqual(first, second)
+        self.assertEqual((dashboard_cache.hits, dashboard_cache.misses), (0, 0))
+
+    def test_writes_invalidate_only_affected_dashboards(self):
+        self.dashboard(self.patient_user)
+        self.dashboard(self.other_patient_user)
+        self.dashboard(self.doctor_user)
+
+        Prescription.objects.create(patient=self.patient, doctor=self.doctor, medication_name='Ibuprofen',
+                                    dosage='200mg', frequency='daily', duration='3 days')
+        self.assertEqual(len(self.dashboard(self.patient_user)['prescriptions']), 1)
+        with self.assertNumQueries(0):
+            self.dashboard(self.other_patient_user)
+            self.dashboard(self.doctor_user)
+
+        self.appointment.status = 'confirmed'
+        self.appointment.save()
+        self.assertEqual(self.dashboard(self.doctor_user)['appointments'][0]['status'], 'confirmed')
+        self.assertEqual(self.dashboard(self.patient_user)['appointments'][0]['status'], 'confirmed')
+
+        # The doctor's dashboard lists the patient's profile
+        self.patient.blood_type = 'O+'
+        self.patient.save()
+        self.assertEqual(self.dashboard(self.doctor_user)['patients'][0]['blood_type'], 'O+')
+
+        # A renamed doctor shows up on the patient's appointments
+        self.doctor_user.first_name = 'Renamed'
+        self.doctor_user.save()
+        self.assertTrue(self.dashboard(self.patient_user)['appointments'][0]['doctor_name'].startswith('Renamed'))
+
+    def test_metrics_report_hits_and_misses(self):
+        self.dashboard(self.patient_user)
+        self.dashboard(self.patient_user)
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        stats = client.get('/api/metrics/').data['dashboard_cache']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_snapshots_need_a_shared_cache(self):
+        # The test run uses the default per-process cache
+        with self.assertRaisesMessage(ImproperlyConfigured, 'DASHBOARD_CACHE_TTL'):
+            check_shared_cache()
+        with override_settings(CACHE_IS_SHARED=True):
+            check_shared_cache()
+        with override_settings(DASHBOARD_CACHE_TTL=0):
+            check_shared_cache()
+
+
+class DoctorPatientTests(TestCase):
+    """Relationship links follow appointment writes and scope what doctors see"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor_users = [make_user(f'doctor{i}', 'doctor') for i in range(2)]
+        cls.doctors = [user.doctor_profile for user in cls.doctor_users]
+        cls.patients = [make_user(f'patient{i}', 'patient').patient_profile for i in range(3)]
+        cls.now = timezone.now()
+
+    def book(self, doctor, patient, days):
+        return Appointment.objects.create(patient=self.patients[patient], doctor=self.doctors[doctor],
+                                          appointment_date=self.now + timedelta(days=days), reason='Checkup')
+
+    def test_links_follow_appointment_writes(self):
+        first = self.book(0, 0, days=-10)
+        self.book(0, 0, days=5)
+        moved = self.book(0, 1, days=1)
+        self.assertEqual(verify_doctor_patients(), [])
+        link = DoctorPatient.objects.get(doctor=self.doctors[0], patient=self.patients[0])
+        self.assertEqual((link.first_seen, link.last_seen), (first.appointment_date, first.appointment_date + timedelta(days=15)))
+
+        first.appointment_date += timedelta(days=3)
+        first.save()
+        moved.doctor = self.doctors[1]
+        moved.save()
+        self.assertEqual(verify_doctor_patients(), [])
+        self.assertFalse(DoctorPatient.objects.filter(doctor=self.doctors[0], patient=self.patients[1]).exists())
+
+        first.delete()
+        Appointment.objects.get(doctor=self.doctors[1]).delete()
+        self.assertEqual(verify_doctor_patients(), [])
+        self.assertEqual(DoctorPatient.objects.count(), 1)
+
+    def test_doctor_querysets_use_links(self):
+        self.book(0, 0, days=1)
+        self.book(0, 0, days=2)
+        self.book(1, 1, days=1)
+        SymptomChecker.objects.create(patient=self.patients[0], symptoms='fever')
+        SymptomChecker.objects.create(patient=self.patients[1], symptoms='cough')
+        SymptomChecker.objects.create(patient=self.patients[2], symptoms='rash')
+
+        client = APIClient()
+        client.force_authenticate(self.doctor_users[0])
+        self.assertEqual([item['symptoms'] for item in client.get('/api/symptom-checker/').data['results']], ['fever'])
+        self.assertEqual([item['id'] for item in client.get('/api/patients/').data['results']], [self.patients[0].id])
+        self.assertEqual([item['id'] for item in client.get('/api/users/').data['results']], [self.patients[0].user_id])
+        self.assertEqual([item['id'] for item in client.get('/api/dashboard/').json()['patients']], [self.patients[0].id])
+
+
+@override_settings(AUTH_TOKEN_USER_MODE=True)
+class ClaimsAuthenticationTests(TestCase):
+    """Access tokens carry role and profile claims, so requests skip the user lookup"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient_user = make_user('patient', 'patient')
+        cls.doctor = make_user('doctor', 'doctor').doctor_profile
+        Appointment.objects.create(patient=cls.patient_user.patient_profile, doctor=cls.doctor,
+                                   appointment_date=timezone.now(), reason='Checkup')
+        Prescription.objects.create(patient=cls.patient_user.patient_profile, doctor=cls.doctor,
+                                    medication_name='Paracetamol', dosage='500mg', frequency='daily', duration='5 days')
+
+    def setUp(self):
+        # Revocations of earlier tests live in the cache
+        cache.clear()
+        full_user_cache.clear()
+        response = APIClient().post('/api/auth/login/', {'username': 'patient', 'password': 'testpass123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.tokens = response.data['tokens']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+
+    def test_scoped_lists_run_without_a_user_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/appointments/')
+        self.assertEqual(len(response.data['results']), 1)
+        with self.assertNumQueries(2):
+            self.client.get('/api/prescriptions/')
+
+        with override_settings(AUTH_TOKEN_USER_MODE=False):
+            with self.assertNumQueries(2):
+                self.client.get('/api/appointments/')
+
+    def test_full_user_comes_from_the_cache(self):
+        self.assertEqual(self.client.get('/api/dashboard/').json()['user']['username'], 'patient')
+        self.client.get('/api/dashboard/')
+        self.assertEqual((full_user_cache.hits, full_user_cache.misses), (1, 1))
+
+    def test_deactivation_and_role_change_revoke_tokens(self):
+        self.patient_user.is_active = False
+        self.patient_user.save()
+        self.assertEqual(self.client.get('/api/appointments/').status_code, 401)
+        response = APIClient().post('/api/auth/token/refresh/', {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+        self.patient_user.is_active = True
+        self.patient_user.save()
+        cache.clear()
+        self.setUp()
+        self.patient_user.role = 'doctor'
+        self.patient_user.save()
+        self.assertEqual(self.client.get('/api/appointments/').status_code, 401)
+
+    def test_unrelated_saves_keep_tokens_valid(self):
+        self.patient_user.first_name = 'Renamed'
+        self.patient_user.save()
+        self.assertEqual(self.client.get('/api/appointments/').status_code, 200)
+
+    @override_settings(AUTH_TOKEN_USER_MODE=False)
+    def test_default_mode_loads_the_user_row(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/appointments/').status_code, 200)
+        self.patient_user.is_active = False
+        self.patient_user.save()
+        self.assertEqual(self.client.get('/api/appointments/').status_code, 401)
+
+    def test_claims_mode_needs_a_shared_cache(self):
+        # The test run uses the default per-process cache
+        with self.assertRaisesMessage(ImproperlyConfigured, 'AUTH_TOKEN_USER_MODE'):
+            check_shared_cache()
+        with override_settings(CACHE_IS_SHARED=True):
+            check_shared_cache()
+        with override_settings(AUTH_TOKEN_USER_MODE=False):
+            check_shared_cache()
+
+
+@override_settings(REQUEST_LOG_ENABLED=True, REQUEST_LOG_SAMPLE_RATE=1.0, REQUEST_LOG_SAMPLE_RATES={})
+class RequestLoggingTests(TestCase):
+    """Request records: timing fields, redaction, sampling and the queue handler"""
+
+    @classmethod
+    def setUpTestData(cls):
+        make_user('patient', 'patient')
+
+    def login(self):
+        return self.client.post('/api/auth/login/', {'username': 'patient', 'password': 'testpass123'},
+                                content_type='application/json')
+
+    def test_redact_masks_nested_secrets(self):
+        data = {'username': 'a', 'new_password': 'x', 'tokens': {'access': 'y'}, 'items': [{'Authorization': 'z'}]}
+        self.assertEqual(redact(data), {'username': 'a', 'new_password': REDACTED, 'tokens': REDACTED,
+                                        'items': [{'Authorization': REDACTED}]})
+
+    @override_settings(REQUEST_LOG_BODIES=True)
+    def test_login_record_has_timings_and_no_password(self):
+        with self.assertLogs('hospital.requests', 'INFO') as logs:
+            self.assertEqual(self.login().status_code, 200)
+        fields = logs.records[0].fields
+        self.assertEqual((fields['route'], fields['status']), ('login', 200))
+        self.assertGreater(fields['db_queries'], 0)
+        self.assertGreater(fields['serialize_ms'], 0)
+        self.assertEqual(fields['body'], {'username': 'patient', 'password': REDACTED})
+        self.assertNotIn('testpass123', json.dumps(fields))
+
+    def test_sampling_is_per_url_name(self):
+        with override_settings(REQUEST_LOG_SAMPLE_RATES={'login': 0.0}):
+            with self.assertNoLogs('hospital.requests', 'INFO'):
+                self.login()
+            with override_settings(REQUEST_LOG_SLOW_MS=0):
+                with self.assertLogs('hospital.requests', 'INFO'):
+                    self.login()
+
+    def test_queue_handler_writes_json_lines(self):
+        stream = io.StringIO()
+        handler = QueueLogHandler(stream=stream)
+        record = logging.makeLogRecord({'name': 'hospital.requests', 'msg': 'request %s', 'args': ('done',),
+                                        'levelno': logging.INFO, 'levelname': 'INFO', 'fields': {'status': 200}})
+        handler.handle(record)
+        handler.flush()
+        handler.close()
+        entry = json.loads(stream.getvalue())
+        self.assertEqual((entry['message'], entry['status']), ('request done', 200))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserImportTests(TestCase):
+    """Bulk CSV import of users and profiles"""
+
+    CSV = (
+        'username,email,password,first_name,last_name,role,specialization,license_number,blood_type\n'
+        'alice,alice@example.com,Str0ng-pass-1,Alice,Ng,patient,,,O+\n'
+        'bob,,Str0ng-pass-2,Bob,Li,doctor,cardiology,,\n'
+        'carol,carol@example.com,,Carol,Wu,admin,,,\n'
+        'alice,,Str0ng-pass-3,,,patient,,,\n'
+        'dave,not-an-email,,,,nurse,,,\n'
+        'erin,,Str0ng-pass-4,,,doctor,,DOC-EXISTING,\n'
+        'frank,,123,,,patient,,,\n'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        existing = make_user('existing_doctor', 'doctor')
+        existing.doctor_profile.license_number = 'DOC-EXISTING'
+        existing.doctor_profile.save()
+        cls.admin = make_user('admin', 'admin')
+
+    def test_valid_rows_are_created_and_invalid_rows_reported(self):
+        report = import_users(io.StringIO(self.CSV), batch_size=2, workers=2)
+        self.assertEqual((report['rows'], report['created'], report['failed']), (7, 3, 4))
+        self.assertEqual({error['line']: set(error['errors']) for error in report['errors']}, {
+            5: {'username'}, 6: {'email', 'role'}, 7: {'license_number'}, 8: {'password'},
+        })
+
+        alice = User.objects.get(username='alice')
+        # Spawned hashing workers use the project's hashers, not this class's override
+        with override_settings(PASSWORD_HASHERS=global_settings.PASSWORD_HASHERS):
+            self.assertTrue(alice.check_password('Str0ng-pass-1'))
+        self.assertEqual(alice.patient_profile.blood_type, 'O+')
+        bob = User.objects.get(username='bob')
+        self.assertEqual(bob.doctor_profile.license_number, f'DOC{bob.id:06d}')
+        carol = User.objects.get(username='carol')
+        self.assertFalse(carol.has_usable_password())
+        self.assertEqual(carol.admin_profile.employee_id, f'ADM{carol.id:06d}')
+
+    def test_endpoint_is_admin_only_hashes_inline_and_supports_dry_run(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        upload = io.BytesIO(self.CSV.encode())
+        upload.name = 'users.csv'
+        response = client.post('/api/users/import/', {'file': upload, 'dry_run': 'true'}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['valid'], response.json()['created']), (3, 0))
+        self.assertFalse(User.objects.filter(username='alice').exists())
+
+        upload.seek(0)
+        with mock.patch('hospital_app.user_import.ProcessPoolExecutor') as pool:
+            response = client.post('/api/users/import/', {'file': upload}, format='multipart')
+        pool.assert_not_called()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created_by_role'], {'patient': 1, 'doctor': 1, 'admin': 1})
+
+        client.force_authenticate(User.objects.get(username='existing_doctor'))
+        self.assertEqual(client.post('/api/users/import/', {}, format='multipart').status_code, 403)
+
+
+class LoadDataTests(TestCase):
+    """Synthetic dataset generator"""
+
+    def generate(self):
+        generator = LoadDataGenerator(seed=7, doctors=5, patients=40, days_back=30, days_ahead=7,
+                                      anchor=datetime(2026, 3, 2).date(), batch_size=100)
+        generator.create_people()
+        generator.add_appointments(300)
+        generator.rebuild_derived()
+        return list(Appointment.objects.order_by('id').values_list(
+            'doctor__user__username', 'patient__user__username', 'appointment_date', 'status', 'created_at',
+        ))
+
+    def test_same_seed_same_rows(self):
+        first = self.generate()
+        self.assertEqual(len(first), 300)
+        self.assertEqual(verify_appointment_stats(), [])
+        self.assertEqual(verify_doctor_patients(), [])
+        self.assertEqual(verify_slot_occupancy(), [])
+        self.assertTrue(MedicalRecord.objects.filter(appointment__status='completed').exists())
+        booked = [(doctor, when) for doctor, patient, when, appointment_status, created in first
+                  if appointment_status != 'cancelled']
+        self.assertEqual(len(booked), len(set(booked)))
+
+        delete_load_data()
+        self.assertFalse(User.objects.filter(username__startswith='load_').exists())
+        self.assertEqual(self.generate(), first)
+
+
+class EndpointBenchmarkTests(SimpleTestCase):
+    def test_cases_match_the_urlconf(self):
+        from .management.commands.benchmark_endpoints import CASES, discovered_routes
+
+        routes = discovered_routes()
+        self.assertEqual([case.key for case in CASES if (case.name, case.method) not in routes], [])
+
+
+class AvailabilityTests(TestCase):
+    """Slot bitmaps follow appointment writes and answer availability on their own"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = make_user('patient', 'patient')
+        cls.cardiologist = make_user('cardio', 'doctor').doctor_profile
+        cls.cardiologist.specialization = 'cardiology'
+        cls.cardiologist.save()
+        cls.general = make_user('general', 'doctor').doctor_profile
+        for doctor in (cls.cardiologist, cls.general):
+            WorkingHours.objects.bulk_create([
+                WorkingHours(doctor=doctor, weekday=weekday, start_time=dt_time(9), end_time=dt_time(11))
+                for weekday in range(7)
+            ])
+        cls.day = timezone.localdate() + timedelta(days=7)
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime.combine(self.day, dt_time(hour, minute)))
+
+    def book(self, when, doctor=None, **extra):
+        return Appointment.objects.create(patient=self.patient.patient_profile, doctor=doctor or self.cardiologist,
+                                          appointment_date=when, reason='Checkup', **extra)
+
+    def booked(self, doctor=None):
+        row = SlotOccupancy.objects.filter(doctor=doctor or self.cardiologist, day=self.day).first()
+        return row.booked if row else 0
+
+    def test_bitmap_follows_appointment_writes(self):
+        first = self.book(self.at(9))
+        self.book(self.at(9, 10))  # same slot, booked around the API
+        second = self.book(self.at(10))
+        self.assertEqual(self.booked(), 1 << 18 | 1 << 20)
+
+        first.status = 'cancelled'
+        first.save()
+        self.assertEqual(self.booked(), 1 << 18 | 1 << 20)  # still held by the 09:10 booking
+
+        second.appointment_date = self.at(10, 30)
+        second.save()
+        self.assertEqual(self.booked(), 1 << 18 | 1 << 21)
+
+        second.doctor = self.general
+        second.save()
+        self.assertEqual((self.booked(), self.booked(self.general)), (1 << 18, 1 << 21))
+        second.delete()
+        self.assertEqual(self.booked(self.general), 0)
+        self.assertEqual(verify_slot_occupancy(), [])
+
+    def test_search_reads_bitmaps_not_appointments(self):
+        self.book(self.at(9))
+        client = APIClient()
+        client.force_authenticate(self.patient)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/doctors/availability/', {
+                'specialization': 'cardiology', 'date_from': self.day.isoformat(), 'days': 1, 'limit': 3,
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([slot['start'] for slot in response.data['slots']], [self.at(9, 30), self.at(10), self.at(10, 30)])
+        self.assertEqual({slot['doctor'] for slot in response.data['slots']}, {self.cardiologist.id})
+        self.assertFalse([query for query in queries.captured_queries if 'hospital_app_appointment' in query['sql']])
+        self.assertEqual(client.get('/api/doctors/availability/', {'days': 400}).status_code, 400)
+
+    def test_booking_rejects_taken_and_closed_slots(self):
+        self.book(self.at(9))
+        client = APIClient()
+        client.force_authenticate(self.patient)
+
+        def post(when):
+            return client.post('/api/appointments/', {
+                'patient': self.patient.patient_profile.id, 'doctor': self.cardiologist.id,
+                'appointment_date': when.isoformat(), 'reason': 'Checkup',
+            }, format='json')
+
+        self.assertEqual(post(self.at(9)).status_code, 409)
+        self.assertEqual(post(self.at(9, 15)).status_code, 400)  # not on a slot boundary
+        self.assertEqual(post(self.at(14)).status_code, 400)
+        self.assertEqual(post(self.at(9, 30)).status_code, 201)
+        self.assertEqual(self.booked(), 1 << 18 | 1 << 19)
+
+    def test_working_hours_replace(self):
+        client = APIClient()
+        client.force_authenticate(self.cardiologist.user)
+        url = f'/api/doctors/{self.cardiologist.id}/working-hours/'
+        response = client.put(url, [{'weekday': 0, 'start_time': '08:00', 'end_time': '12:00'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(self.cardiologist.working_hours.values_list('weekday', flat=True)), [0])
+        bad = client.put(url, [{'weekday': 1, 'start_time': '12:00', 'end_time': '08:00'}], format='json')
+        self.assertEqual(bad.status_code, 400)
+
+        client.force_authenticate(self.patient)
+        self.assertEqual(client.put(url, [], format='json').status_code, 403)
+
+
+class BookingConcurrencyTests(TestCase):
+    """Racing bookings and stale writes end in a 409, never in a double booking or lost update"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = make_user('patient', 'patient')
+        cls.doctor = make_user('doctor', 'doctor').doctor_profile
+        cls.when = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=3), dt_time(10)))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def test_database_rejects_a_booking_the_bitmap_missed(self):
+        # Another writer's row, not yet visible in the bitmap
+        Appointment.objects.bulk_create([Appointment(patient=self.patient.patient_profile, doctor=self.doctor,
+                                                     appointment_date=self.when, reason='Checkup')])
+        response = self.client.post('/api/appointments/', {
+            'patient': self.patient.patient_profile.id, 'doctor': self.doctor.id,
+            'appointment_date': self.when.isoformat(), 'reason': 'Checkup',
+        }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_stale_version_is_a_conflict(self):
+        appointment = Appointment.objects.create(patient=self.patient.patient_profile, doctor=self.doctor,
+                                                 appointment_date=self.when, reason='Checkup')
+        url = f'/api/appointments/{appointment.id}/'
+        first = self.client.patch(url, {'notes': 'first', 'version': 1}, format='json')
+        self.assertEqual((first.status_code, first.data['version']), (200, 2))
+        self.assertEqual(self.client.patch(url, {'notes': 'second', 'version': 1}, format='json').status_code, 409)
+        self.assertEqual(self.client.post(f'{url}cancel/', {'version': 1}, format='json').status_code, 409)
+        self.assertEqual(self.client.post(f'{url}cancel/', {'version': 2}, format='json').data['version'], 3)
+
+        appointment.refresh_from_db()
+        self.assertEqual((appointment.notes, appointment.status), ('first', 'cancelled'))
+        stale = Appointment.objects.get(pk=appointment.pk)
+        appointment.save()
+        with self.assertRaises(StaleVersionError):
+            stale.save()
+
+    def test_rebooked_slot_cannot_be_reconfirmed(self):
+        booking = {'patient': self.patient.patient_profile.id, 'doctor': self.doctor.id,
+                   'appointment_date': self.when.isoformat(), 'reason': 'Checkup'}
+        first = self.client.post('/api/appointments/', booking, format='json').data['id']
+        self.assertEqual(self.client.post(f'/api/appointments/{first}/cancel/').status_code, 200)
+        self.assertEqual(self.client.post('/api/appointments/', booking, format='json').status_code, 201)
+
+        self.assertEqual(self.client.post(f'/api/appointments/{first}/confirm/').status_code, 409)
+        self.assertEqual(Appointment.objects.get(pk=first).status, 'cancelled')
+        self.assertEqual(Appointment.objects.exclude(status='cancelled').count(), 1)
+        self.assertEqual(verify_slot_occupancy(), [])
+
+
+class BulkStatusTests(TestCase):
+    """Bulk status changes run one scoped UPDATE and keep the derived tables current"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('frontdesk', 'admin')
+        cls.patient = make_user('patient', 'patient')
+        cls.doctor = make_user('doctor', 'doctor').doctor_profile
+        cls.other_doctor = make_user('other', 'doctor').doctor_profile
+        cls.day = timezone.localdate() + timedelta(days=2)
+
+    def book(self, hour, doctor=None, **extra):
+        return Appointment.objects.create(
+            patient=self.patient.patient_profile, doctor=doctor or self.doctor, reason='Checkup',
+            appointment_date=timezone.make_aware(datetime.combine(self.day, dt_time(hour))), **extra
+        )
+
+    def post(self, user, ids, new_status):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post('/api/appointments/bulk-status/', {'ids': ids, 'status': new_status}, format='json')
+
+    def test_outcome_per_id(self):
+        scheduled = [self.book(9), self.book(10)]
+        done = self.book(11, status='completed')
+        cancelled = self.book(12, status='cancelled')
+        theirs = self.book(13, doctor=self.other_doctor)
+        ids = [appointment.id for appointment in scheduled] + [done.id, cancelled.id, theirs.id, 999999]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(self.doctor.user, ids, 'cancelled')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual([result['outcome'] for result in response.data['results']], [
+            'updated', 'updated', 'invalid_transition', 'unchanged', 'not_found', 'not_found',
+        ])
+        self.assertEqual(response.data['results'][0]['version'], 2)
+        updates = [query for query in queries.captured_queries
+                   if query['sql'].startswith('UPDATE "hospital_app_appointment"')]
+        self.assertEqual(len(updates), 1)
+
+        self.assertEqual(set(Appointment.objects.filter(status='cancelled').values_list('id', flat=True)),
+                         {scheduled[0].id, scheduled[1].id, cancelled.id})
+        self.assertEqual(Appointment.objects.get(pk=theirs.pk).status, 'scheduled')
+        self.assertEqual(verify_appointment_stats(), [])
+        self.assertEqual(verify_slot_occupancy(), [])
+
+    def test_rejects_bad_requests(self):
+        appointment = self.book(9)
+        self.assertEqual(self.post(self.admin, [appointment.id], 'scheduled').status_code, 400)
+        self.assertEqual(self.post(self.admin, [], 'confirmed').status_code, 400)
+        with override_settings(APPOINTMENT_BULK_MAX_IDS=1):
+            self.assertEqual(self.post(self.admin, [appointment.id, appointment.id + 1], 'confirmed').status_code, 400)
+
+    def test_single_actions_write_only_the_status(self):
+        appointment = self.book(9)
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(f'/api/appointments/{appointment.id}/confirm/')
+        self.assertEqual((response.status_code, response.data['version']), (200, 2))
+        update = next(query['sql'] for query in queries.captured_queries
+                      if query['sql'].startswith('UPDATE "hospital_app_appointment"'))
+        self.assertNotIn('"reason"', update)
+        self.assertIn('"version"', update)
+
+    def test_single_actions_follow_the_transitions(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        for hour, current, action, code in [(9, 'completed', 'confirm', 409), (10, 'cancelled', 'confirm', 409),
+                                            (11, 'confirmed', 'confirm', 409), (12, 'completed', 'cancel', 409),
+                                            (13, 'confirmed', 'cancel', 200), (14, 'scheduled', 'confirm', 200)]:
+            with self.subTest(current=current, action=action):
+                appointment = self.book(hour, status=current)
+                response = client.post(f'/api/appointments/{appointment.id}/{action}/')
+                self.assertEqual(response.status_code, code)
+                if code == 409:
+                    appointment.refresh_from_db()
+                    self.assertEqual((appointment.status, appointment.version), (current, 1))
+        self.assertEqual(verify_appointment_stats(), [])
+        self.assertEqual(verify_slot_occupancy(), [])
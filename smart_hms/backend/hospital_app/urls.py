@@ -23,8 +23,13 @@ urlpatterns = [
     # Dashboard endpoint
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
     
+    # Runtime metrics endpoint
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    
     # AI endpoints
     path('ai/symptom-checker/', views.SymptomCheckerViewSet.as_view({'post': 'analyze'}), name='ai_symptom_checker'),
+    path('ai/symptom-checker/batch/', views.SymptomCheckerViewSet.as_view({'post': 'analyze_batch'}), name='ai_symptom_checker_batch'),
+    path('ai/symptom-checker/jobs/<uuid:job_id>/', views.SymptomCheckerViewSet.as_view({'get': 'job_status'}), name='ai_symptom_checker_job'),
     
     # Include router URLs
     path('', include(router.urls)),
@@ -0,0 +1,224 @@
+"""Bulk import of users and their role profiles from CSV
+
+Rows are read lazily and handled ``batch_size`` at a time: each batch is
+validated with ``UserImportRowSerializer``, checked for usernames, license
+numbers and employee ids that already exist (in the database or earlier in
+the file) with one query per column, hashed (across a process pool when
+``workers`` allows) and inserted with ``bulk_create``. Invalid rows are skipped and reported by line
+number; the valid rows of the batch are still imported.
+
+``bulk_create`` sends no signals. The handlers in ``signals.py`` only act on
+updates and on data derived from appointments, so brand new users and
+profiles need no follow-up.
+"""
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from .models import User, Patient, Doctor, Admin
+from .serializers import UserImportRowSerializer
+
+
+USER_FIELDS = ('username', 'email', 'first_name', 'last_name', 'role', 'phone_number', 'address', 'date_of_birth')
+PROFILE_FIELDS = {
+    'patient': (Patient, ('emergency_contact', 'emergency_phone', 'blood_type', 'allergies', 'medical_insurance')),
+    'doctor': (Doctor, ('specialization', 'license_number', 'experience_years', 'consultation_fee')),
+    'admin': (Admin, ('department', 'employee_id')),
+}
+# Columns that must be unique, with the model that enforces it
+UNIQUE_COLUMNS = {'username': User, 'license_number': Doctor, 'employee_id': Admin}
+COLUMNS = set(UserImportRowSerializer().fields)
+REQUIRED_COLUMNS = {'username', 'role'}
+
+
+class ImportFileError(ValueError):
+    """Raised for a file that cannot be imported at all"""
+
+
+class PasswordHasher:
+    """Hashes passwords in a process pool, or inline with one worker"""
+
+    def __init__(self, workers=None):
+        workers = settings.USER_IMPORT_HASH_WORKERS if workers is None else workers
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            # Spawned, not forked: the parent may be running threads (request
+            # log listener, symptom job workers). Children configure Django first.
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context('spawn'),
+                                                 initializer=django.setup)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def hash(self, passwords):
+        # Blank passwords get an unusable hash, which costs nothing
+        pending = [index for index, password in enumerate(passwords) if password]
+        hashed = [make_password(None)] * len(passwords)
+        if self._executor is None or len(pending) < 2:
+            results = map(make_password, (passwords[index] for index in pending))
+        else:
+            chunksize = max(1, len(pending) // (self.workers * 4))
+            results = self._executor.map(make_password, [passwords[index] for index in pending], chunksize=chunksize)
+        for index, password_hash in zip(pending, results):
+            hashed[index] = password_hash
+        return hashed
+
+
+class UserImport:
+    """Import state and report for one file"""
+
+    def __init__(self, batch_size=None, workers=None, dry_run=False, max_rows=None):
+        self.batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+        self.workers = workers
+        self.dry_run = dry_run
+        self.max_rows = max_rows
+        self.rows = 0
+        self.valid = 0
+        self.created = {role: 0 for role in PROFILE_FIELDS}
+        self.errors = []
+        self._seen = {column: set() for column in UNIQUE_COLUMNS}
+
+    def run(self, stream):
+        """Import every row of a CSV text stream and return the report"""
+        reader = csv.DictReader(stream)
+        header = set(reader.fieldnames or ())
+        missing = REQUIRED_COLUMNS - header
+        if missing:
+            raise ImportFileError(f"Missing required columns: {', '.join(sorted(missing))}")
+        unknown = header - COLUMNS
+        if unknown:
+            raise ImportFileError(f"Unknown columns: {', '.join(sorted(unknown))}")
+
+        # Line 1 is the header
+        rows = zip(itertools.count(2), reader)
+        with PasswordHasher(1 if self.dry_run else self.workers) as hasher:
+            while True:
+                batch = list(itertools.islice(rows, self.batch_size))
+                if not batch:
+                    break
+                self.rows += len(batch)
+                if self.max_rows is not None and self.rows > self.max_rows:
+                    raise ImportFileError(f'At most {self.max_rows} rows per import')
+                valid = self._validate(batch)
+                if valid and not self.dry_run:
+                    self._insert(valid, hasher)
+        return self.report()
+
+    def _error(self, line, row, errors):
+        self.errors.append({'line': line, 'username': row.get('username'), 'errors': errors})
+
+    def _validate(self, batch):
+        """``(line, validated_data)`` of the rows that can be inserted"""
+        candidates = []
+        for line, row in batch:
+            # Blank cells mean "not given"
+            data = {key: value.strip() if key != 'password' else value
+                    for key, value in row.items() if key is not None and value not in (None, '')}
+            serializer = UserImportRowSerializer(data=data)
+            if serializer.is_valid():
+                candidates.append((line, serializer.validated_data))
+            else:
+                self._error(line, row, serializer.errors)
+
+        taken = {}
+        for column, model in UNIQUE_COLUMNS.items():
+            values = [data[column] for line, data in candidates if data.get(column)]
+            if values:
+                taken[column] = set(model.objects.filter(**{f'{column}__in': values}).values_list(column, flat=True))
+        valid = []
+        for line, data in candidates:
+            errors = {}
+            for column in UNIQUE_COLUMNS:
+                value = data.get(column)
+                if value is None:
+                    continue
+                if value in taken.get(column, ()):
+                    errors[column] = [f'{value} already exists.']
+                elif value in self._seen[column]:
+                    errors[column] = [f'{value} appears more than once in the file.']
+            if errors:
+                self._error(line, data, errors)
+                continue
+            for column in UNIQUE_COLUMNS:
+                if data.get(column):
+                    self._seen[column].add(data[column])
+            valid.append((line, data))
+        self.valid += len(valid)
+        return valid
+
+    def _build_user(self, data, password_hash):
+        return User(password=password_hash, **{field: data[field] for field in USER_FIELDS if field in data})
+
+    def _build_profile(self, data, user):
+        model, fields = PROFILE_FIELDS[data['role']]
+        values = {field: data[field] for field in fields if field in data}
+        # Same defaults as registration
+        if data['role'] == 'doctor':
+            values.setdefault('license_number', f'DOC{user.id:06d}')
+        elif data['role'] == 'admin':
+            values.setdefault('employee_id', f'ADM{user.id:06d}')
+        return model(user=user, **values)
+
+    def _insert(self, valid, hasher):
+        hashes = hasher.hash([data.get('password') for line, data in valid])
+        users = [self._build_user(data, password_hash) for (line, data), password_hash in zip(valid, hashes)]
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                if users[0].pk is None:
+                    # bulk_create only returns primary keys on some backends
+                    ids = dict(User.objects.filter(username__in=[user.username for user in users])
+                               .values_list('username', 'id'))
+                    for user in users:
+                        user.pk = ids[user.username]
+                profiles = {}
+                for (line, data), user in zip(valid, users):
+                    profiles.setdefault(data['role'], []).append(self._build_profile(data, user))
+                for role, role_profiles in profiles.items():
+                    PROFILE_FIELDS[role][0].objects.bulk_create(role_profiles)
+        except IntegrityError:
+            # Someone else created one of these meanwhile; find out which row by row
+            self._insert_rows(valid, hashes)
+            return
+        for line, data in valid:
+            self.created[data['role']] += 1
+
+    def _insert_rows(self, valid, hashes):
+        for (line, data), password_hash in zip(valid, hashes):
+            try:
+                with transaction.atomic():
+                    user = self._build_user(data, password_hash)
+                    user.save()
+                    self._build_profile(data, user).save()
+            except IntegrityError as e:
+                self._error(line, data, {'non_field_errors': [str(e)]})
+            else:
+                self.created[data['role']] += 1
+
+    def report(self):
+        return {
+            'rows': self.rows,
+            'valid': self.valid,
+            'created': sum(self.created.values()),
+            'created_by_role': self.created,
+            'failed': len(self.errors),
+            'dry_run': self.dry_run,
+            'errors': self.errors,
+        }
+
+
+def import_users(stream, **options):
+    """Import users from a CSV text stream; see ``UserImport`` for the options"""
+    return UserImport(**options).run(stream)
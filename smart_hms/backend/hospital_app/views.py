@@ -1,18 +1,39 @@
+import io
+from datetime import date, timedelta
+
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.db.models import Q
-from .models import User, Patient, Doctor, Admin, Appointment, MedicalRecord, Prescription, SymptomChecker
+from django.db import transaction
+from django.db.models import Count, Q
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from .models import (
+    User, Patient, Doctor, Admin, Appointment, DoctorPatient, MedicalRecord, Prescription, SymptomChecker, WorkingHours,
+)
+from .availability import free_slots, slot_minutes
+from .booking import STATUS_TRANSITIONS, bulk_set_status, check_version, save_booking
+from .authentication import ClaimsUser, HospitalRefreshToken, full_user_cache, get_full_user, owner_filter
+from .dashboard_cache import dashboard_cache
+from .pagination import AppointmentDatePagination, CreatedAtPagination
+from .relationships import doctor_patient_ids
+from .request_logging import queue_handler_stats
+from .user_import import ImportFileError, import_users
+from .stats import dashboard_counters
 from .serializers import (
     UserSerializer, PatientSerializer, DoctorSerializer, AdminSerializer,
     AppointmentSerializer, MedicalRecordSerializer, PrescriptionSerializer,
-    SymptomCheckerSerializer, UserRegistrationSerializer, LoginSerializer
+    SymptomCheckerSerializer, UserRegistrationSerializer, LoginSerializer, WorkingHoursSerializer, BulkStatusSerializer
 )
-from .ai_model.symptom_checker import SymptomCheckerAI
+from .ai_model.jobs import QueueFull, get_job_state, symptom_job_queue
+from .ai_model.registry import get_sidecar_client, predict_symptoms, predict_symptoms_batch, prediction_cache, symptom_model_registry
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -27,11 +48,32 @@ class UserViewSet(viewsets.ModelViewSet):
             return User.objects.all()
         elif user.role == 'doctor':
             # Doctors can see patients they have appointments with
-            patient_ids = Appointment.objects.filter(doctor__user=user).values_list('patient__user_id', flat=True)
-            return User.objects.filter(id__in=patient_ids)
+            return User.objects.filter(patient_profile__id__in=doctor_patient_ids(user))
         else:
             # Patients can only see their own profile
             return User.objects.filter(id=user.id)
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_csv(self, request):
+        """Create users and their profiles from an uploaded CSV file (admin only)"""
+        if request.user.role != 'admin':
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'A CSV file is required in the "file" field'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        dry_run = request.data.get('dry_run') in ('1', 'true', 'True')
+        try:
+            # All or nothing, so a file over the row limit creates no one
+            with transaction.atomic():
+                # Hashed inline: a process pool per request is too heavy for a web worker
+                report = import_users(io.TextIOWrapper(upload, encoding='utf-8-sig', newline=''),
+                                      workers=1, dry_run=dry_run, max_rows=settings.USER_IMPORT_MAX_ROWS)
+        except (ImportFileError, UnicodeDecodeError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(report, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
 
 
 class PatientViewSet(viewsets.ModelViewSet):
@@ -42,14 +84,15 @@ class PatientViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
+        queryset = Patient.objects.select_related('user')
         if user.role == 'admin':
-            return Patient.objects.all()
+            return queryset
         elif user.role == 'doctor':
             # Doctors can see patients they have appointments with
-            return Patient.objects.filter(appointments__doctor__user=user).distinct()
+            return queryset.filter(id__in=doctor_patient_ids(user))
         else:
             # Patients can only see their own profile
-            return Patient.objects.filter(user=user)
+            return queryset.filter(user_id=user.id)
 
 
 class DoctorViewSet(viewsets.ModelViewSet):
@@ -60,14 +103,87 @@ class DoctorViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
+        queryset = Doctor.objects.select_related('user')
         if user.role == 'admin':
-            return Doctor.objects.all()
+            return queryset
         elif user.role == 'doctor':
             # Doctors can only see their own profile
-            return Doctor.objects.filter(user=user)
+            return queryset.filter(user_id=user.id)
         else:
             # Patients can see all available doctors
-            return Doctor.objects.filter(is_available=True)
+            return queryset.filter(is_available=True)
+    
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """Earliest free slots of the doctors the caller can see, e.g. any cardiologist this week
+
+        Query parameters: ``specialization``, ``doctor`` (an id), ``date_from``
+        (YYYY-MM-DD, default today), ``days`` (default 7) and ``limit``
+        (default 20). Read from the working hours and slot bitmaps only.
+        """
+        params = request.query_params
+        try:
+            first_day = date.fromisoformat(params['date_from']) if params.get('date_from') else timezone.localdate()
+            days = int(params.get('days', 7))
+            limit = int(params.get('limit', 20))
+            doctor_id = int(params['doctor']) if params.get('doctor') else None
+        except ValueError:
+            return Response({'error': 'date_from must be YYYY-MM-DD; days, limit and doctor must be integers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= settings.AVAILABILITY_MAX_DAYS:
+            return Response({'error': f'days must be between 1 and {settings.AVAILABILITY_MAX_DAYS}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= limit <= settings.AVAILABILITY_MAX_SLOTS:
+            return Response({'error': f'limit must be between 1 and {settings.AVAILABILITY_MAX_SLOTS}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        doctors = self.get_queryset()
+        if params.get('specialization'):
+            doctors = doctors.filter(specialization=params['specialization'])
+        if doctor_id is not None:
+            doctors = doctors.filter(id=doctor_id)
+        slots = free_slots(doctors, first_day, days, limit)
+        
+        profiles = Doctor.objects.select_related('user').in_bulk({doctor_id for start, doctor_id in slots})
+        minutes = slot_minutes()
+        length = timedelta(minutes=minutes)
+        return Response({
+            'slot_minutes': minutes,
+            'date_from': first_day,
+            'date_to': first_day + timedelta(days=days - 1),
+            'slots': [
+                {
+                    'doctor': doctor_id,
+                    'doctor_name': profiles[doctor_id].user.get_full_name(),
+                    'specialization': profiles[doctor_id].specialization,
+                    'start': start,
+                    'end': start + length,
+                }
+                for start, doctor_id in slots
+            ],
+        })
+    
+    @action(detail=True, methods=['get', 'put'], url_path='working-hours')
+    def working_hours(self, request, pk=None):
+        """A doctor's weekly working hours; PUT replaces them all (the doctor or an admin)"""
+        doctor = self.get_object()
+        if request.method == 'PUT':
+            # Doctors only ever see their own profile
+            if request.user.role not in ('admin', 'doctor'):
+                return Response({'error': 'Only the doctor or an admin can change working hours'},
+                                status=status.HTTP_403_FORBIDDEN)
+            serializer = WorkingHoursSerializer(data=request.data, many=True)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            spans = serializer.validated_data
+            if len({(span['weekday'], span['start_time']) for span in spans}) != len(spans):
+                return Response({'error': 'Two spans start at the same time on the same day'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            with transaction.atomic():
+                doctor.working_hours.all().delete()
+                WorkingHours.objects.bulk_create([WorkingHours(doctor=doctor, **span) for span in spans])
+        
+        return Response(WorkingHoursSerializer(doctor.working_hours.all(), many=True).data)
 
 
 class AdminViewSet(viewsets.ModelViewSet):
@@ -79,7 +195,7 @@ class AdminViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'admin':
-            return Admin.objects.all()
+            return Admin.objects.select_related('user')
         else:
             return Admin.objects.none()
 
@@ -89,32 +205,74 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AppointmentDatePagination
     
     def get_queryset(self):
         user = self.request.user
+        # The serializer reads patient and doctor names
+        queryset = Appointment.objects.select_related('patient__user', 'doctor__user')
         if user.role == 'admin':
-            return Appointment.objects.all()
+            return queryset
         elif user.role == 'doctor':
-            return Appointment.objects.filter(doctor__user=user)
+            return queryset.filter(**owner_filter(user, 'doctor'))
         else:
             # Patients can only see their own appointments
-            return Appointment.objects.filter(patient__user=user)
+            return queryset.filter(**owner_filter(user, 'patient'))
+    
+    def perform_create(self, serializer):
+        save_booking(serializer.save)
+    
+    def perform_update(self, serializer):
+        save_booking(serializer.save)
+    
+    def _set_status(self, request, new_status):
+        """Move the appointment to ``new_status``, at the ``version`` the client read if given"""
+        appointment = self.get_object()
+        version = request.data.get('version')
+        if version is not None:
+            try:
+                version = int(version)
+            except (TypeError, ValueError):
+                return None, Response({'error': 'version must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            check_version(appointment, version)
+        if new_status not in STATUS_TRANSITIONS.get(appointment.status, ()):
+            return None, Response({'error': f'Cannot move a {appointment.status} appointment to {new_status}'},
+                                  status=status.HTTP_409_CONFLICT)
+        appointment.status = new_status
+        # The version moves on too (see Appointment._do_update)
+        save_booking(appointment.save, update_fields=['status', 'updated_at'])
+        return appointment, None
     
     @action(detail=True, methods=['post'])
     def confirm(self, request, pk=None):
         """Confirm an appointment"""
-        appointment = self.get_object()
-        appointment.status = 'confirmed'
-        appointment.save()
-        return Response({'status': 'Appointment confirmed'})
+        appointment, error = self._set_status(request, 'confirmed')
+        if error:
+            return error
+        return Response({'status': 'Appointment confirmed', 'version': appointment.version})
     
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """Cancel an appointment"""
-        appointment = self.get_object()
-        appointment.status = 'cancelled'
-        appointment.save()
-        return Response({'status': 'Appointment cancelled'})
+        appointment, error = self._set_status(request, 'cancelled')
+        if error:
+            return error
+        return Response({'status': 'Appointment cancelled', 'version': appointment.version})
+    
+    @action(detail=False, methods=['post'], url_path='bulk-status')
+    def bulk_status(self, request):
+        """Move many appointments to one status in a single update, reporting each id's outcome"""
+        serializer = BulkStatusSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        new_status = serializer.validated_data['status']
+        # Ids outside the caller's own appointments come back as not found
+        results = bulk_set_status(self.get_queryset(), serializer.validated_data['ids'], new_status)
+        return Response({
+            'status': new_status,
+            'updated': sum(result['outcome'] == 'updated' for result in results),
+            'results': results,
+        })
 
 
 class MedicalRecordViewSet(viewsets.ModelViewSet):
@@ -122,16 +280,19 @@ class MedicalRecordViewSet(viewsets.ModelViewSet):
     queryset = MedicalRecord.objects.all()
     serializer_class = MedicalRecordSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtPagination
     
     def get_queryset(self):
         user = self.request.user
+        # The serializer reads patient and doctor names
+        queryset = MedicalRecord.objects.select_related('patient__user', 'doctor__user')
         if user.role == 'admin':
-            return MedicalRecord.objects.all()
+            return queryset
         elif user.role == 'doctor':
-            return MedicalRecord.objects.filter(doctor__user=user)
+            return queryset.filter(**owner_filter(user, 'doctor'))
         else:
             # Patients can only see their own medical records
-            return MedicalRecord.objects.filter(patient__user=user)
+            return queryset.filter(**owner_filter(user, 'patient'))
 
 
 class PrescriptionViewSet(viewsets.ModelViewSet):
@@ -142,13 +303,15 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
+        # The serializer reads patient and doctor names
+        queryset = Prescription.objects.select_related('patient__user', 'doctor__user')
         if user.role == 'admin':
-            return Prescription.objects.all()
+            return queryset
         elif user.role == 'doctor':
-            return Prescription.objects.filter(doctor__user=user)
+            return queryset.filter(**owner_filter(user, 'doctor'))
         else:
             # Patients can only see their own prescriptions
-            return Prescription.objects.filter(patient__user=user)
+            return queryset.filter(**owner_filter(user, 'patient'))
 
 
 class SymptomCheckerViewSet(viewsets.ModelViewSet):
@@ -156,18 +319,18 @@ class SymptomCheckerViewSet(viewsets.ModelViewSet):
     queryset = SymptomChecker.objects.all()
     serializer_class = SymptomCheckerSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtPagination
     
     def get_queryset(self):
         user = self.request.user
         if user.role == 'admin':
             return SymptomChecker.objects.all()
         elif user.role == 'doctor':
-            return SymptomChecker.objects.filter(patient__user__in=User.objects.filter(
-                appointments__doctor__user=user
-            ).distinct())
+            # Symptom checks of patients they have appointments with
+            return SymptomChecker.objects.filter(patient_id__in=doctor_patient_ids(user))
         else:
             # Patients can only see their own symptom checks
-            return SymptomChecker.objects.filter(patient__user=user)
+            return SymptomChecker.objects.filter(**owner_filter(user, 'patient'))
     
     @action(detail=False, methods=['post'])
     def analyze(self, request):
@@ -175,17 +338,31 @@ class SymptomCheckerViewSet(viewsets.ModelViewSet):
         symptoms = request.data.get('symptoms', '')
         if not symptoms:
             return Response({'error': 'Symptoms are required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(symptoms, str) or not symptoms.strip():
+            return Response({'error': 'Symptoms must be a non-empty string'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if self._wants_async(request):
+            try:
+                job_id = symptom_job_queue.submit(symptoms, request.user.id, self._get_patient_id(request))
+            except QueueFull:
+                return Response(
+                    {'error': 'Symptom analysis queue is full, please retry shortly'},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={'Retry-After': '1'}
+                )
+            return Response({
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': reverse('ai_symptom_checker_job', args=[job_id]),
+            }, status=status.HTTP_202_ACCEPTED)
         
         try:
-            # Initialize AI model
-            ai_model = SymptomCheckerAI()
-            
-            # Get predictions
-            predictions = ai_model.predict(symptoms)
+            # Get predictions from the shared model, through the prediction cache
+            predictions = predict_symptoms(symptoms)
             
             # Create symptom check record
             symptom_check = SymptomChecker.objects.create(
-                patient=request.user.patient_profile if hasattr(request.user, 'patient_profile') else None,
+                patient_id=self._get_patient_id(request),
                 symptoms=symptoms,
                 predicted_conditions=predictions.get('conditions', []),
                 confidence_scores=predictions.get('confidence', {}),
@@ -197,6 +374,75 @@ class SymptomCheckerViewSet(viewsets.ModelViewSet):
             
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['post'], url_path='analyze-batch')
+    def analyze_batch(self, request):
+        """Analyze a list of symptom texts in one call"""
+        symptoms_list = request.data.get('symptoms')
+        if not isinstance(symptoms_list, list) or not symptoms_list:
+            return Response({'error': 'A non-empty list of symptoms is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(isinstance(symptoms, str) and symptoms.strip() for symptoms in symptoms_list):
+            return Response({'error': 'Every symptoms entry must be a non-empty string'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        max_size = settings.SYMPTOM_BATCH_MAX_SIZE
+        if len(symptoms_list) > max_size:
+            return Response({'error': f'At most {max_size} symptom texts per batch'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            predictions = predict_symptoms_batch(symptoms_list)
+            
+            patient_id = self._get_patient_id(request)
+            symptom_checks = SymptomChecker.objects.bulk_create([
+                SymptomChecker(
+                    patient_id=patient_id,
+                    symptoms=symptoms,
+                    predicted_conditions=prediction.get('conditions', []),
+                    confidence_scores=prediction.get('confidence', {}),
+                    recommendations=prediction.get('recommendations', '')
+                )
+                for symptoms, prediction in zip(symptoms_list, predictions)
+            ])
+            
+            serializer = self.get_serializer(symptom_checks, many=True)
+            return Response(serializer.data)
+            
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def job_status(self, request, job_id=None):
+        """Poll the status of an asynchronous analysis job (routed in urls.py only)"""
+        state = get_job_state(job_id)
+        if state is not None and (state['user_id'] == request.user.id or request.user.role == 'admin'):
+            data = {'job_id': job_id, 'status': state['status']}
+            if state['status'] == 'completed':
+                symptom_check = SymptomChecker.objects.filter(pk=state['symptom_check_id']).first()
+                if symptom_check is None:
+                    # Deleted since, e.g. with its patient
+                    return Response({'error': 'Job result no longer exists'}, status=status.HTTP_404_NOT_FOUND)
+                data['result'] = self.get_serializer(symptom_check).data
+            return Response(data)
+        
+        # State expired or lives in another process: finished jobs are in the table
+        symptom_check = self.get_queryset().filter(job_id=job_id).first()
+        if symptom_check is None:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'job_id': job_id,
+            'status': 'completed',
+            'result': self.get_serializer(symptom_check).data,
+        })
+    
+    def _wants_async(self, request):
+        """Whether the caller asked for a queued job instead of an inline result"""
+        value = request.data.get('async', request.query_params.get('async', False))
+        return str(value).lower() in ('1', 'true', 'yes')
+    
+    def _get_patient_id(self, request):
+        """Id of the caller's patient profile, if any"""
+        user = request.user
+        if isinstance(user, ClaimsUser):
+            return user.profile_id if user.role == 'patient' else None
+        return user.patient_profile.id if hasattr(user, 'patient_profile') else None
 
 
 class RegisterView(APIView):
@@ -204,8 +450,6 @@ class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
     
     def post(self, request):
-        print(f"Register request received: {request.data}")
-        print(f"Request headers: {request.headers}")
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
@@ -219,7 +463,7 @@ class RegisterView(APIView):
                 Admin.objects.create(user=user, employee_id=f"ADM{user.id:06d}")
             
             # Generate tokens
-            refresh = RefreshToken.for_user(user)
+            refresh = HospitalRefreshToken.for_user(user)
             return Response({
                 'user': UserSerializer(user).data,
                 'tokens': {
@@ -227,7 +471,6 @@ class RegisterView(APIView):
                     'access': str(refresh.access_token),
                 }
             }, status=status.HTTP_201_CREATED)
-        print(f"Register serializer errors: {serializer.errors}")
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -236,14 +479,12 @@ class LoginView(APIView):
     permission_classes = [permissions.AllowAny]
     
     def post(self, request):
-        print(f"Login request received: {request.data}")
-        print(f"Request headers: {request.headers}")
         serializer = LoginSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.validated_data['user']
             
             # Generate tokens
-            refresh = RefreshToken.for_user(user)
+            refresh = HospitalRefreshToken.for_user(user)
             return Response({
                 'user': UserSerializer(user).data,
                 'tokens': {
@@ -251,7 +492,6 @@ class LoginView(APIView):
                     'access': str(refresh.access_token),
                 }
             }, status=status.HTTP_200_OK)
-        print(f"Login serializer errors: {serializer.errors}")
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -261,13 +501,34 @@ class DashboardView(APIView):
     
     def get(self, request):
         user = request.user
-        data = {'user': UserSerializer(user).data}
+        # Patient and doctor dashboards are served as cached JSON snapshots
+        cacheable = (user.role in ('patient', 'doctor') and dashboard_cache.enabled
+                     and request.accepted_renderer.format == 'json')
+        if not cacheable:
+            return Response(self.get_dashboard_data(user))
+        
+        snapshot, generation = dashboard_cache.get(user.id)
+        if snapshot is None:
+            snapshot = JSONRenderer().render(self.get_dashboard_data(user))
+            dashboard_cache.set(user.id, generation, snapshot)
+        return HttpResponse(snapshot, content_type='application/json')
+    
+    def get_dashboard_data(self, user):
+        """Dashboard contents for the user's role"""
+        data = {'user': UserSerializer(get_full_user(user)).data}
         
         if user.role == 'patient':
             # Patient dashboard data
-            appointments = Appointment.objects.filter(patient__user=user).order_by('-appointment_date')[:5]
-            prescriptions = Prescription.objects.filter(patient__user=user, is_active=True).order_by('-created_at')[:5]
-            medical_records = MedicalRecord.objects.filter(patient__user=user).order_by('-created_at')[:5]
+            patient = owner_filter(user, 'patient')
+            appointments = Appointment.objects.select_related('patient__user', 'doctor__user').filter(
+                **patient
+            ).order_by('-appointment_date')[:5]
+            prescriptions = Prescription.objects.select_related('patient__user', 'doctor__user').filter(
+                is_active=True, **patient
+            ).order_by('-created_at')[:5]
+            medical_records = MedicalRecord.objects.select_related('patient__user', 'doctor__user').filter(
+                **patient
+            ).order_by('-created_at')[:5]
             
             data.update({
                 'appointments': AppointmentSerializer(appointments, many=True).data,
@@ -277,8 +538,13 @@ class DashboardView(APIView):
             
         elif user.role == 'doctor':
             # Doctor dashboard data
-            appointments = Appointment.objects.filter(doctor__user=user).order_by('-appointment_date')[:5]
-            patients = Patient.objects.filter(appointments__doctor__user=user).distinct()[:5]
+            doctor = owner_filter(user, 'doctor')
+            appointments = Appointment.objects.select_related('patient__user', 'doctor__user').filter(
+                **doctor
+            ).order_by('-appointment_date')[:5]
+            # Most recently seen patients
+            links = DoctorPatient.objects.select_related('patient__user').filter(**doctor).order_by('-last_seen')[:5]
+            patients = [link.patient for link in links]
             
             data.update({
                 'appointments': AppointmentSerializer(appointments, many=True).data,
@@ -287,44 +553,43 @@ class DashboardView(APIView):
             
         elif user.role == 'admin':
             # Admin dashboard data
-            from django.utils import timezone
-            from datetime import datetime, timedelta
-            
-            total_users = User.objects.count()
-            total_appointments = Appointment.objects.count()
-            total_doctors = Doctor.objects.count()
-            total_patients = Patient.objects.count()
-            
-            # Calculate today's appointments
-            today = timezone.now().date()
-            today_appointments = Appointment.objects.filter(
-                appointment_date__date=today
-            ).count()
+            # Counters come from the rollup table: a handful of rows, whatever the table size
+            appointment_counts = dashboard_counters(timezone.localdate())
             
-            # Calculate pending appointments (scheduled + confirmed)
-            pending_appointments = Appointment.objects.filter(
-                status__in=['scheduled', 'confirmed']
-            ).count()
-            
-            # Calculate completed appointments
-            completed_appointments = Appointment.objects.filter(
-                status='completed'
-            ).count()
+            # Profiles are one-to-one with users, so the joins do not multiply rows
+            user_counts = User.objects.aggregate(
+                total_users=Count('id'),
+                total_doctors=Count('doctor_profile'),
+                total_patients=Count('patient_profile'),
+            )
             
             # Get recent appointments for display
             recent_appointments = Appointment.objects.select_related(
                 'patient__user', 'doctor__user'
             ).order_by('-appointment_date')[:5]
             
-            data.update({
-                'total_users': total_users,
-                'total_appointments': total_appointments,
-                'total_doctors': total_doctors,
-                'total_patients': total_patients,
-                'today_appointments': today_appointments,
-                'pending_appointments': pending_appointments,
-                'completed_appointments': completed_appointments,
-                'recent_appointments': AppointmentSerializer(recent_appointments, many=True).data,
-            })
+            data.update(user_counts)
+            data.update(appointment_counts)
+            data['recent_appointments'] = AppointmentSerializer(recent_appointments, many=True).data
+        
+        return data
+
+
+class MetricsView(APIView):
+    """Runtime metrics for administrators"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        return Response(data)
\ No newline at end of file
+        sidecar = get_sidecar_client()
+        return Response({
+            'symptom_model': symptom_model_registry.stats(),
+            'prediction_cache': prediction_cache.stats(),
+            'symptom_jobs': symptom_job_queue.stats(),
+            'symptom_sidecar': sidecar.stats() if sidecar else None,
+            'dashboard_cache': dashboard_cache.stats(),
+            'auth_user_cache': full_user_cache.stats(),
+            'request_log': queue_handler_stats(),
+        })